@@ -0,0 +1,87 @@
+"""
+ * Loads the plugin outside of Sublime Text
+ *
+ * The stub sublime modules are put on sys.path and the fake ssh is put first on PATH.
+ * The plugin folder is imported as the OpenFileOverSSH package (just like Sublime does) so relative imports work.
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import tempfile
+import importlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+PACKAGE = "OpenFileOverSSH"
+
+
+#sets up the fake ssh environment; rtt and handshake are in seconds, bandwidth in bytes per second
+def setupFakeSsh(rtt=0, bandwidth=0, handshake=3, home=None):
+
+	state = tempfile.mkdtemp(prefix="sofos-bench-state-")
+	os.environ["PATH"] = os.path.join(BENCH_DIR, "fakessh") + os.pathsep + os.environ.get("PATH", "")
+	os.environ["FAKESSH_RTT"] = str(rtt)
+	os.environ["FAKESSH_BANDWIDTH"] = str(bandwidth)
+	os.environ["FAKESSH_HANDSHAKE"] = str(handshake)
+	os.environ["FAKESSH_STATE"] = state
+	if home:
+		os.environ["FAKESSH_HOME"] = home
+
+	return state
+
+#number of ssh processes spawned so far
+def spawnCount(state):
+
+	try:
+		with open(os.path.join(state, "spawns.jsonl")) as log:
+			return sum(1 for _ in log)
+	except FileNotFoundError:
+		return 0
+
+#imports main.py with the stub sublime modules; settings is a dict of plugin settings
+def loadPlugin(settings=None):
+
+	sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+	import sublime
+
+	sublime.load_settings("OpenFileOverSSH.sublime-settings").update(settings or {})
+
+	if PACKAGE not in sys.modules:
+		pkg = types.ModuleType(PACKAGE)
+		pkg.__path__ = [ROOT_DIR]
+		sys.modules[PACKAGE] = pkg
+
+	main = importlib.import_module(PACKAGE + ".main")
+	main.engine.configure(sublime.load_settings("OpenFileOverSSH.sublime-settings"), showError=sublime.error_message) #what plugin_loaded does, without starting its background work
+	return main
+
+
+#argparse type for setting values given on the command line e.g. false, 5m, or 7
+def settingArg(text):
+
+	try:
+		return json.loads(text)
+	except ValueError:
+		return text
+
+#times a function; returns a dict of stats in seconds
+def timeit(func, repeat=1, setup=None):
+
+	times = []
+	for _ in range(repeat):
+		arg = setup() if setup else None
+		start = time.perf_counter()
+		func(arg) if setup else func()
+		times.append(time.perf_counter() - start)
+
+	times.sort()
+	return {
+		"repeat": repeat,
+		"min": times[0],
+		"median": times[len(times)//2],
+		"mean": sum(times) / len(times),
+		"max": times[-1]
+	}
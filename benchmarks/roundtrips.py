@@ -0,0 +1,209 @@
+"""
+ * Round trip budgets
+ *
+ * Counts the remote round trips (from the plugin's Trace) and ssh processes (from the fake ssh's log) of each user level operation,
+ * (background prefetches, e.g. path previews, are not waited on so they are not counted)
+ * and fails (exit code 1) when an operation goes over its budget.
+ * Also reports each operation's wall clock time at the injected round trip time (100ms by default).
+ * Use like: python -m benchmarks.roundtrips --rtt 0.1
+ *
+ * If a change intentionally adds a round trip, raise the budget here in the same commit and say why.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from . import harness
+
+
+HOST = "bench"
+GLOB_FILES = 20
+EVT = {"modifier_keys": {}}
+
+#operation: (max round trips, max ssh processes)
+BUDGETS = {
+	"connect": (2, 1), #shell startup + ls
+	"connect_prewarmed": (2, 1), #same as connect; without multiplexing the pre-warmed shell is used so only the ls is left
+	"enter_folder": (2, 0), #test -x + ls
+	"glob_open": (GLOB_FILES + 1, 0), #one match command shared by validate and confirm + cat per file over the shell
+	"single_open": (2, 1), #test -r + cat
+	"save": (1, 1), #cat > and sha256sum
+	"noop_save": (0, 0), #the buffer matches the last synced hash so nothing is sent
+	"save_all": (1, 1), #one script with every dirty file on the host (uploads and hashes) + no per view saves
+	"revert": (1, 1), #cat
+	"restored_check": (2, 2) #one hash of all restored files on the host + cat of the one that changed
+}
+
+
+def run(args):
+
+	home = tempfile.mkdtemp(prefix="sofos-rt-home-")
+	state = harness.setupFakeSsh(rtt=args.rtt, home=home)
+	main = harness.loadPlugin({"multiplexing": args.multiplexing, "pathChecking": True, "actions": ["glob", "new"], "traceSize": 100000})
+	import sublime
+	import sublime_plugin
+
+	folder = os.path.join(home, "dir")
+	os.mkdir(folder)
+	for i in range(GLOB_FILES):
+		with open(os.path.join(folder, f"file{i:02d}.txt"), "w") as file:
+			file.write(f"file {i}\n")
+
+	results = {}
+	shells = []
+
+	def measure(name, func):
+
+		before = len([record for record in main.Trace.snapshot() if record["kind"] not in ("step", "prefetch")])
+		spawns = harness.spawnCount(state)
+		start = time.perf_counter()
+		ret = func()
+		wall = time.perf_counter() - start
+		roundTrips = len([record for record in main.Trace.snapshot() if record["kind"] not in ("step", "prefetch")]) - before
+		spawns = harness.spawnCount(state) - spawns
+
+		maxTrips, maxSpawns = BUDGETS[name]
+		ok = roundTrips <= maxTrips and spawns <= maxSpawns
+		results[name] = {"roundTrips": roundTrips, "roundTripBudget": maxTrips, "spawns": spawns, "spawnBudget": maxSpawns, "wall": wall, "ok": ok}
+		print(f"{'ok  ' if ok else 'FAIL'} {name:<18} round trips {roundTrips:>3}/{maxTrips:<3} processes {spawns:>2}/{maxSpawns:<2} {wall*1000:9.1f} ms", flush=True)
+		return ret
+
+	#a connected file browser at the home folder
+	def session():
+		window = sublime.Window()
+		argz = main.Argz(window=window)
+		server = main.serverInputHandler(argz)
+		assert server.validate(f"{HOST}:"), sublime.dialogs[-1:]
+		server.confirm(f"{HOST}:")
+		shells.append(argz["sshShell"])
+		return window, argz, server.next_input({})
+
+	#selects value in a path handler and returns the next handler
+	def select(handler, value):
+		assert handler.validate(value, EVT), sublime.dialogs[-1:]
+		handler.confirm(value, EVT)
+		return handler.next_input({"path": value})
+
+	#runs the open_file_over_ssh command like the pallet does and "loads" the views
+	def openPaths(window, argz):
+		command = main.openFileOverSshCommand(window)
+		command.argz = argz
+		command.run(f"{HOST}:")
+		window._flush()
+
+	try:
+		def connect():
+			_, _, handler = session()
+			handler.list_items()
+		measure("connect", connect)
+
+		for thread in main.prewarm([(HOST, "")]):
+			thread.join()
+		measure("connect_prewarmed", connect)
+
+		window, argz, handler = session()
+		handler.list_items()
+		def enterFolder():
+			folder = select(handler, "dir/")
+			folder.list_items()
+			return folder
+		handler = measure("enter_folder", enterFolder)
+
+		def globOpen():
+			glob = select(handler, main.pathInputHandler.Action.GLOB)
+			assert glob.validate("*.txt"), sublime.dialogs[-1:]
+			glob.confirm("*.txt")
+			openPaths(window, argz)
+		measure("glob_open", globOpen)
+		assert len(window.views()) == GLOB_FILES
+
+		def saveAll():
+			main.openFileOverSshSaveAllListener().on_window_command(window, "save_all", {})
+			upload = main.openFileOverSshSaveAllListener.uploads.get(window.id())
+			if upload:
+				upload.join() #the uploads run in the background
+			for view in edited:
+				view._save()
+		edited = window.views()[:3]
+		for view in edited:
+			view.run_command("insert", {"characters": "all "})
+		measure("save_all", saveAll)
+		for i in range(3):
+			assert open(os.path.join(folder, f"file{i:02d}.txt")).read() == f"all file {i}\n", "save all did not reach the server"
+		assert not any(view.is_dirty() for view in edited), "save all left dirty views"
+
+		window, argz, handler = session()
+		handler.list_items()
+		handler = select(handler, "dir/")
+		handler.list_items()
+		def singleOpen():
+			select(handler, "file00.txt")
+			openPaths(window, argz)
+			return window.views()[-1]
+		view = measure("single_open", singleOpen)
+
+		view.run_command("insert", {"characters": "edit "})
+		measure("save", view._save)
+		assert open(os.path.join(folder, "file00.txt")).read().startswith("edit "), "save did not reach the server"
+		measure("noop_save", view._save)
+
+		listener = view.listeners[0]
+		measure("revert", lambda: listener.on_text_command("revert", {}))
+
+		#views restored after a hot exit: three on the same host, one of which changed on the server
+		window = sublime.Window()
+		views = []
+		for i in range(1, 4):
+			path = f"dir/file{i:02d}.txt"
+			with open(os.path.join(home, path), "rb") as file:
+				data = file.read()
+			view = sublime.View(window, f"{HOST}/{path}")
+			view._text = data.decode()
+			view.settings().update({"ssh_server": HOST, "ssh_port": "", "ssh_path": path, "ssh_sha256": main.contentHash(data)})
+			window._views.append(view)
+			views.append(view)
+		with open(os.path.join(home, "dir/file02.txt"), "a") as file:
+			file.write("changed\n")
+		for view in views:
+			sublime_plugin._attachListeners(view)
+		measure("restored_check", lambda: views[0].listeners[0].on_activated().join())
+		assert views[1].substr(sublime.Region(0, views[1].size())).endswith("changed\n"), "changed restored view was not reloaded"
+
+		errors = [msg for kind, msg in sublime.dialogs if kind == "error"]
+		if errors:
+			raise AssertionError("Errors reported by the plugin:\n" + "\n".join(errors))
+
+	finally:
+		for shell in shells:
+			shell.close()
+		shutil.rmtree(home, ignore_errors=True)
+		shutil.rmtree(state, ignore_errors=True)
+
+	return results
+
+def main(argv=None):
+
+	parser = argparse.ArgumentParser(description="Open File Over SSH round trip budgets")
+	parser.add_argument("--rtt", type=float, default=0.1, help="injected round trip time in seconds (default 0.1)")
+	parser.add_argument("--multiplexing", type=harness.settingArg, default="5m", help="multiplexing setting passed to the plugin (default 5m)")
+	parser.add_argument("--output", help="JSON results file")
+	args = parser.parse_args(argv)
+
+	results = run(args)
+	if args.output:
+		with open(args.output, "w") as file:
+			json.dump({"rtt": args.rtt, "multiplexing": args.multiplexing, "results": results}, file, indent="\t")
+
+	failed = [name for name, result in results.items() if not result["ok"]]
+	if failed:
+		print(f"Over budget: {', '.join(failed)}")
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
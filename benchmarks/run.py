@@ -0,0 +1,196 @@
+"""
+ * Open File Over SSH benchmarks
+ *
+ * Runs the plugin's hot paths against the local fake ssh (see fakessh/ssh) and writes the timings to a JSON file.
+ * Use like: python -m benchmarks.run --rtt 0.02 --output bench.json
+ * Pass --history to also append a one line summary to a JSON lines file for tracking regressions over time.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from . import harness
+
+
+HOST = "bench"
+
+
+def makeFixtures(home, sizes):
+
+	for count in sizes["listing"]:
+		folder = os.path.join(home, f"list{count}")
+		os.mkdir(folder)
+		for i in range(count):
+			open(os.path.join(folder, f"file{i:06d}.txt"), "w").close()
+
+	folder = os.path.join(home, "glob")
+	os.mkdir(folder)
+	for i in range(sizes["glob"]):
+		with open(os.path.join(folder, f"file{i:04d}.txt"), "w") as file:
+			file.write(f"file {i}\n" * 20)
+
+	with open(os.path.join(home, "big.txt"), "wb") as file:
+		line = b"0123456789abcdefghijklmnopqrstuvwxyz0123456789abcdefghijklmnopqrstuvwxyz0123456789abcdefghijklmnopqr\n"
+		for _ in range(sizes["big"] // len(line)):
+			file.write(line)
+
+
+def run(args):
+
+	sizes = {
+		"listing": [1000, 10000] if args.quick else [10000, 100000],
+		"glob": 50 if args.quick else 500,
+		"big": (10 if args.quick else 100) * 1024 * 1024
+	}
+	repeat = 3 if args.quick else args.repeat
+
+	home = tempfile.mkdtemp(prefix="sofos-bench-home-")
+	state = harness.setupFakeSsh(rtt=args.rtt, bandwidth=args.bandwidth, home=home)
+	main = harness.loadPlugin({"multiplexing": args.multiplexing, "pathChecking": True})
+	import sublime
+
+	results = {}
+	def record(name, stats, **extra):
+		results[name] = {**stats, **extra}
+		print(f"{name:>24}: median {stats['median']*1000:10.2f} ms  (min {stats['min']*1000:.2f}, max {stats['max']*1000:.2f}, n={stats['repeat']})", flush=True)
+
+	try:
+		makeFixtures(home, sizes)
+
+		#shell startup
+		def startup():
+			shell = main.SshShell(HOST)
+			assert shell.isAlive(), shell.error
+			shell.close()
+		record("shell_startup", harness.timeit(startup, repeat))
+
+		shell = main.SshShell(HOST)
+
+		#runCmd round trip
+		record("runcmd_roundtrip", harness.timeit(lambda: shell.runCmd("true"), repeat * 20))
+
+		#listing
+		for count in sizes["listing"]:
+			def listItems(_):
+				argz = main.Argz(window=sublime.Window())
+				argz["sshShell"] = shell
+				argz.pathAppend(f"list{count}/")
+				items = main.pathInputHandler(argz).list_items()
+				assert len(items[0] if isinstance(items, tuple) else items) >= count
+			record(f"list_items_{count}", harness.timeit(listItems, repeat, setup=lambda: None), entries=count)
+
+		#listing with the engine alone; the difference to list_items is the ListInputItem side
+		with main.engine.Remote(HOST) as remote:
+			for count in sizes["listing"]:
+				record(f"engine_list_{count}", harness.timeit(lambda: remote.listDir(f"list{count}/"), repeat), entries=count)
+
+		#glob open
+		def globOpen():
+			window = sublime.Window()
+			argz = main.Argz(window=window)
+			argz.update(server=HOST, port="", sshShell=shell)
+			argz.pathAppend("glob/")
+			argz.pathAppend(main.pathInputHandler.Action.GLOB)
+			handler = main.globInputHandler(argz)
+			assert handler.validate("*.txt")
+			handler.confirm("*.txt")
+			command = main.openFileOverSshCommand(window)
+			command.argz = argz
+			command.run(f"{HOST}:")
+			window._flush()
+			assert len(window.views()) == sizes["glob"]
+		record(f"glob_open_{sizes['glob']}", harness.timeit(globOpen, repeat), files=sizes["glob"])
+
+		shell.close()
+
+		#big open and save
+		window = sublime.Window()
+		mib = sizes["big"] // (1024 * 1024)
+
+		def openBig(_):
+			view = window.open_file(tempfile.NamedTemporaryFile(suffix=".txt").name)
+			view.settings().update({"ssh_server": HOST, "ssh_port": "", "ssh_path": "big.txt"})
+			window._flush()
+			assert view.size() > 0, sublime.dialogs[-1:]
+			return view
+		record(f"open_{mib}mb", harness.timeit(openBig, repeat, setup=lambda: None), bytes=sizes["big"])
+
+		view = openBig(None)
+		def saveBig(_):
+			view._save()
+		record(f"save_{mib}mb", harness.timeit(saveBig, repeat, setup=lambda: view.run_command("insert", {"characters": "x"})), bytes=sizes["big"]) #an edit each time because unchanged buffers aren't uploaded
+
+		#reverting after a one line change on the server only downloads the changed chunks
+		def changeLine():
+			path = os.path.join(home, "big.txt")
+			with open(path, "rb") as file:
+				data = file.read()
+			with open(path, "wb") as file:
+				file.write(data[:len(data)//2] + b"one changed line\n" + data[len(data)//2:])
+		def revertBig(_):
+			view.listeners[0].on_revert()
+		stats = harness.timeit(revertBig, repeat, setup=changeLine)
+		last = [record for record in main.Trace.snapshot() if record["kind"] == "spawn"][-1]
+		record(f"revert_delta_{mib}mb", stats, bytes=sizes["big"], bytesIn=last["bytesIn"], bytesOut=last["bytesOut"])
+
+		errors = [msg for kind, msg in sublime.dialogs if kind == "error"]
+		if errors:
+			print("Errors reported by the plugin:\n" + "\n".join(errors), file=sys.stderr)
+
+	finally:
+		shutil.rmtree(home, ignore_errors=True)
+		shutil.rmtree(state, ignore_errors=True)
+
+	return results
+
+def gitRev():
+
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=harness.ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode().strip() or None
+	except OSError:
+		return None
+
+def main(argv=None):
+
+	parser = argparse.ArgumentParser(description="Open File Over SSH benchmarks")
+	parser.add_argument("--rtt", type=float, default=0, help="injected round trip time in seconds")
+	parser.add_argument("--bandwidth", type=float, default=0, help="bandwidth limit in bytes per second (0 is unlimited)")
+	parser.add_argument("--multiplexing", type=harness.settingArg, default=False, help="multiplexing setting passed to the plugin (default false)")
+	parser.add_argument("--repeat", type=int, default=5, help="repetitions of each benchmark")
+	parser.add_argument("--quick", action="store_true", help="smaller fixtures and fewer repetitions")
+	parser.add_argument("--output", default="bench.json", help="JSON results file (default bench.json)")
+	parser.add_argument("--history", help="JSON lines file to append this run's results to")
+	args = parser.parse_args(argv)
+
+	results = run(args)
+	report = {
+		"meta": {
+			"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+			"rev": gitRev(),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"rtt": args.rtt,
+			"bandwidth": args.bandwidth,
+			"multiplexing": args.multiplexing,
+			"quick": args.quick
+		},
+		"results": results
+	}
+
+	with open(args.output, "w") as file:
+		json.dump(report, file, indent="\t")
+	if args.history:
+		with open(args.history, "a") as file:
+			file.write(json.dumps(report) + "\n")
+
+	print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+	main()
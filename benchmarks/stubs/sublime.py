@@ -0,0 +1,403 @@
+"""
+ * A minimal stand-in for Sublime Text's `sublime` module.
+ * Only implements what the plugin uses, and just enough of it to drive the plugin from the benchmarks.
+ * Dialogs are recorded in `dialogs` instead of being shown.
+"""
+
+import os
+import enum
+import tempfile
+import threading
+
+_platform = "windows" if os.name == "nt" else "osx" if os.uname().sysname == "Darwin" else "linux"
+_settings = {}
+_windows = []
+_cacheDir = tempfile.mkdtemp(prefix="sofos-bench-cache-")
+
+dialogs = [] #(kind, message) of every dialog/status message shown
+quickPanelSelection = -1 #index quick panels select (-1 is cancel)
+
+DIALOG_CANCEL = 0
+DIALOG_YES = 1
+DIALOG_NO = 2
+
+
+def platform():
+	return _platform
+
+def version():
+	return "4180"
+
+def cache_path():
+	return _cacheDir
+
+def packages_path():
+	return _cacheDir
+
+
+#dialogs and messages
+def error_message(msg):
+	dialogs.append(("error", msg))
+
+def message_dialog(msg):
+	dialogs.append(("message", msg))
+
+def ok_cancel_dialog(msg, ok_title="", title=""):
+	dialogs.append(("ok_cancel", msg))
+	return True
+
+def yes_no_cancel_dialog(msg, yes_title="", no_title="", title=""):
+	dialogs.append(("yes_no_cancel", msg))
+	return DIALOG_YES
+
+def status_message(msg):
+	dialogs.append(("status", msg))
+
+
+#timeouts; there is no event loop so the main thread ones are run right away
+def set_timeout(callback, delay=0):
+	callback()
+
+def set_timeout_async(callback, delay=0):
+	timer = threading.Timer(delay / 1000, callback)
+	timer.daemon = True
+	timer.start()
+
+
+#settings
+class Settings(dict):
+
+	def get(self, key, default=None):
+		return super().get(key, default)
+
+	def set(self, key, value):
+		self[key] = value
+
+	def has(self, key):
+		return key in self
+
+	def erase(self, key):
+		self.pop(key, None)
+
+	def add_on_change(self, tag, callback):
+		pass
+
+	def clear_on_change(self, tag):
+		pass
+
+def load_settings(name):
+	return _settings.setdefault(name, Settings())
+
+def save_settings(name):
+	pass
+
+
+#api types
+class Region():
+
+	def __init__(self, a, b=None):
+		self.a = a
+		self.b = a if b == None else b
+
+	def begin(self):
+		return min(self.a, self.b)
+
+	def end(self):
+		return max(self.a, self.b)
+
+	def size(self):
+		return self.end() - self.begin()
+
+	def __eq__(self, other):
+		return isinstance(other, Region) and (self.a, self.b) == (other.a, other.b)
+
+	def __repr__(self):
+		return f"Region({self.a}, {self.b})"
+
+class Selection(list):
+
+	def clear(self):
+		del self[:]
+
+	def add(self, region):
+		self.append(region)
+
+	def add_all(self, regions):
+		self.extend(regions)
+
+class KindId(enum.IntEnum):
+	AMBIGUOUS = 0
+	KEYWORD = 1
+	TYPE = 2
+	FUNCTION = 3
+	NAMESPACE = 4
+	NAVIGATION = 5
+	MARKUP = 6
+	VARIABLE = 7
+	SNIPPET = 8
+	COLOR_REDISH = 9
+	COLOR_ORANGISH = 10
+	COLOR_YELLOWISH = 11
+	COLOR_GREENISH = 12
+	COLOR_CYANISH = 13
+	COLOR_BLUISH = 14
+	COLOR_PURPLISH = 15
+	COLOR_PINKISH = 16
+	COLOR_DARK = 17
+	COLOR_LIGHT = 18
+
+class ListInputItem():
+
+	def __init__(self, text, value, details="", annotation="", kind=(KindId.AMBIGUOUS, "", "")):
+		self.text = text
+		self.value = value
+		self.details = details
+		self.annotation = annotation
+		self.kind = kind
+
+class Html():
+
+	def __init__(self, text):
+		self.text = text
+
+
+#views and windows
+class View():
+
+	_nextId = 1
+
+	def __init__(self, window, fileName=None):
+		self._id = View._nextId
+		View._nextId += 1
+		self._window = window
+		self._settings = Settings()
+		self._text = ""
+		self._fileName = fileName
+		self._name = ""
+		self._readOnly = False
+		self._scratch = False
+		self._dirty = False
+		self._status = {}
+		self._sel = Selection()
+		self._ref = ""
+		self._changes = 0
+		self.listeners = []
+
+	def id(self):
+		return self._id
+
+	def window(self):
+		return self._window
+
+	def settings(self):
+		return self._settings
+
+	def size(self):
+		return len(self._text)
+
+	def substr(self, region):
+		return self._text[region.begin():region.end()] if isinstance(region, Region) else self._text[region]
+
+	def sel(self):
+		return self._sel
+
+	def file_name(self):
+		return self._fileName
+
+	def name(self):
+		return self._name
+
+	def set_name(self, name):
+		self._name = name
+
+	def retarget(self, path):
+		self._fileName = path
+
+	def is_read_only(self):
+		return self._readOnly
+
+	def set_read_only(self, val):
+		self._readOnly = val
+
+	def is_scratch(self):
+		return self._scratch
+
+	def set_scratch(self, val):
+		self._scratch = val
+
+	def is_dirty(self):
+		return self._dirty and not self._scratch #scratch buffers never report as being dirty
+
+	def is_loading(self):
+		return False
+
+	def change_count(self):
+		return self._changes
+
+	def is_valid(self):
+		return True
+
+	def set_encoding(self, encoding):
+		pass
+
+	def set_reference_document(self, text):
+		self._ref = text
+
+	def set_status(self, key, value):
+		self._status[key] = value
+
+	def erase_status(self, key):
+		self._status.pop(key, None)
+
+	def set_syntax_file(self, syntax):
+		pass
+
+	def assign_syntax(self, syntax):
+		pass
+
+	def show(self, location, *args, **kargs):
+		pass
+
+	def show_at_center(self, location, *args, **kargs):
+		pass
+
+	def text_point(self, row, col):
+		lines = self._text.split("\n")
+		return sum(len(line) + 1 for line in lines[:row]) + col
+
+	def rowcol(self, point):
+		before = self._text[:point]
+		return (before.count("\n"), len(before) - before.rfind("\n") - 1)
+
+	def line(self, region):
+		point = region.begin() if isinstance(region, Region) else region
+		start = self._text.rfind("\n", 0, point) + 1
+		end = self._text.find("\n", point)
+		return Region(start, len(self._text) if end == -1 else end)
+
+	def find_all(self, pattern, flags=0):
+		return []
+
+	def _edit(self, region, text):
+		self._text = self._text[:region.begin()] + text + self._text[region.end():]
+		self._dirty = True
+		self._changes += 1
+		for listener in self.listeners:
+			if hasattr(listener, "on_modified"):
+				listener.on_modified()
+
+	def insert(self, edit, point, text):
+		self._edit(Region(point), text)
+		return len(text)
+
+	def erase(self, edit, region):
+		self._edit(region, "")
+
+	def replace(self, edit, region, text):
+		self._edit(region, text)
+
+	def run_command(self, cmd, args=None):
+		import sublime_plugin
+		sublime_plugin._runTextCommand(self, cmd, args or {})
+
+	def close(self):
+		self._close()
+		return True
+
+	#harness helpers (not part of the sublime api)
+	def _save(self):
+		for listener in self.listeners:
+			if hasattr(listener, "on_pre_save"):
+				listener.on_pre_save()
+		self._dirty = False
+		for listener in self.listeners:
+			if hasattr(listener, "on_post_save"):
+				listener.on_post_save()
+
+	def _close(self):
+		for listener in self.listeners:
+			if hasattr(listener, "on_close"):
+				listener.on_close()
+		self._window._views.remove(self)
+
+class Window():
+
+	_nextId = 1
+
+	def __init__(self):
+		self._id = Window._nextId
+		Window._nextId += 1
+		self._views = []
+		self._pending = []
+		self._panels = {}
+		self._project = None
+		_windows.append(self)
+
+	def id(self):
+		return self._id
+
+	def views(self):
+		return list(self._views)
+
+	def active_view(self):
+		return self._views[-1] if self._views else None
+
+	def open_file(self, fname, flags=0, group=-1):
+		view = View(self, fname)
+		self._views.append(view)
+		self._pending.append(view)
+		return view
+
+	def new_file(self, flags=0, syntax=""):
+		view = View(self)
+		self._views.append(view)
+		return view
+
+	def focus_view(self, view):
+		pass
+
+	def create_output_panel(self, name, unlisted=False):
+		panel = self._panels[name] = View(self)
+		return panel
+
+	def find_output_panel(self, name):
+		return self._panels.get(name)
+
+	def destroy_output_panel(self, name):
+		self._panels.pop(name, None)
+
+	def project_data(self):
+		return self._project
+
+	def set_project_data(self, data):
+		self._project = data
+
+	def folders(self):
+		return [folder["path"] for folder in (self._project or {}).get("folders", [])]
+
+	def show_quick_panel(self, items, on_select, flags=0, selected_index=-1, on_highlight=None, placeholder=None):
+		dialogs.append(("quick_panel", placeholder))
+		on_select(quickPanelSelection)
+
+	def show_input_panel(self, caption, initial_text, on_done, on_change, on_cancel):
+		on_cancel()
+
+	def status_message(self, msg):
+		status_message(msg)
+
+	def run_command(self, cmd, args=None):
+		import sublime_plugin
+		sublime_plugin._runWindowCommand(self, cmd, args or {})
+
+	#harness helper (not part of the sublime api): "loads" opened files i.e. creates listeners and calls on_load
+	def _flush(self):
+		import sublime_plugin
+		while self._pending:
+			view = self._pending.pop(0)
+			sublime_plugin._attachListeners(view, load=True)
+
+def windows():
+	return list(_windows)
+
+def active_window():
+	return _windows[-1] if _windows else Window()
@@ -0,0 +1,105 @@
+"""
+ * A minimal stand-in for Sublime Text's `sublime_plugin` module.
+ * Commands and listeners are registered as they are subclassed so sublime.View/Window.run_command can find them.
+"""
+
+import re
+import sublime
+
+_textCommands = {}
+_windowCommands = {}
+_viewListeners = []
+_listeners = []
+
+
+def _commandName(cls):
+	name = cls.__name__
+	if name.endswith("Command"):
+		name = name[:-len("Command")]
+	return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).lower()
+
+def _runTextCommand(view, cmd, args):
+	if cmd in ("append", "insert"): #the built in commands the plugin and harness use
+		point = view.size() if cmd == "append" else (view.sel()[0].begin() if view.sel() else 0)
+		view.insert(None, point, args.get("characters", ""))
+		return
+	if cmd not in _textCommands:
+		return
+	_textCommands[cmd](view).run(object(), **args)
+
+def _runWindowCommand(window, cmd, args):
+	if cmd not in _windowCommands:
+		return
+	_windowCommands[cmd](window).run(**args)
+
+def _attachListeners(view, load=False):
+	for cls in _viewListeners:
+		if cls.is_applicable(view.settings()) and not any(isinstance(listener, cls) for listener in view.listeners):
+			listener = cls(view)
+			view.listeners.append(listener)
+			if load and hasattr(listener, "on_load"):
+				listener.on_load()
+
+def find_view_event_listener(view, cls):
+	return next((listener for listener in view.listeners if isinstance(listener, cls)), None)
+
+
+class CommandInputHandler():
+
+	def name(self):
+		name = self.__class__.__name__
+		return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name[:-len("InputHandler")] if name.endswith("InputHandler") else name).lower()
+
+class TextInputHandler(CommandInputHandler):
+	pass
+
+class ListInputHandler(CommandInputHandler):
+	pass
+
+class BackInputHandler(CommandInputHandler):
+	pass
+
+
+class TextCommand():
+
+	def __init_subclass__(cls, **kargs):
+		super().__init_subclass__(**kargs)
+		_textCommands[_commandName(cls)] = cls
+
+	def __init__(self, view):
+		self.view = view
+
+class WindowCommand():
+
+	def __init_subclass__(cls, **kargs):
+		super().__init_subclass__(**kargs)
+		_windowCommands[_commandName(cls)] = cls
+
+	def __init__(self, window):
+		self.window = window
+
+class ApplicationCommand():
+	pass
+
+class ViewEventListener():
+
+	def __init_subclass__(cls, **kargs):
+		super().__init_subclass__(**kargs)
+		_viewListeners.append(cls)
+
+	def __init__(self, view):
+		self.view = view
+
+	@classmethod
+	def is_applicable(cls, settings):
+		return True
+
+	@classmethod
+	def applies_to_primary_view_only(cls):
+		return True
+
+class EventListener():
+
+	def __init_subclass__(cls, **kargs):
+		super().__init_subclass__(**kargs)
+		_listeners.append(cls)
@@ -0,0 +1,1046 @@
+"""
+ * The engine of Open File Over SSH: the ssh transport, remote listings, and file reading and writing without any Sublime Text imports
+ *
+ * main.py is the Sublime adapter: it imports these names, calls configure with the plugin's settings, and does all of the UI.
+ * The engine also works from plain python for scripts, profiling, and load tests (run python from this folder or add it to sys.path):
+ *
+ *     import engine
+ *     engine.configure({"multiplexing": "5m"}) #any of the plugin's settings; the defaults are the plugin's defaults
+ *     with engine.Remote("user@server") as remote:
+ *         for entry in remote.listDir("/etc"):
+ *             print(entry.name, entry.size)
+ *         data = remote.read("/etc/hosts")
+ *         remote.write("/tmp/hosts", data)
+ *
+ * Remote operations are recorded in the Trace and measured by the LinkProfile just like in the plugin.
+"""
+
+import os #link profile saving and windows detection
+import sys #windows detection and watchdog stack samples
+import json #link profile saving
+import math #pretty size calcs and delta chunk sizes
+import time #tracing
+import shlex #shell arg escaping
+import string #random string creation
+import random #random string creation
+import hashlib #synced content hashes
+import threading #stderr consuming
+import traceback #watchdog stack samples
+import subprocess #popen
+import contextlib #watchdog remote command marking
+import collections #trace ring buffer
+
+
+isWindows = (sys.platform == "win32")
+
+settings = {} #anything with a get(key, default) method e.g. a dict or sublime.Settings
+cacheDir = None #folder the LinkProfile is saved in; None doesn't save it
+errorMessage = lambda msg: print(f"OpenFileOverSSH: {msg}") #shows SshShell's connection errors (throwOnSshErr)
+
+#sets where the engine gets its settings from, where it saves, and how it shows errors. Arguments left as None are unchanged
+def configure(settingsSource=None, *, cache=None, showError=None):
+
+	global settings, cacheDir, errorMessage
+
+	if settingsSource != None:
+		settings = settingsSource
+	if cache != None:
+		cacheDir = cache
+	if showError != None:
+		errorMessage = showError
+
+
+
+#gets the required startup info for Popen
+def getStartupInfo():
+
+	#On Windows, the command shell is opened while the Popen command is running and this fixes that
+	startupinfo = None
+	if isWindows:
+		startupinfo = subprocess.STARTUPINFO()
+		startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+	return startupinfo
+
+#makes the appropriate ssh args using the settings file and arguments
+def getSshArgs(*, server=None, port=None):
+
+	args = ["-T"] #Non-interactive mode. While non-interactive will be the default, we'll get an unable to allocate tty error message without this
+
+	if port not in (None, 0, ""):
+		args.extend(["-p", str(port)])
+
+	#compression (see LinkProfile)
+	compression = settings.get("compression", "auto")
+	if compression == True or compression == "auto" and server != None and LinkProfile.isNarrow(server, port):
+		args.append("-C")
+
+	if not settings.get("useOpenSshConfigArgs", True):
+		return args
+
+	#no user input
+	args.extend(["-o", "BatchMode=yes"]) #Batch mode is StrictHostKeyChecking=yes (as opposed to ask) and PreferredAuthentications=publickey, i.e. no user input
+
+	#host keys
+	keyChecking = settings.get("hostKeyChecking", None)
+	if keyChecking != None:
+		if isinstance(keyChecking, bool) or keyChecking in ["yes", "no", "accept-new"]:
+			args.extend(["-o", f"StrictHostKeyChecking={keyChecking}"])
+			if not keyChecking or keyChecking == "no":
+				args.extend(["-o", "UserKnownHostsFile=/dev/null"]) #don't save keys if key checking is disabled
+		else:
+			print(f"OpenFileOverSSH: Unrecognized hostKeyChecking setting ({keyChecking}), falling back to default")
+
+	#timeout
+	timeout = settings.get("timeout", 7)
+	if timeout != None:
+		if not (isinstance(timeout, int) or isinstance(timeout, str) and timeout.isdecimal()):
+			print(f"OpenFileOverSSH: Unrecognized timeout setting ({timeout}), falling back to default")
+			timeout = 7
+		args.extend(["-o", f"ConnectTimeout={timeout}"]) #not specifying this uses system tcp timeout
+
+	#multiplexing
+	persist = settings.get("multiplexing", "5m" if not isWindows else False) #OpenSSH_for_Windows (as of 8/2024) does not support multiplexing
+	if persist not in [None, False, 0, "0"]:
+
+		if isinstance(persist, bool) and persist: #True == 1 so must check if its a bool
+			persist = "5m"
+		if not (isinstance(persist, int) or isinstance(persist, str) and (persist.isdecimal() or persist[-1] in ["m", "s"] and persist[:-1].isdecimal())):
+			print(f"OpenFileOverSSH: Unrecognized multiplexing setting ({persist}), falling back to default")
+			persist = "5m"
+
+		#Using %C to both escape special characters and obfuscate the connection details
+		#Auto creates a new master socket if it doesn't exist
+		args.extend(["-o", "ControlPath=~/.ssh/SOFOS_cm-%C", "-o", "ControlMaster=auto", "-o", f"ControlPersist={persist}"])
+
+	return args
+
+#makes an error string for an ssh error. sshStderr can be string or bytes
+def makeErrorText(title, sshRetCode, sshStderr):
+
+	if isinstance(sshStderr, bytes) or isinstance(sshStderr, bytearray):
+		sshStderr = sshStderr.decode()
+
+	error = sshStderr and sshStderr.replace("\r", "").rstrip("\n") #ssh's output to stderr has line endings of CRLF per ssh specs. Remove trailing new line too
+	errType = "ssh" if sshRetCode == 255 or sshRetCode == None else "posix signal" if sshRetCode < 0 else "remote"
+
+	if error:
+		msg = f"{title}.\n\nCode: {sshRetCode} ({errType})\nError: {error}"
+		lower = error.casefold()
+		if errType == "ssh":
+			if "host key verification failed" in lower:
+				msg += "\n\nSSH to this server with your terminal to verify the host key or change the hostKeyChecking setting."
+			if "permission denied" in lower:
+				msg += "\n\nYou must setup ssh public key authentication with this server for this plugin to work."
+			if "timed out" in lower:
+				msg += "\n\nThe timeout time can be changed in this plugin's settings if needed."
+			if "getsockname failed: bad file descriptor" in lower and isWindows:
+				msg += "\n\nThis is likely from SSH not supporting multiplexing on windows. You can disable multiplexing in the settings file."
+		return msg
+	else:
+		return f"{title}.\nAn unknown {errType} error occurred.\nError Code: {sshRetCode}"
+
+
+
+#formats a byte count with binary units e.g. 1.5K or 20M
+def prettySize(bytes):
+
+	if bytes == 0:
+		return "0"
+	sizes = ("B", "K", "M", "G", "T", "P", "E", "Z", "Y") #future proof lol
+	i = int(math.floor(math.log(bytes, 1024))) #uses powers of 2 e.g. MiB
+	p = math.pow(1024, i)
+	s = bytes / p
+	return f"{int(round(s)) if s.is_integer() else round(s, 1)}{sizes[i]}"
+
+
+
+#records remote operations and pallet steps in a bounded ring buffer
+class Trace():
+
+	"""
+	 * Each record is a dictionary with these keys:
+	 *     time: when the operation started (epoch seconds)
+	 *     kind: connect (SshShell startup), runCmd (SshShell command), prefetch (background SshShell command), spawn (one off ssh process), step (pallet/plugin callback), or block (see Watchdog)
+	 *     server and port: where the operation went (None for steps before a server is known)
+	 *     what: the command class (first word of the remote command e.g. ls or cat) or the callback name for steps
+	 *     queue: seconds spent waiting for the ssh shell to be free
+	 *     rtt: seconds from sending the command to receiving all of its output
+	 *     bytesIn and bytesOut: bytes read from and written to ssh
+	 *     code: the exit code (None for steps)
+	 * The buffer size is controlled by the traceSize setting and 0 disables tracing.
+	"""
+
+	records = collections.deque(maxlen=500)
+	lock = threading.Lock() #records are added from background threads too
+	observers = [] #functions called with every record (even when tracing is off) on the thread that made it, e.g. the plugin's Profiler
+
+	@staticmethod
+	def cmdClass(cmd):
+
+		words = cmd.lstrip("({ ").split(maxsplit=1)
+		return words[0].rsplit("/", 1)[-1] if words else ""
+
+	@classmethod
+	def add(cls, kind, server, port, what, queue=0.0, rtt=0.0, bytesIn=0, bytesOut=0, code=None):
+
+		if kind in ("runCmd", "spawn"):
+			LinkProfile.sample(kind, server, port, rtt, bytesIn, bytesOut, code) #even when tracing is off
+
+		size = settings.get("traceSize", 500)
+		if not size and not cls.observers:
+			return
+
+		record = {
+			"time": time.time() - queue - rtt,
+			"kind": kind,
+			"server": server,
+			"port": port or None,
+			"what": what if kind in ("step", "block") else cls.cmdClass(what),
+			"queue": queue,
+			"rtt": rtt,
+			"bytesIn": bytesIn,
+			"bytesOut": bytesOut,
+			"code": code
+		}
+
+		for observer in cls.observers:
+			observer(record)
+		if not size:
+			return
+
+		with cls.lock:
+			if cls.records.maxlen != size:
+				cls.records = collections.deque(cls.records, maxlen=size)
+			cls.records.append(record)
+
+	@classmethod
+	def snapshot(cls):
+
+		with cls.lock:
+			return list(cls.records)
+
+	@staticmethod
+	def percentile(values, pct): #nearest rank; values must be sorted
+
+		if not values:
+			return 0.0
+		return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+	@classmethod
+	def summary(cls, records=None): #returns {(server, port): {ops, p50, p90, p99, max, bytesIn, bytesOut, throughput, errors}}
+
+		groups = {}
+		for record in records if records != None else cls.snapshot():
+			if record["kind"] in ("step", "block"):
+				continue
+			groups.setdefault((record["server"], record["port"]), []).append(record)
+
+		summary = {}
+		for key, group in groups.items():
+			rtts = sorted(record["rtt"] for record in group)
+			busy = sum(rtts)
+			bytesIn = sum(record["bytesIn"] for record in group)
+			bytesOut = sum(record["bytesOut"] for record in group)
+			summary[key] = {
+				"ops": len(group),
+				"p50": cls.percentile(rtts, 50),
+				"p90": cls.percentile(rtts, 90),
+				"p99": cls.percentile(rtts, 99),
+				"max": rtts[-1],
+				"queue": sum(record["queue"] for record in group),
+				"bytesIn": bytesIn,
+				"bytesOut": bytesOut,
+				"throughput": (bytesIn + bytesOut) / busy if busy else 0.0,
+				"errors": sum(1 for record in group if record["code"] not in (0, None))
+			}
+
+		return summary
+
+#per server link measurements (latency and throughput) taken passively from the Trace's remote operations; saved across restarts
+class LinkProfile():
+
+	"""
+	 * Latency is an EWMA of the shell commands that moved little data, i.e. mostly waiting on the link
+	 * Throughput is an EWMA of the bytes per second of the operations that moved at least THROUGHPUT_BYTES, after taking out the latency
+	 * Samples far from the current value (e.g. a slow find) only move it as far as OUTLIER times (or divided by OUTLIER)
+	 * The "auto" strategy settings use the profile:
+	 *     slow links (slowLinkLatency) skip pathChecking's test -x/-r round trip and batch multi file opens into one command
+	 *     narrow links (slowLinkThroughput) turn on ssh compression
+	 * Profiles are saved to cache_path()/OpenFileOverSSH/links.json, at most every SAVE_DELAY seconds
+	"""
+
+	ALPHA = 0.2
+	LATENCY_BYTES = 4096
+	THROUGHPUT_BYTES = 65536
+	SPAWN_THROUGHPUT_BYTES = 1048576 #spawns include the ssh connection setup (when not multiplexed) so they need more data to say anything
+	OUTLIER = 4
+	SAVE_DELAY = 30
+
+	profiles = {} #"server:port": {"latency": seconds or None, "throughput": bytes/s or None, "samples": count}
+	lock = threading.Lock()
+	dirty = False
+
+	@staticmethod
+	def key(server, port):
+		return f"{server}:{port or ''}"
+
+	@staticmethod
+	def path(): #None when not persisted (see configure)
+		return os.path.join(cacheDir, "links.json") if cacheDir else None
+
+	@classmethod
+	def ewma(cls, old, sample):
+
+		if old == None:
+			return sample
+		sample = min(max(sample, old / cls.OUTLIER), old * cls.OUTLIER)
+		return old + cls.ALPHA * (sample - old)
+
+	@classmethod
+	def sample(cls, kind, server, port, rtt, bytesIn, bytesOut, code):
+
+		if server == None or code != 0:
+			return
+
+		moved = bytesIn + bytesOut
+		with cls.lock:
+			profile = cls.profiles.setdefault(cls.key(server, port), {"latency": None, "throughput": None, "samples": 0})
+			if kind == "runCmd" and moved <= cls.LATENCY_BYTES:
+				profile["latency"] = cls.ewma(profile["latency"], rtt)
+			elif moved >= (cls.THROUGHPUT_BYTES if kind == "runCmd" else cls.SPAWN_THROUGHPUT_BYTES):
+				busy = rtt - (profile["latency"] or 0)
+				if busy > 0:
+					profile["throughput"] = cls.ewma(profile["throughput"], moved / busy)
+			else:
+				return
+			profile["samples"] += 1
+
+			if cls.dirty:
+				return
+			cls.dirty = True
+
+		timer = threading.Timer(cls.SAVE_DELAY, cls.save)
+		timer.daemon = True
+		timer.start()
+
+	@classmethod
+	def get(cls, server, port):
+
+		with cls.lock:
+			return dict(cls.profiles.get(cls.key(server, port), {"latency": None, "throughput": None, "samples": 0}))
+
+	@classmethod
+	def isSlow(cls, server, port): #unmeasured links are fast
+
+		latency = cls.get(server, port)["latency"]
+		return latency != None and latency * 1000 >= settings.get("slowLinkLatency", 80)
+
+	@classmethod
+	def isNarrow(cls, server, port):
+
+		throughput = cls.get(server, port)["throughput"]
+		return throughput != None and throughput < settings.get("slowLinkThroughput", 1048576)
+
+	@classmethod
+	def describe(cls, server, port):
+
+		profile = cls.get(server, port)
+		if not profile["samples"]:
+			return "Link not measured yet"
+
+		latency = f"{profile['latency'] * 1000:.0f}ms" if profile["latency"] != None else "?ms"
+		throughput = f"{prettySize(int(profile['throughput']))}/s" if profile["throughput"] != None else "?/s"
+		kinds = [kind for kind, on in (("slow", cls.isSlow(server, port)), ("narrow", cls.isNarrow(server, port))) if on]
+		return f"{latency} {throughput}: {' and '.join(kinds) + ' link' if kinds else 'fast link'} (select to measure again)"
+
+	@classmethod
+	def forget(cls, server, port):
+
+		with cls.lock:
+			cls.profiles.pop(cls.key(server, port), None)
+		cls.save()
+
+	@classmethod
+	def load(cls):
+
+		if not cls.path():
+			return
+
+		try:
+			with open(cls.path()) as file:
+				profiles = json.load(file)
+		except (OSError, ValueError):
+			return
+
+		with cls.lock:
+			cls.profiles.update(profiles)
+
+	@classmethod
+	def save(cls):
+
+		with cls.lock:
+			cls.dirty = False
+			data = json.dumps(cls.profiles, indent="\t")
+
+		if not cls.path():
+			return
+
+		try:
+			os.makedirs(os.path.dirname(cls.path()), exist_ok=True)
+			with open(cls.path(), "w") as file:
+				file.write(data)
+		except OSError as e:
+			print(f"OpenFileOverSSH: unable to save link profiles: {e}")
+
+#debug: reports plugin callbacks that hold Sublime's UI thread for longer than the watchdog setting (in milliseconds)
+class Watchdog():
+
+	"""
+	 * Callbacks are marked by the traced decorator and remote commands by SshShell.runCmd and runSsh.
+	 * A background thread polls the marks and takes a stack sample of the UI thread once a callback goes over the threshold.
+	 * When the callback returns, the handler chain, the remote command that was running, and the sample are printed to the console
+	 *     and added to the Trace as a block record (shown in the Trace panel).
+	"""
+
+	uiThread = threading.get_ident() #plugins are loaded on the same thread that runs the callbacks
+	handlers = [] #names of the running (nested) UI thread callbacks
+	start = None #when the outermost callback started
+	remote = None #the remote command running on the UI thread
+	sample = None #(handler chain, remote, stack) captured by the polling thread for the current callback
+	reports = collections.deque(maxlen=50)
+	thread = None
+
+	@classmethod
+	def threshold(cls): #seconds or None when disabled
+
+		ms = settings.get("watchdog", False)
+		return ms / 1000 if isinstance(ms, (int, float)) and not isinstance(ms, bool) and ms > 0 else None
+
+	@classmethod
+	def enter(cls, name):
+
+		if threading.get_ident() != cls.uiThread or cls.threshold() == None:
+			return False
+
+		if not cls.handlers:
+			cls.start = time.perf_counter()
+			cls.sample = None
+			if not cls.thread or not cls.thread.is_alive():
+				cls.thread = threading.Thread(target=cls.poll, daemon=True)
+				cls.thread.start()
+		cls.handlers.append(name)
+		return True
+
+	@classmethod
+	def exit(cls, server, port):
+
+		chain = " > ".join(cls.handlers)
+		cls.handlers.pop()
+		if cls.handlers:
+			return
+
+		elapsed = time.perf_counter() - cls.start
+		threshold = cls.threshold()
+		cls.start = None
+		if threshold == None or elapsed < threshold:
+			return
+
+		chain, remote, stack = cls.sample or (chain, cls.remote, None)
+		report = {"time": time.time() - elapsed, "handler": chain, "blocked": elapsed, "remote": remote, "stack": stack}
+		cls.reports.append(report)
+		Trace.add("block", server, port, chain, rtt=elapsed)
+
+		print(f"OpenFileOverSSH: watchdog: {chain} blocked the UI thread for {elapsed * 1000:.0f}ms" + (f" (remote command: {remote})" if remote else ""))
+		if stack:
+			print("".join(stack).rstrip("\n"))
+
+	@classmethod
+	@contextlib.contextmanager
+	def remoteCmd(cls, cmd): #marks cmd as the running remote command if called on the UI thread
+
+		if threading.get_ident() != cls.uiThread:
+			yield
+			return
+
+		prev = cls.remote
+		cls.remote = cmd if len(cmd) <= 200 else cmd[:200] + "..."
+		try:
+			yield
+		finally:
+			cls.remote = prev
+
+	@classmethod
+	def poll(cls):
+
+		while True:
+
+			threshold = cls.threshold()
+			if threshold == None:
+				return #setting was turned off; enter() will restart the thread
+			time.sleep(max(threshold / 4, 0.01))
+
+			start = cls.start
+			if start != None and cls.sample == None and time.perf_counter() - start >= threshold:
+				frame = sys._current_frames().get(cls.uiThread)
+				cls.sample = (" > ".join(cls.handlers), cls.remote, traceback.format_stack(frame) if frame else None)
+
+#runs a single remote command with a new ssh process; blocking. returns: (stdout, retCode, stderr) as bytes
+def runSsh(server, port, cmd, input=None, *, timeout=None):
+
+	start = time.perf_counter()
+	p = subprocess.Popen(["ssh", *getSshArgs(server=server, port=port), server, cmd], stdin=subprocess.PIPE if input != None else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=getStartupInfo())
+
+	with Watchdog.remoteCmd(f"{server}: {cmd}"):
+		try:
+			out, err = p.communicate(input, timeout=timeout)
+		except subprocess.TimeoutExpired:
+			p.kill()
+			out, err = p.communicate()
+			err += b"Timed out after %ds" % timeout
+
+	Trace.add("spawn", server, port, cmd, rtt=time.perf_counter() - start, bytesIn=len(out) + len(err), bytesOut=len(input) if input else 0, code=p.returncode)
+	return (out, p.returncode, err)
+
+#makes a remote command that runs each command and prints "code bytes" before its output so that (binary) outputs can be split apart. See parseFramed
+def makeFramedCmd(cmds):
+
+	return (
+		'if t=$(mktemp); then ' +
+		"".join(f'{{ {cmd}; }} > "$t" 2>/dev/null; c=$?; printf \'%s %s\\n\' $c $(($(wc -c < "$t"))); cat -- "$t"; ' for cmd in cmds) +
+		'rm -f -- "$t"; fi' #no exit because this can run in the SshShell
+	)
+
+#parses makeFramedCmd's output; returns a (code, output) for each command, or None for commands without output (e.g. mktemp failed)
+def parseFramed(out, count):
+
+	results = []
+	pos = 0
+	while len(results) < count:
+		end = out.find(b"\n", pos)
+		try:
+			code, size = (int(num) for num in out[pos:end].split())
+		except ValueError:
+			break
+		results.append((code, out[end+1:end+1+size]))
+		pos = end + 1 + size
+
+	return results + [None] * (count - len(results))
+
+#makes a remote command that prints the sha256 of each path on its own line. See parseHashes
+#sha256sum isn't POSIX, so fallback to shasum (MacOS and BSD)
+REMOTE_HASH_FUNC = "sofosHash() { if command -v sha256sum >/dev/null 2>&1; then sha256sum; else shasum -a 256; fi; }; "
+
+def remoteHashCmd(paths):
+
+	return ( #grouped so that `cmd && remoteHashCmd` doesn't only apply the && to the function definition
+		"{ " + REMOTE_HASH_FUNC +
+		f"for p in {' '.join(shlex.quote(path) for path in paths)}; do " +
+		"if [ -r \"$p\" ]; then h=$(sofosHash < \"$p\" 2>/dev/null); printf '%s\\n' \"${h%% *}\"; else printf '!\\n'; fi; done; }"
+	)
+
+#parses remoteHashCmd's output; returns a list with a hash string, False (path is missing/unreadable), or None (unknown, e.g. no sha256 tool) for each path
+def parseHashes(out, count):
+
+	lines = (out.decode() if isinstance(out, bytes) else out).split("\n")
+	lines += [""] * (count - len(lines))
+	return [False if line == "!" else line if len(line) == 64 else None for line in lines[:count]]
+
+#hash stored in a remote view's ssh_sha256 setting for the content last read from or written to the server
+def contentHash(data):
+	return hashlib.sha256(data).hexdigest()
+
+"""
+ * Delta reloading (rsync style): only the parts of a remote file that changed are downloaded
+ *
+ * Both ends split the file into content defined chunks: a chunk ends after a line whose crc32 has its low bits clear (or at a max size)
+ * Because the cut points depend on the content and not on offsets, an inserted or deleted line only changes the chunks around it
+ * The old contents' chunk hashes (8 bytes of md5 each) are sent to the server where DELTA_HELPER (python3) chunks the new file
+ *     and answers with copies of old chunks and literal bytes for the chunks it doesn't have
+ * The last line has the new file's sha256 so a bad rebuild is never shown
+"""
+
+#returns the end offset of each chunk; shared word for word by the plugin and DELTA_HELPER so both ends cut in the same places
+DELTA_CHUNKS = r"""
+def chunks(data, mask, maxSize):
+	import zlib
+	view = memoryview(data)
+	size = len(data)
+	ends = []
+	start = pos = 0
+	while pos < size:
+		nl = data.find(b"\n", pos, start + maxSize)
+		if nl == -1:
+			pos = start = min(start + maxSize, size)
+			ends.append(pos)
+			continue
+		line, pos = pos, nl + 1
+		if zlib.crc32(view[line:pos]) & mask == 0:
+			start = pos
+			ends.append(pos)
+	if start < size:
+		ends.append(size)
+	return ends
+"""
+
+DELTA_HELPER = DELTA_CHUNKS + r"""
+import sys, hashlib
+path, mask, maxSize = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+sig = sys.stdin.buffer.read()
+index = {}
+for i in range(len(sig) // 8):
+	index.setdefault(sig[i*8:i*8+8], i)
+with open(path, "rb") as f:
+	data = f.read()
+out = sys.stdout.buffer
+start = 0
+literal = None
+run = None
+for end in chunks(data, mask, maxSize) + [None]:
+	i = index.get(hashlib.md5(data[start:end]).digest()[:8]) if end is not None else None
+	if run and (i is None or run[0] + run[1] != i):
+		out.write(b"C%d %d\n" % run)
+		run = None
+	if literal is not None and (i is not None or end is None):
+		out.write(b"L%d\n" % (start - literal))
+		out.write(data[literal:start])
+		literal = None
+	if end is None:
+		break
+	if i is None:
+		literal = start if literal is None else literal
+	else:
+		run = (run[0], run[1] + 1) if run else (i, 1)
+	start = end
+out.write(b"E" + hashlib.sha256(data).hexdigest().encode() + b"\n")
+"""
+
+deltaNamespace = {}
+exec(DELTA_CHUNKS, deltaNamespace)
+deltaChunks = deltaNamespace["chunks"]
+
+#downloads a remote file by only fetching what changed since old (bytes); returns the new bytes or None when not possible (e.g. no python3)
+def deltaFetch(server, port, path, old):
+
+	#chunks average about sqrt(8 * size) bytes which balances the hash upload with the literal download around each change
+	lines = old.count(b"\n") + 1
+	target = max(1024, int(math.sqrt(8 * len(old))))
+	mask = (1 << max(0, round(math.log2(max(1, target * lines / max(1, len(old))))))) - 1
+	maxSize = target * 4
+
+	ends = deltaChunks(old, mask, maxSize)
+	starts = [0] + ends
+	sig = b"".join(hashlib.md5(old[start:end]).digest()[:8] for start, end in zip(starts, ends))
+
+	cmd = f"if command -v python3 >/dev/null 2>&1; then python3 -c {shlex.quote(DELTA_HELPER)} {shlex.quote(path)} {mask} {maxSize}; else echo sofos-no-python; fi"
+	out, code, err = runSsh(server, port, cmd, sig)
+	if code != 0 or out.startswith(b"sofos-no-python"):
+		return None
+
+	parts = []
+	pos = 0
+	try:
+		while True:
+			end = out.index(b"\n", pos)
+			op = out[pos:end]
+			pos = end + 1
+			if op.startswith(b"L"):
+				count = int(op[1:])
+				parts.append(out[pos:pos+count])
+				pos += count
+			elif op.startswith(b"C"):
+				i, count = (int(num) for num in op[1:].split())
+				parts.append(old[starts[i]:starts[i+count]])
+			elif op.startswith(b"E"):
+				new = b"".join(parts)
+				return new if contentHash(new) == op[1:].decode() else None
+			else:
+				return None
+	except (ValueError, IndexError): #truncated or garbled output
+		return None
+
+#remote command that prints the part of a file given by a ssh_range view setting (see the plugin's rangeInputHandler)
+def makeRangeCmd(path, rng):
+
+	path = shlex.quote(path)
+	if rng["unit"] == "lines":
+		end = rng["start"] + rng["count"] - 1
+		return f"sed -n '{rng['start']},{end}p;{end}q' -- {path}"
+
+	return f"tail -c +{rng['start'] + 1} -- {path} | head -c {rng['count']}" #tail seeks in regular files so this doesn't read the skipped part
+
+#handles the input pallet's ssh shell
+class SshShell():
+	"""
+	 * all methods of this class including the constructor are blocking accept for isAlive()
+	 * after the constructor returns, ssh has either errored or is connected to remote and ready to receive commands
+	"""
+
+	setupCmds = [
+		"export LC_TIME=POSIX" #set ls -l to output a standardized time format
+	]
+
+	def __init__(self, userAndServer, port=None):
+
+		self.server = userAndServer
+		self.port = port
+		self.lock = threading.Lock() #one command at a time; the time spent waiting here is the trace's queue time
+		self.shell = subprocess.Popen(["ssh", *getSshArgs(server=userAndServer, port=port), userAndServer], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=getStartupInfo())
+		_, code, _ = self.runCmd("; ".join(self.setupCmds), traceKind="connect") #read past all login information and run the setupCmds; will block until completed or error
+
+		"""
+		 * Theoretically if ret is false, isAlive should also be false.
+		 * However on windows this is not always the case.
+		 * For example, on initial ssh error (host key, password auth, multiplexing) in windows:
+		 *    ret is false because the read() returned EOF
+		 *    isAlive() is true (because ssh hasn't exited yet??)
+		 *    if this isn't caught, the next write()/flush() will error with broken pipe (which is EINVAL on python windows)
+		 * Leave it up to windows to make code complicated :(
+		"""
+		if self.isAlive() and code != 255:
+			self.thread = threading.Thread(target=self.shell.stderr.read, daemon=True) #consume sterr so a full pipe doesn't block our process
+			self.thread.start()
+			self.error = None
+		else:
+			self.error = self.shell.stderr.read().decode().replace("\r", "").rstrip("\n") #ssh's output to stderr has line endings of CRLF per ssh specs. Remove trailing new line too
+			if self.isAlive(): #ensure the process is dead (in case we got here through ret being False); this is needed because isAlive is used to check for errors
+				self.close(timeout=0.25)
+
+	@staticmethod
+	def quote(str): #shlex.quote but an empty string stays empty
+		return str and shlex.quote(str)
+
+	@property
+	def retCode(self):
+		return self.shell.returncode
+
+	@classmethod
+	def _genSeekingStr(cls):
+		return "A random string for seeking" + ("".join([random.choice(string.ascii_uppercase + string.digits) for _ in range(30)]))
+
+	def isAlive(self):
+		return self.shell.poll() == None
+
+	def runCmd(self, cmd, splitLines=True, decode=True, *, throwOnSshErr=False, traceKind="runCmd"): #returns: (stdout, retCode, stderr)
+
+		"""
+		 * As of right now, stderr will usually be None to indicate unable to read stderr
+		 *
+		 * Until this function can actually return stderr, throwOnSshErr will be available
+		 * When True, this function will display an error message and raise an exception if an Ssh Error (i.e. connection dropped) occurs
+		 * Use this to avoid needing to error check in calling code
+		"""
+
+		queued = time.perf_counter()
+		with self.lock:
+			start = time.perf_counter()
+			ret = None
+			try:
+				with Watchdog.remoteCmd(f"{self.server}: {cmd}"):
+					ret = self._runCmd(cmd, splitLines, decode, throwOnSshErr)
+				return ret
+			finally:
+				out, code, _ = ret or ((), self.retCode or 255, None)
+				bytesIn = sum(len(line) + splitLines for line in out) if not isinstance(out, (str, bytes)) else len(out)
+				Trace.add(traceKind, self.server, self.port, cmd, start - queued, time.perf_counter() - start, bytesIn, len(cmd) + 1, code)
+
+	def _runCmd(self, cmd, splitLines, decode, throwOnSshErr):
+
+		#write
+		seekingString = self._genSeekingStr()
+		if cmd != "":
+			cmd += "; "
+		cmd += f"printf \"\\n$?\\n{seekingString}\\n\"\n" #printf "\n retCode \n seekingStr \n"
+		seekingString = seekingString.encode()
+
+		try:
+			self.shell.stdin.write(cmd.encode())
+			self.shell.stdin.flush()
+		except (BrokenPipeError, OSError) as e: #will catch closed pipe errors if ssh has terminated (BrokenPipeError on unix, OSError EINVAL on windows)
+
+			self.shell.poll() #set returncode if its available (on windows its prolly not)
+			if throwOnSshErr:
+				errorMessage(makeErrorText("Lost connection to the server (write)", self.retCode or 255, str(e)))
+				raise Exception("Ssh Connection Drop")
+
+			stderr = "Connection lost: " + str(e)
+			return ([] if splitLines else "" if decode else b"", self.retCode or 255, stderr if decode else stderr.encode())
+
+
+		#read
+		lines = []
+		while True:
+
+			line = self.shell.stdout.readline()
+
+			if len(line) == 0: #EOF i.e. error
+
+				self.shell.poll()
+				if throwOnSshErr:
+					errorMessage(makeErrorText("Lost connection to the server (read)", self.retCode or 255, "Encountered EOF"))
+					raise Exception("Ssh Connection Drop")
+
+				stderr = "Connection lost: encountered EOF during read"
+				return ([] if splitLines else "" if decode else b"", self.retCode or 255, stderr if decode else stderr.encode())
+
+			if line[:-1] == seekingString:
+				break;
+
+			if splitLines:
+				line = line.rstrip(b"\n")
+			if decode:
+				line = line.decode()
+			lines.append(line)
+
+
+		#return
+		retCode = int(lines.pop())
+
+		if len(lines[-1]) == (not splitLines): #remove the extra \n added with printf
+			lines.pop()
+		elif not splitLines:
+			lines[-1] = lines[-1][:-1]
+
+		return (lines if splitLines else ("" if decode else b"").join(lines), retCode, None)
+
+	def close(self, timeout=None):
+
+		#close/kill ssh
+		if self.isAlive():
+
+			try:
+				self.shell.stdin.write(b"exit\n")
+				self.shell.stdin.flush()
+			except (BrokenPipeError, OSError):
+				pass
+			try:
+				self.shell.stdin.close() #will also close the ssh process
+			except (BrokenPipeError, OSError):
+				pass
+
+			try:
+				self.shell.wait(timeout)
+			except TimeoutExpired:
+				print("OpenFileOverSSH: ssh exit timed out, killing...")
+				self.ssh.terminate()
+				try:
+					self.shell.wait(timeout)
+				except TimeoutExpired:
+					self.shell.kill()
+					self.shell.wait()
+
+			if self.retCode != 0:
+				print("OpenFileOverSSH: ssh finished with return code %d" % self.shell.returncode)
+
+
+		#clean up
+		try:
+			self.thread.join() #join thread to free up resources
+		except AttributeError: #no thread to join
+			pass
+
+	def __del__(self):
+
+		self.close()
+
+#idle SshShells that were opened ahead of time (see the plugin's prewarm) and can be taken by the next file browser session to the same server
+class ShellPool():
+
+	IDLE_TIME = 300 #seconds an unused shell is kept open
+
+	shells = {} #(server, port): (SshShell, time added)
+	lock = threading.Lock()
+
+	@staticmethod
+	def key(server, port):
+		return (server, str(port or ""))
+
+	@classmethod
+	def put(cls, shell):
+
+		if not shell.isAlive():
+			return
+
+		with cls.lock:
+			old = cls.shells.get(cls.key(shell.server, shell.port))
+			cls.shells[cls.key(shell.server, shell.port)] = (shell, time.time())
+
+		if old:
+			old[0].close()
+
+		timer = threading.Timer(cls.IDLE_TIME, cls.expire, (shell,))
+		timer.daemon = True
+		timer.start()
+
+	@classmethod
+	def take(cls, server, port): #returns a connected SshShell or None
+
+		with cls.lock:
+			shell, _ = cls.shells.pop(cls.key(server, port), (None, None))
+
+		return shell if shell and shell.isAlive() else None
+
+	@classmethod
+	def has(cls, server, port):
+
+		with cls.lock:
+			return cls.key(server, port) in cls.shells
+
+	@classmethod
+	def expire(cls, shell):
+
+		with cls.lock:
+			key = cls.key(shell.server, shell.port)
+			if cls.shells.get(key, (None,))[0] is not shell:
+				return #already taken or replaced
+			del cls.shells[key]
+
+		shell.close()
+
+
+#an entry of a `ls -1Lp -lgo` listing (see parseLs)
+#size is the file's size in bytes, the folder's number of sub-folders, ls's text when that isn't a number (e.g. ? when ls is confused), or None without XSI ls
+LsEntry = collections.namedtuple("LsEntry", ("name", "folder", "size", "confused"))
+
+#makes the ls command parsed by parseLs; path must already be quoted
+def makeLsCmd(path, hidden=False, lessXSI=False):
+	return f"/bin/ls -1Lp {'-lgo' if not lessXSI else ''} {'-a' if hidden else ''} -- {path}"
+
+#parses makeLsCmd's output lines (without the total line); returns (entries, error) where error describes the last line that couldn't be parsed or is None
+def parseLs(lines, lessXSI=False):
+
+	entries = []
+	error = None
+
+	for line in lines:
+
+		#split
+		fileInfo = line.split(maxsplit=6) if not lessXSI else [""]*6 + [line] #perms, links, bytes, dt1, dt2, dt3, name; requires LC_TIME=POSIX
+		lsConfused = False
+
+		#check
+		if len(fileInfo) == 5 and fileInfo[1] == fileInfo[2] == fileInfo[3] == "?":
+			lsConfused = True
+		elif len(fileInfo) != 7:
+			if not error:
+				print(f"OpenFileOverSSH: Unrecognized ls output:\n{chr(10).join(lines)}") #char(10) is \n cause can't use a \ in an f string expr
+			error = f"Unrecognized file info (skipping): {line} : {fileInfo}"
+			print(f"OpenFileOverSSH: {error}")
+			continue
+
+		#parse
+		name = fileInfo[-1]
+		if name == "./":
+			continue #pointless to select current directory
+		isFolder = name.endswith("/")
+
+		if lessXSI:
+			size = None
+		elif isFolder:
+			try:
+				size = int(fileInfo[1]) - 2 #number of sub-directories
+			except ValueError:
+				size = "?"
+		else:
+			try:
+				size = int(fileInfo[2])
+			except ValueError:
+				size = fileInfo[2]
+
+		entries.append(LsEntry(name, isFolder, size, lsConfused)) #confused e.g. link with deleted source
+
+	return (entries, error)
+
+
+
+class RemoteError(Exception):
+
+	def __init__(self, title, code, stderr):
+
+		super().__init__(makeErrorText(title, code, stderr))
+		self.code = code
+		self.stderr = stderr
+
+#a server for scripts; see the top of this file
+class Remote():
+
+	"""
+	 * Listings run in one SshShell (taken from the ShellPool if one is there) and file contents use their own ssh processes like the plugin
+	 * With multiplexing, the ssh processes reuse the shell's connection
+	 * close() puts the shell in the ShellPool so the next Remote to the same server doesn't connect again
+	 * Failed operations raise a RemoteError
+	"""
+
+	def __init__(self, server, port=None):
+
+		self.server = server
+		self.port = str(port or "")
+		self.shell = None
+		self.lessXSI = False
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def connect(self):
+
+		if self.shell and self.shell.isAlive():
+			return self.shell
+
+		self.shell = ShellPool.take(self.server, self.port) or SshShell(self.server, self.port)
+		if not self.shell.isAlive():
+			shell, self.shell = self.shell, None
+			raise RemoteError("Unable to connect to the server", shell.retCode, shell.error)
+		return self.shell
+
+	def listDir(self, path="", hidden=False): #returns a list of LsEntry; "" is the home folder
+
+		shell = self.connect()
+		cmd = makeLsCmd(SshShell.quote(path), hidden, self.lessXSI)
+		lines, code, err = shell.runCmd(cmd)
+		if not self.lessXSI:
+			lines = lines[1:] #skip the total line
+
+		if code != 0 and len(lines) == 0:
+			err = err or shell.runCmd(f"{cmd} 2>&1", False)[0]
+			lower = err.casefold()
+			if ("unrecognized option" in lower or "invalid option" in lower) and not self.lessXSI:
+				self.lessXSI = True
+				return self.listDir(path, hidden)
+			raise RemoteError(f"Unable to list {path or '~'}", code, err)
+
+		return parseLs(lines, self.lessXSI)[0]
+
+	def read(self, path): #returns the file's bytes
+
+		out, code, err = runSsh(self.server, self.port, f"cat -- {shlex.quote(path)}")
+		if code != 0:
+			raise RemoteError(f"Unable to read {path}", code, err)
+		return out
+
+	def write(self, path, data): #writes the bytes in place and returns their sha256 after checking the server has them
+
+		out, code, err = runSsh(self.server, self.port, f"cat > {shlex.quote(path)} && {remoteHashCmd([path])}", data)
+		if code != 0:
+			raise RemoteError(f"Unable to write {path}", code, err)
+
+		localHash = contentHash(data)
+		remoteHash = parseHashes(out, 1)[0]
+		if remoteHash not in (None, localHash):
+			raise RemoteError(f"{path} doesn't match what was written", code, "sha256 mismatch")
+		return localHash
+
+	def hashes(self, paths): #returns parseHashes' list for the paths
+
+		out, code, err = runSsh(self.server, self.port, remoteHashCmd(paths))
+		if code != 0:
+			raise RemoteError("Unable to hash files", code, err)
+		return parseHashes(out, len(paths))
+
+	def close(self):
+
+		if self.shell:
+			ShellPool.put(self.shell)
+			self.shell = None
@@ -1,14 +1,34 @@
 import os #temp file removal and path splitting
+import io #profile reports
+import re #find result parsing
+import json #trace exporting
+import difflib #fleet summaries
+import html #path preview escaping
 import math #pretty size calcs and string collapsing
+import time #tracing
+import zlib #compressed diff references
 import shlex #shell arg escaping
+import socket #host probing
+import shutil #mount removal
+import pstats #profile reports
 import string #random string creation
 import random #random string creation
+import codecs #follow mode decoding
+import hashlib #synced content hashes
+import cProfile #on demand profiling
 import sublime
+import functools #callback decorators
 import tempfile
 import threading #stderr consuming
 import subprocess #popen
 import sublime_plugin
 from enum import Enum
+from . import engine
+from .engine import (
+	isWindows, getStartupInfo, getSshArgs, makeErrorText, prettySize, Trace, LinkProfile, Watchdog, runSsh,
+	makeFramedCmd, parseFramed, REMOTE_HASH_FUNC, remoteHashCmd, parseHashes, contentHash, deltaFetch, makeRangeCmd,
+	SshShell, ShellPool, makeLsCmd, parseLs
+)
 
 """
  * Hey there!
@@ -24,262 +44,344 @@ from enum import Enum
  * The other InputHandlers are for the extra actions (glob, new, and options).
  * Right below the handlers is the open_file_over_ssh command which can be run manually (e.g. from a keybinding) for personal automation.
  *
- * The top of this file includes ssh and popen args which contain the multiplexing information.
- * The custom SshShell class below those functions handles the Input Pallet's persistent ssh connection.
+ * The ssh side (ssh args with the multiplexing information, the Trace, the SshShell that handles the Input Pallet's persistent ssh connection,
+ *     ls parsing, and file hashing) is in engine.py which doesn't depend on Sublime. This file configures it and does the UI.
 """
 
 
 SETTINGS_FILE = "OpenFileOverSSH.sublime-settings"
 
-isWindows = (sublime.platform() == "windows")
-
 viewToShell = {} #Maps view.id() to an SshShell. Allows multiple files to be opened using the same SshShell
+viewToPrefetch = {} #Maps view.id() to the probe output fetched for it by a batched open (see openFileOverSshCommand.run)
+restoredViews = {} #Maps (server, port) to the event listeners of remote views restored after a hot exit that haven't been checked against the server yet
 
 
-#gets the required startup info for Popen
-def getStartupInfo():
+#on demand profiling of the traced plugin callbacks (see openFileOverSshProfileCommand)
+class Profiler():
 
-	#On Windows, the command shell is opened while the Popen command is running and this fixes that
-	startupinfo = None
-	if isWindows:
-		startupinfo = subprocess.STARTUPINFO()
-		startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+	"""
+	 * While a session runs, every outermost traced callback is profiled by its thread's cProfile.Profile (cProfile only follows one thread)
+	 *     and its wall time, CPU time (time.thread_time), and remote wait are added up per callback
+	 * Remote wait is the queue and round trip time of the remote operations the callback's thread ran (seen through Trace.observers)
+	 *     so the rest of the wall time is wall - remote - CPU (e.g. locks, sleeps, or other threads holding the GIL)
+	 * Remote operations of background threads are only in the remote table
+	 * stop() merges the thread profiles and writes a .pstats file and the text report to the given folder
+	"""
 
-	return startupinfo
+	CUMULATIVE_LINES = 30
+	TOTTIME_LINES = 20
 
-#makes the appropriate ssh args using the settings file and arguments
-def getSshArgs(*, port=None):
+	active = False
+	started = None
+	profiles = {} #thread id: cProfile.Profile
+	callbacks = {} #name: [calls, wall, cpu, remote]
+	remote = {} #(server, kind, what): [ops, seconds, max, bytes]
+	local = threading.local() #depth and accumulators of the running callback on each thread
+	lock = threading.Lock()
 
-	settings = sublime.load_settings(SETTINGS_FILE)
+	@classmethod
+	def start(cls):
 
-	args = ["-T"] #Non-interactive mode. While non-interactive will be the default, we'll get an unable to allocate tty error message without this
+		with cls.lock:
+			cls.profiles, cls.callbacks, cls.remote = {}, {}, {}
+			cls.started = time.time()
+			cls.active = True
+		if cls.observe not in Trace.observers:
+			Trace.observers.append(cls.observe)
 
-	if port not in (None, 0, ""):
-		args.extend(["-p", str(port)])
+	@classmethod
+	def observe(cls, record):
 
-	if not settings.get("useOpenSshConfigArgs", True):
-		return args
+		if not cls.active or record["kind"] in ("step", "block"):
+			return
 
-	#no user input
-	args.extend(["-o", "BatchMode=yes"]) #Batch mode is StrictHostKeyChecking=yes (as opposed to ask) and PreferredAuthentications=publickey, i.e. no user input
+		wait = record["queue"] + record["rtt"]
+		with cls.lock:
+			stats = cls.remote.setdefault((record["server"], record["kind"], record["what"]), [0, 0.0, 0.0, 0])
+			stats[0] += 1
+			stats[1] += wait
+			stats[2] = max(stats[2], wait)
+			stats[3] += record["bytesIn"] + record["bytesOut"]
 
-	#host keys
-	keyChecking = settings.get("hostKeyChecking", None)
-	if keyChecking != None:
-		if isinstance(keyChecking, bool) or keyChecking in ["yes", "no", "accept-new"]:
-			args.extend(["-o", f"StrictHostKeyChecking={keyChecking}"])
-			if not keyChecking or keyChecking == "no":
-				args.extend(["-o", "UserKnownHostsFile=/dev/null"]) #don't save keys if key checking is disabled
-		else:
-			print(f"OpenFileOverSSH: Unrecognized hostKeyChecking setting ({keyChecking}), falling back to default")
-
-	#timeout
-	timeout = settings.get("timeout", 7)
-	if timeout != None:
-		if not (isinstance(timeout, int) or isinstance(timeout, str) and timeout.isdecimal()):
-			print(f"OpenFileOverSSH: Unrecognized timeout setting ({timeout}), falling back to default")
-			timeout = 7
-		args.extend(["-o", f"ConnectTimeout={timeout}"]) #not specifying this uses system tcp timeout
-
-	#multiplexing
-	persist = settings.get("multiplexing", "5m" if not isWindows else False) #OpenSSH_for_Windows (as of 8/2024) does not support multiplexing
-	if persist not in [None, False, 0, "0"]:
-
-		if isinstance(persist, bool) and persist: #True == 1 so must check if its a bool
-			persist = "5m"
-		if not (isinstance(persist, int) or isinstance(persist, str) and (persist.isdecimal() or persist[-1] in ["m", "s"] and persist[:-1].isdecimal())):
-			print(f"OpenFileOverSSH: Unrecognized multiplexing setting ({persist}), falling back to default")
-			persist = "5m"
-
-		#Using %C to both escape special characters and obfuscate the connection details
-		#Auto creates a new master socket if it doesn't exist
-		args.extend(["-o", "ControlPath=~/.ssh/SOFOS_cm-%C", "-o", "ControlMaster=auto", "-o", f"ControlPersist={persist}"])
-
-	return args
-
-#makes an error string for an ssh error. sshStderr can be string or bytes
-def makeErrorText(title, sshRetCode, sshStderr):
-
-	if isinstance(sshStderr, bytes) or isinstance(sshStderr, bytearray):
-		sshStderr = sshStderr.decode()
-
-	error = sshStderr and sshStderr.replace("\r", "").rstrip("\n") #ssh's output to stderr has line endings of CRLF per ssh specs. Remove trailing new line too
-	errType = "ssh" if sshRetCode == 255 or sshRetCode == None else "posix signal" if sshRetCode < 0 else "remote"
-
-	if error:
-		msg = f"{title}.\n\nCode: {sshRetCode} ({errType})\nError: {error}"
-		lower = error.casefold()
-		if errType == "ssh":
-			if "host key verification failed" in lower:
-				msg += "\n\nSSH to this server with your terminal to verify the host key or change the hostKeyChecking setting."
-			if "permission denied" in lower:
-				msg += "\n\nYou must setup ssh public key authentication with this server for this plugin to work."
-			if "timed out" in lower:
-				msg += "\n\nThe timeout time can be changed in this plugin's settings if needed."
-			if "getsockname failed: bad file descriptor" in lower and isWindows:
-				msg += "\n\nThis is likely from SSH not supporting multiplexing on windows. You can disable multiplexing in the settings file."
-		return msg
-	else:
-		return f"{title}.\nAn unknown {errType} error occurred.\nError Code: {sshRetCode}"
-
-
-
-
-#handles the input pallet's ssh shell
-class SshShell():
-	"""
-	 * all methods of this class including the constructor are blocking accept for isAlive()
-	 * after the constructor returns, ssh has either errored or is connected to remote and ready to receive commands
-	"""
+		if getattr(cls.local, "depth", 0):
+			cls.local.remote += wait
 
-	setupCmds = [
-		"export LC_TIME=POSIX" #set ls -l to output a standardized time format
-	]
+	@classmethod
+	def enter(cls): #returns whether exit must be called
 
-	def __init__(self, userAndServer, port=None):
+		if not cls.active:
+			return False
 
-		self.shell = subprocess.Popen(["ssh", *getSshArgs(port=port), userAndServer], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=getStartupInfo())
-		_, code, _ = self.runCmd("; ".join(self.setupCmds)) #read past all login information and run the setupCmds; will block until completed or error
+		local = cls.local
+		local.depth = getattr(local, "depth", 0) + 1
+		if local.depth == 1:
+			with cls.lock:
+				local.profile = cls.profiles.setdefault(threading.get_ident(), cProfile.Profile())
+			local.remote = 0.0
+			local.cpu = time.thread_time()
+			local.start = time.perf_counter()
+			local.profile.enable()
+		return True
 
-		"""
-		 * Theoretically if ret is false, isAlive should also be false.
-		 * However on windows this is not always the case.
-		 * For example, on initial ssh error (host key, password auth, multiplexing) in windows:
-		 *    ret is false because the read() returned EOF
-		 *    isAlive() is true (because ssh hasn't exited yet??)
-		 *    if this isn't caught, the next write()/flush() will error with broken pipe (which is EINVAL on python windows)
-		 * Leave it up to windows to make code complicated :(
-		"""
-		if self.isAlive() and code != 255:
-			self.thread = threading.Thread(target=self.shell.stderr.read, daemon=True) #consume sterr so a full pipe doesn't block our process
-			self.thread.start()
-			self.error = None
-		else:
-			self.error = self.shell.stderr.read().decode().replace("\r", "").rstrip("\n") #ssh's output to stderr has line endings of CRLF per ssh specs. Remove trailing new line too
-			if self.isAlive(): #ensure the process is dead (in case we got here through ret being False); this is needed because isAlive is used to check for errors
-				self.close(timeout=0.25)
+	@classmethod
+	def exit(cls, name):
 
-	@staticmethod
-	def quote(str): #shlex.quote but an empty string stays empty
-		return str and shlex.quote(str)
+		local = cls.local
+		local.depth -= 1
+		if local.depth:
+			return
 
-	@property
-	def retCode(self):
-		return self.shell.returncode
+		local.profile.disable()
+		wall = time.perf_counter() - local.start
+		cpu = time.thread_time() - local.cpu
+		with cls.lock:
+			stats = cls.callbacks.setdefault(name, [0, 0.0, 0.0, 0.0])
+			stats[0] += 1
+			stats[1] += wall
+			stats[2] += cpu
+			stats[3] += local.remote
 
 	@classmethod
-	def _genSeekingStr(cls):
-		return "A random string for seeking" + ("".join([random.choice(string.ascii_uppercase + string.digits) for _ in range(30)]))
+	def stop(cls, folder): #returns (report, pstats path or None)
 
-	def isAlive(self):
-		return self.shell.poll() == None
+		with cls.lock:
+			cls.active = False
+			profiles, callbacks, remote = list(cls.profiles.values()), cls.callbacks, cls.remote
+		if cls.observe in Trace.observers:
+			Trace.observers.remove(cls.observe)
 
-	def runCmd(self, cmd, splitLines=True, decode=True, *, throwOnSshErr=False): #returns: (stdout, retCode, stderr)
+		ms = openFileOverSshTraceCommand.ms
+		lines = [f"Open File Over SSH Profile: {time.time() - cls.started:.1f}s session started {time.strftime('%H:%M:%S', time.localtime(cls.started))}", ""]
 
-		"""
-		 * As of right now, stderr will usually be None to indicate unable to read stderr
-		 *
-		 * Until this function can actually return stderr, throwOnSshErr will be available
-		 * When True, this function will display an error message and raise an exception if an Ssh Error (i.e. connection dropped) occurs
-		 * Use this to avoid needing to error check in calling code
-		"""
+		if callbacks:
+			lines.append(f"{'callback':<44} {'calls':>6} {'wall':>9} {'remote':>9} {'cpu':>9} {'other':>9}")
+			for name, (calls, wall, cpu, wait) in sorted(callbacks.items(), key=lambda item: -item[1][1]):
+				lines.append(f"{name:<44} {calls:>6} {ms(wall):>9} {ms(wait):>9} {ms(cpu):>9} {ms(max(0.0, wall - wait - cpu)):>9}")
+		else:
+			lines.append("No plugin callbacks ran while profiling.")
 
-		#write
-		seekingString = self._genSeekingStr()
-		if cmd != "":
-			cmd += "; "
-		cmd += f"printf \"\\n$?\\n{seekingString}\\n\"\n" #printf "\n retCode \n seekingStr \n"
-		seekingString = seekingString.encode()
+		if remote:
+			lines.extend(["", f"{'remote wait':<44} {'ops':>6} {'total':>9} {'max':>9} {'bytes':>8}"])
+			for (server, kind, what), (ops, total, longest, moved) in sorted(remote.items(), key=lambda item: -item[1][1]):
+				lines.append(f"{f'{server}: {kind} {what}':<44.44} {ops:>6} {ms(total):>9} {ms(longest):>9} {prettySize(moved):>8}")
+
+		stats = None
+		stream = io.StringIO()
+		for profile in profiles:
+			try:
+				if stats:
+					stats.add(profile)
+				else:
+					stats = pstats.Stats(profile, stream=stream)
+			except TypeError: #a thread that didn't run anything
+				pass
+
+		path = None
+		if stats:
+			stats.sort_stats("cumulative").print_stats(cls.CUMULATIVE_LINES)
+			stats.sort_stats("tottime").print_stats(cls.TOTTIME_LINES)
+			lines.extend(["", "Python profile of the callbacks (cumulative, then own time):", stream.getvalue().strip("\n")])
+
+			name = time.strftime("profile-%Y%m%d-%H%M%S", time.localtime(cls.started))
+			path = os.path.join(folder, name + ".pstats")
+			try:
+				os.makedirs(folder, exist_ok=True)
+				stats.dump_stats(path)
+				lines.extend(["", f"Saved to {path} and {name}.txt (view with python -m pstats)"])
+				with open(os.path.join(folder, name + ".txt"), "w") as file:
+					file.write("\n".join(lines) + "\n")
+			except OSError as e:
+				lines.extend(["", f"Unable to save the profile: {e}"])
+				path = None
 
+		return ("\n".join(lines), path)
+
+#decorator for plugin callbacks (pallet steps and view events) that records how long they take in the Trace and marks them for the Watchdog and Profiler
+def traced(func):
+
+	name = func.__qualname__
+
+	@functools.wraps(func)
+	def wrapper(self, *args, **kargs):
+
+		argz = getattr(self, "argz", None)
+		if argz == None and hasattr(self, "view"):
+			settings = self.view.settings()
+			server, port = settings.get("ssh_server"), settings.get("ssh_port")
+		else:
+			server, port = argz.get("server") if argz else None, argz.get("port") if argz else None
+
+		watched = Watchdog.enter(name)
+		profiled = Profiler.enter()
+		start = time.perf_counter()
 		try:
-			self.shell.stdin.write(cmd.encode())
-			self.shell.stdin.flush()
-		except (BrokenPipeError, OSError) as e: #will catch closed pipe errors if ssh has terminated (BrokenPipeError on unix, OSError EINVAL on windows)
+			return func(self, *args, **kargs)
+		finally:
+			Trace.add("step", server, port, name, rtt=time.perf_counter() - start)
+			if profiled:
+				Profiler.exit(name)
+			if watched:
+				Watchdog.exit(server, port)
 
-			self.shell.poll() #set returncode if its available (on windows its prolly not)
-			if throwOnSshErr:
-				sublime.error_message(makeErrorText("Lost connection to the server (write)", self.retCode or 255, str(e)))
-				raise Exception("Ssh Connection Drop")
+	return wrapper
 
-			stderr = "Connection lost: " + str(e)
-			return ([] if splitLines else "" if decode else b"", self.retCode or 255, stderr if decode else stderr.encode())
+def describeRange(rng):
 
+	if rng["unit"] == "lines":
+		return f"lines {rng['start']}-{rng['start'] + rng['count'] - 1}"
 
-		#read
-		lines = []
-		while True:
+	prettySize = pathInputHandler.prettySize
+	return f"bytes {prettySize(rng['start'])}-{prettySize(rng['start'] + rng['count'])}"
 
-			line = self.shell.stdout.readline()
 
-			if len(line) == 0: #EOF i.e. error
 
-				self.shell.poll()
-				if throwOnSshErr:
-					sublime.error_message(makeErrorText("Lost connection to the server (read)", self.retCode or 255, "Encountered EOF"))
-					raise Exception("Ssh Connection Drop")
 
-				stderr = "Connection lost: encountered EOF during read"
-				return ([] if splitLines else "" if decode else b"", self.retCode or 255, stderr if decode else stderr.encode())
+#host picker candidates (~/.ssh/config hosts and the recentServers setting) and their reachability, probed in parallel in the background
+class HostProbe():
 
-			if line[:-1] == seekingString:
-				break;
+	"""
+	 * A host with an open connection (a multiplexing master found with `ssh -O check`, or a pooled SshShell) is "connected"
+	 * Other hosts get a TCP connect to the HostName and Port from `ssh -G` (so config aliases and Match blocks are honored)
+	 *     and are annotated with the connect time or "down"; hosts behind a ProxyJump or ProxyCommand can't be checked this way
+	 * No ssh handshake is made, so probing never fails a login or asks for a host key
+	 * Results are cached for TTL seconds and at most CONCURRENCY hosts are probed at the same time
+	 * Sublime doesn't refresh a list's annotations and the picker never waits on the UI thread,
+	 *     so probing starts when the plugin loads and when the Open File Over SSH command asks for its input, and the picker only reads the results
+	"""
 
-			if splitLines:
-				line = line.rstrip(b"\n")
-			if decode:
-				line = line.decode()
-			lines.append(line)
+	TTL = 60
+	TIMEOUT = 2
+	CONCURRENCY = 8
 
+	results = {} #(server, port): (time, status, reachable True/False/None)
+	running = set() #(server, port) waiting for or being probed
+	pending = [] #(server, port) waiting for a probe thread
+	workers = 0 #running probe threads
+	lock = threading.Lock()
 
-		#return
-		retCode = int(lines.pop())
+	@staticmethod
+	def configHosts():
 
-		if len(lines[-1]) == (not splitLines): #remove the extra \n added with printf
-			lines.pop()
-		elif not splitLines:
-			lines[-1] = lines[-1][:-1]
+		hosts = []
+		try:
+			with open(os.path.join(os.path.expanduser("~"), ".ssh", "config")) as file:
+				for line in file:
+					words = line.replace("=", " ", 1).split()
+					if len(words) >= 2 and words[0].casefold() == "host":
+						hosts.extend(word for word in words[1:] if not any(char in word for char in "*?!")) #patterns aren't hosts
+		except OSError:
+			pass
 
-		return (lines if splitLines else ("" if decode else b"").join(lines), retCode, None)
+		return hosts
 
-	def close(self, timeout=None):
+	@classmethod
+	def candidates(cls): #returns [(server, port)] with recent servers first
 
-		#close/kill ssh
-		if self.isAlive():
+		recent = [(server, str(port or "")) for server, port in sublime.load_settings(SETTINGS_FILE).get("recentServers", [])]
+		return list(dict.fromkeys(recent + [(host, "") for host in cls.configHosts()])) #de-dupe but keep the order
 
+	@classmethod
+	def check(cls, server, port): #returns (status, reachable)
+
+		args = getSshArgs(server=server, port=port)
+		if "ControlMaster=auto" in args:
 			try:
-				self.shell.stdin.write(b"exit\n")
-				self.shell.stdin.flush()
-			except (BrokenPipeError, OSError):
-				pass
-			try:
-				self.shell.stdin.close() #will also close the ssh process
-			except (BrokenPipeError, OSError):
+				if subprocess.run(["ssh", *args, "-O", "check", server], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=cls.TIMEOUT, startupinfo=getStartupInfo()).returncode == 0:
+					return ("connected", True)
+			except (OSError, subprocess.TimeoutExpired):
 				pass
+		elif ShellPool.has(server, port):
+			return ("connected", True)
+
+		try:
+			out = subprocess.run(["ssh", "-G", *(["-p", port] if port else []), server], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=cls.TIMEOUT, startupinfo=getStartupInfo()).stdout.decode()
+		except (OSError, subprocess.TimeoutExpired):
+			return ("unknown", None)
+
+		config = {}
+		for line in out.splitlines():
+			key, _, value = line.partition(" ")
+			config.setdefault(key.casefold(), value)
+		if config.get("proxyjump", "none") != "none" or config.get("proxycommand", "none") != "none":
+			return ("via proxy", None)
+
+		start = time.perf_counter()
+		try:
+			socket.create_connection((config.get("hostname", server.rpartition("@")[2]), int(config.get("port", port or 22))), timeout=cls.TIMEOUT).close()
+		except (OSError, ValueError):
+			return ("down", False)
+		return (f"{(time.perf_counter() - start) * 1000:.0f}ms", True)
+
+	@classmethod
+	def start(cls, hosts):
 
+		with cls.lock:
+			for key in hosts:
+				if key in cls.running or time.time() - cls.results.get(key, (0,))[0] < cls.TTL:
+					continue
+				cls.running.add(key)
+				cls.pending.append(key)
+			count = min(cls.CONCURRENCY - cls.workers, len(cls.pending))
+			cls.workers += count
+
+		for _ in range(count):
+			threading.Thread(target=cls.probe, daemon=True).start()
+
+	@classmethod
+	def probe(cls): #probe thread; probes pending hosts until there are none left
+
+		while True:
+			with cls.lock:
+				if not cls.pending:
+					cls.workers -= 1
+					return
+				key = cls.pending.pop(0)
 			try:
-				self.shell.wait(timeout)
-			except TimeoutExpired:
-				print("OpenFileOverSSH: ssh exit timed out, killing...")
-				self.ssh.terminate()
-				try:
-					self.shell.wait(timeout)
-				except TimeoutExpired:
-					self.shell.kill()
-					self.shell.wait()
+				status = cls.check(*key)
+			except Exception: #keep the thread (and its workers count) alive
+				status = ("unknown", None)
+			with cls.lock:
+				cls.results[key] = (time.time(), *status)
+				cls.running.discard(key)
 
-			if self.retCode != 0:
-				print("OpenFileOverSSH: ssh finished with return code %d" % self.shell.returncode)
+	@classmethod
+	def status(cls, server, port): #returns (status, reachable, age in seconds) or None if not probed yet
 
+		with cls.lock:
+			result = cls.results.get((server, str(port or "")))
+		return (result[1], result[2], time.time() - result[0]) if result else None
 
-		#clean up
-		try:
-			self.thread.join() #join thread to free up resources
-		except AttributeError: #no thread to join
-			pass
+#opens connections in the background so the first remote action is as fast as later ones. returns the started threads
+def prewarm(servers):
 
-	def __del__(self):
+	"""
+	 * servers is a list of (server, port) tuples
+	 * With multiplexing, a quick `true` command starts a ControlMaster that stays open for the multiplexing (ControlPersist) time.
+	 * Without multiplexing, an SshShell is opened and put in the ShellPool for the next file browser session.
+	"""
 
-		self.close()
+	multiplexing = "ControlMaster=auto" in getSshArgs()
+
+	def warm(server, port):
+		if multiplexing:
+			_, code, err = runSsh(server, port, "true", timeout=60)
+			error = code != 0 and err
+		else:
+			if ShellPool.has(server, port):
+				return
+			shell = SshShell(server, port)
+			ShellPool.put(shell)
+			error = not shell.isAlive() and shell.error
+		if error:
+			print(f"OpenFileOverSSH: unable to pre-warm a connection to {server}: {error}")
+
+	threads = []
+	for server, port in dict.fromkeys((server, str(port or "")) for server, port in servers): #de-dupe but keep the order
+		thread = threading.Thread(target=warm, args=(server, port), daemon=True)
+		thread.start()
+		threads.append(thread)
+
+	return threads
 
 
 #shared arguments for command pallet handlers. Acts as a dictionary with special path and session settings features
@@ -287,7 +389,7 @@ class Argz(dict):
 
 	settings = sublime.load_settings(SETTINGS_FILE)
 	SESS_SETTINGS_DATA = [
-		("pathChecking", True),
+		("pathChecking", True), #"auto" is resolved when connecting (see serverInputHandler.confirm)
 		("hiddenFiles", "showHiddenFiles", False),
 		("actions", ["glob", "new"])
 	]
@@ -393,6 +495,8 @@ class Argz(dict):
 #input pallet server input
 class serverInputHandler(sublime_plugin.TextInputHandler):
 
+	MAX_RECENT = 10 #length of the recentServers setting
+
 	def __init__(self, argz):
 
 		super().__init__()
@@ -453,6 +557,7 @@ class serverInputHandler(sublime_plugin.TextInputHandler):
 		return ret
 
 	#check server
+	@traced
 	def validate(self, text):
 
 		type = self.checkSyntax(text)
@@ -465,14 +570,14 @@ class serverInputHandler(sublime_plugin.TextInputHandler):
 
 		server = text[:text.index(":")]
 		port = text[text.index(":")+1:text.rindex(":")] #empty string if no port
-		ssh = SshShell(server, port)
+		ssh = ShellPool.take(server, port) or SshShell(server, port)
 
 		if not ssh.isAlive(): #check if not dead
 			#the dialog looks kinda ugly, but I can't think of a better way
 			sublime.error_message(makeErrorText(f"Could not connect to {server}", ssh.retCode, ssh.error))
 			return False
 
-		if type == 4 and self.argz.settings["pathChecking"]:
+		if type == 4 and self.argz.settings["pathChecking"] and not (self.argz.settings["pathChecking"] == "auto" and LinkProfile.isSlow(server, port)):
 
 			path = text[text.rindex(":") + 1:]
 			echoCode = "printf \"$?\\n\""
@@ -489,26 +594,36 @@ class serverInputHandler(sublime_plugin.TextInputHandler):
 
 			if msg:
 				sublime.error_message(f"Unable to access (open) '{path}'\n({msg})")
+				ShellPool.put(ssh) #keep the connection for the corrected path
 				return False
 
 		self.ssh = ssh #only save if it'll be used i.e. let the shell close now if it's not used
 		return True
 
 	#save value
+	@traced
 	def confirm(self, text):
 
+		sep = text.index(":")
+		sep2 = text.rindex(":")
+
+		recent = [text[:sep], text[sep+1:sep2]]
 		self.settings.set("server", text)
+		self.settings.set("recentServers", [recent] + [item for item in self.settings.get("recentServers", []) if item != recent][:self.MAX_RECENT - 1])
 		sublime.save_settings(SETTINGS_FILE)
 
 		if "server" in self.argz:
 			self.argz.reset() #makes the most sense to have connecting to a server start a new session
 
-		sep = text.index(":")
-		sep2 = text.rindex(":")
 		self.argz["server"] = text[:sep]
 		self.argz["port"] = text[sep+1:sep2]
 		self.argz["sshShell"] = self.ssh
 
+		#adapt to the link (see LinkProfile)
+		self.argz.settings["link"] = (self.argz["server"], self.argz["port"])
+		if self.argz.settings["pathChecking"] == "auto":
+			self.argz.settings["pathChecking"] = not LinkProfile.isSlow(self.argz["server"], self.argz["port"]) #a failed open or ls shows the same error a round trip later
+
 		if text[-1] == "/": #type 3
 			self.argz.pathAppend(tuple(comp + "/" for comp in text[sep2 + 1:].split("/")[:-1]))
 		elif text[-1] != ":": #type 4
@@ -525,9 +640,102 @@ class serverInputHandler(sublime_plugin.TextInputHandler):
 
 		return pathInputHandler(self.argz) if not "paths" in self.argz else None
 
+#input pallet host picker; lists recent and ~/.ssh/config servers with their reachability (see HostProbe) and hands the chosen one to serverInputHandler
+class hostInputHandler(sublime_plugin.ListInputHandler):
+
+	OTHER = "" #value of the item that types in a server instead
+
+	def __init__(self, argz):
+
+		super().__init__()
+
+		self.argz = argz
+		self.server = serverInputHandler(argz) #does the connecting and saving
+		self.other = False
+
+	def name(self):
+
+		return "server"
+
+	def placeholder(self):
+
+		return "server"
+
+	@staticmethod
+	def makeText(server, port):
+		return f"{server}:{port + ':' if port else ''}"
+
+	#servers with probe annotations
+	@traced
+	def list_items(self):
+
+		candidates = HostProbe.candidates() #probed by openFileOverSshCommand.input() and plugin_loaded
+
+		items = [sublime.ListInputItem("Enter a Server Address", self.OTHER, annotation="user@server:", kind=pathInputHandler.Kind.ACTION)]
+		for server, port in candidates:
+			status, reachable, _ = HostProbe.status(server, port) or ("probing", None, 0)
+			kind = pathInputHandler.Kind.FOLDER if reachable else pathInputHandler.Kind.ERROR if reachable == False else pathInputHandler.Kind.CONFUSED
+			items.append(sublime.ListInputItem(self.makeText(server, port), self.makeText(server, port), annotation=status, kind=kind))
+
+		last = self.server.initial_text()
+		selected = next((i for i, item in enumerate(items) if item.value and last.startswith(item.value)), 1 if len(items) > 1 else 0)
+		return (items, selected)
+
+	def preview(self, value):
+
+		if value == self.OTHER:
+			return "Type a server address (user@server:port:path)"
+
+		status = HostProbe.status(*self.split(value))
+		return self.server.preview(value) + (f" ({status[0]} {status[2]:.0f}s ago)" if status else "")
+
+	@staticmethod
+	def split(text): #returns (server, port)
+
+		server, _, port = text[:-1].partition(":")
+		return (server, port)
+
+	@traced
+	def validate(self, value):
+
+		if value == self.OTHER:
+			return True
+
+		status = HostProbe.status(*self.split(value))
+		if status and status[1] == False and not sublime.ok_cancel_dialog(f"{value[:-1]} did not answer a TCP connection {status[2]:.0f} seconds ago.\n\nConnect anyway?", "Connect"):
+			return False
+
+		return self.server.validate(value)
+
+	@traced
+	def confirm(self, value):
+
+		self.other = value == self.OTHER
+		if not self.other:
+			self.server.confirm(value)
+
+	def cancel(self):
+
+		self.server.cancel()
+
+	def next_input(self, args):
+
+		return serverInputHandler(self.argz) if self.other else self.server.next_input(args)
+
 #input pallet action glob input
 class globInputHandler(sublime_plugin.TextInputHandler):
 
+	"""
+	 * Space separated patterns are matched on the server with one remote command
+	 * Patterns with ** match files in any sub folder (using find), patterns starting with ! exclude matching paths, and the rest are ls globs
+	 * The number of matches is capped by the globLimit setting
+	 * Matches are memoized per (path, patterns) so preview, validate, and confirm share a single round trip
+	 * Sublime only asks for a preview when the text changes, so preview counts the matches right away (a count made later would never be shown),
+	 *     except on slow links (see LinkProfile) where the count waits for validate instead of a round trip per key press
+	"""
+
+	UNSAFE = set("'\"`$;|&()<>\\") #the patterns are put in the remote command unquoted so that the shell globs them
+
 	def __init__(self, argz):
 
 		super().__init__()
@@ -535,49 +743,128 @@ class globInputHandler(sublime_plugin.TextInputHandler):
 		self.argz = argz
 		self.ssh = argz["sshShell"]
 		self.settings = sublime.load_settings(SETTINGS_FILE)
+		self.matches = {} #(path, text): (paths, total bytes or None, truncated)
 
 	@staticmethod
-	def isSyntaxOk(text):
+	def splitPatterns(text): #returns (ls globs, ** globs, excludes)
+
+		patterns = text.split()
+		excludes = [pattern[1:] for pattern in patterns if pattern.startswith("!")]
+		globs = [pattern for pattern in patterns if not pattern.startswith("!")]
+		return ([glob for glob in globs if "**" not in glob], [glob for glob in globs if "**" in glob], excludes)
+
+	@classmethod
+	def isSyntaxOk(cls, text):
 
-		globs = text.split(" ")
+		globs, recursive, excludes = cls.splitPatterns(text)
 
-		for glob in globs:
-			if not "*" in glob:
-				return False #every space-separated pattern must have a *
+		if not globs and not recursive:
+			return False #excludes need something to exclude from
+		if any(not "*" in glob for glob in globs + recursive) or any(not exclude for exclude in excludes):
+			return False #every space-separated pattern must have a *
+		if cls.UNSAFE & set(text):
+			return False
 
 		return True
 
-	def getMatchingPaths(self, text):
+	def makeMatchCmd(self, text):
+
+		globs, recursive, excludes = self.splitPatterns(text)
+		ls = "/bin/ls -1Lpd" if self.argz.get("lessXSI") else "/bin/ls -lgoLpd"
+		noHidden = "" if self.argz.settings["hiddenFiles"] else "! -path '*/.*'"
+
+		#list every match (with its size unless lessXSI)
+		sources = []
+		if globs:
+			sources.append(f"{ls} -- {' '.join(globs)} 2>/dev/null")
+		for glob in recursive:
+			base, _, rest = glob.partition("**")
+			base = base.rstrip("/") or "."
+			rest = rest.lstrip("/") or "*"
+			paths = f"\\( -path '{base}/*/{rest}' -o -path '{base}/{rest}' \\)" #find's * also matches /, so this is "any depth"
+			sources.append(f"find -L {base} -type f {paths} {noHidden} -exec {ls} -- {{}} + 2>/dev/null")
+
+		#drop folders and excluded paths
+		read = "read -r f" if self.argz.get("lessXSI") else "read -r m l s d1 d2 d3 f" #perms, links, bytes, dt1, dt2, dt3, name (see pathInputHandler.list_items)
+		exclude = f"{'|'.join(excludes)}) ;; " if excludes else ""
+		keep = "printf '%s\\n' \"$f\"" if self.argz.get("lessXSI") else "printf '%s %s\\n' \"$s\" \"$f\""
+		filter = f'while {read}; do f=${{f#./}}; case "$f" in */) ;; {exclude}*) {keep};; esac; done'
+
+		limit = self.settings.get("globLimit", 1000)
+		return f"(cd -- {self.ssh.quote(self.argz.strPath) or '.'} && {{ {'; '.join(sources)}; }} | {filter} | head -n {limit + 1})"
+
+	#returns (paths, total bytes or None, truncated) or None if the command failed; paths are full paths
+	#quiet (preview) doesn't show an error when the command fails
+	def getMatches(self, text, quiet=False):
+
+		key = (self.argz.strPath, " ".join(text.split()))
+		if key not in self.matches:
+
+			limit = self.settings.get("globLimit", 1000)
+			lines, code, err = self.ssh.runCmd(self.makeMatchCmd(text), throwOnSshErr=not quiet)
+			if code == 255 or code < 0:
+				if not quiet:
+					sublime.error_message(makeErrorText("Unable to match the pattern", code, err))
+				return None
+			paths, total = [], 0
+			for line in lines[:limit]:
+				if self.argz.get("lessXSI"):
+					paths.append(self.argz.strPath + line)
+					total = None
+				else:
+					size, _, path = line.partition(" ")
+					paths.append(self.argz.strPath + path)
+					total += int(size) if size.isdigit() else 0
+
+			self.matches[key] = (paths, total, len(lines) > limit)
+
+		return self.matches[key]
 
-		path = self.ssh.quote(self.argz.strPath)
-		globs = [path + glob for glob in text.split()]
+	def getMatchingPaths(self, text):
 
-		return [path for path in self.ssh.runCmd(f"/bin/ls -1Lpd -- {' '.join(globs)}", throwOnSshErr=True)[0] if not path.endswith("/")] #will return full paths
+		matches = self.getMatches(text)
+		return matches[0] if matches else [] #will return full paths
 
 	#gray placeholder text
 	def placeholder(self):
 
-		return "*.c h*.h"
+		return "*.c h*.h src/**/*.py !*_test.py"
 
 	#previous value
 	def initial_text(self):
 
 		return self.settings.get("glob", "")
 
-	#syntax check
+	#syntax check and match count
 	def preview(self, text):
 
 		if not self.isSyntaxOk(text):
 			return "Invalid Glob Syntax"
 
-		return "Glob Input Valid"
+		key = (self.argz.strPath, " ".join(text.split()))
+		if key not in self.matches and LinkProfile.isSlow(self.argz["server"], self.argz["port"]):
+			return "Glob Input Valid" #counted by validate
+
+		matches = self.getMatches(text, True) #validate reuses the result
+		if not matches:
+			return "Glob Input Valid"
+		paths, total, truncated = matches
+		size = f" ({pathInputHandler.prettySize(total)})" if total != None else ""
+		return f"{len(paths)}{'+' if truncated else ''} file{'' if len(paths) == 1 else 's'}{size}"
 
 	#check matches
+	@traced
 	def validate(self, text):
 
 		if self.isSyntaxOk(text):
 
-			if len(self.getMatchingPaths(text)) > 0:
+			matches = self.getMatches(text)
+			if not matches:
+				return False #getMatches showed the error
+			paths, _, truncated = matches
+			if truncated and not sublime.ok_cancel_dialog(f"More than {len(paths)} files match the pattern. Open the first {len(paths)}?\n\n(see the globLimit setting)", "Open"):
+				return False
+			if len(paths) > 0:
 				return True
 
 			sublime.error_message("No files were found matching the pattern{} '{}'".format("s" if len(text.split(" ")) > 1 else "", text)) #the dialog looks ugly, but I can't think of a better way
@@ -585,6 +872,7 @@ class globInputHandler(sublime_plugin.TextInputHandler):
 		return False
 
 	#update values
+	@traced
 	def confirm(self, text):
 
 		self.argz.savePath()
@@ -658,6 +946,7 @@ class newInputHandler(sublime_plugin.TextInputHandler):
 		return text
 
 	#check new file/folder
+	@traced
 	def validate(self, text):
 
 		path = self.splitPath(text)[0]
@@ -673,6 +962,7 @@ class newInputHandler(sublime_plugin.TextInputHandler):
 		return False
 
 	#update values
+	@traced
 	def confirm(self, text):
 
 		#because we create the new folder in this function, that makes re-editing this input handler difficult
@@ -710,6 +1000,101 @@ class newInputHandler(sublime_plugin.TextInputHandler):
 
 		return None if len(file) > 0 else sublime_plugin.BackInputHandler()
 
+#input pallet partial open of a large file
+class rangeInputHandler(sublime_plugin.TextInputHandler):
+
+	"""
+	 * Shown instead of opening a file that is larger than the rangeThreshold setting
+	 * Accepts: head [size], tail [size], bytes start-end, lines start-end, or all
+	 * Sizes accept K, M, and G suffixes (powers of 1024) and default to the rangeSize setting
+	 * The window is opened read only and the Next/Previous Window commands move it (see openFileOverSshRangeCommand)
+	"""
+
+	UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+	def __init__(self, argz, size):
+
+		super().__init__()
+
+		self.argz = argz
+		self.size = size
+		self.settings = sublime.load_settings(SETTINGS_FILE)
+
+	@classmethod
+	def parseSize(cls, text):
+
+		text = text.strip().lower()
+		unit = text[-1:] if text[-1:] in cls.UNITS else ""
+		return int(float(text[:len(text)-len(unit)]) * cls.UNITS[unit])
+
+	#returns the ssh_range view setting for text, False for the whole file, or None if text is invalid
+	def parse(self, text):
+
+		words = text.split(maxsplit=1)
+		if not words:
+			return None
+		word = words[0].lower()
+
+		try:
+			if word == "all":
+				return False if len(words) == 1 else None
+
+			if word in ("head", "tail"):
+				count = self.parseSize(words[1]) if len(words) > 1 else self.settings.get("rangeSize", 1048576)
+				start = 0 if word == "head" else max(0, self.size - count)
+				return {"unit": "bytes", "start": start, "count": count} if count > 0 else None
+
+			if word in ("bytes", "lines") and len(words) > 1:
+				start, end = words[1].split("-")
+				start, end = (self.parseSize(start), self.parseSize(end)) if word == "bytes" else (int(start), int(end))
+				if word == "lines" and start < 1:
+					return None #sed lines are 1 based
+				return {"unit": word, "start": start, "count": end - start + (word == "lines")} if end >= start else None
+
+		except (ValueError, IndexError):
+			pass
+
+		return None
+
+	#gray placeholder text
+	def placeholder(self):
+
+		return "head, tail 5M, bytes 0-10M, lines 1-5000, or all"
+
+	def initial_text(self):
+
+		return "tail" if self.argz.strPath.endswith(".log") else "head"
+
+	def preview(self, text):
+
+		rng = self.parse(text)
+		total = pathInputHandler.prettySize(self.size)
+		if rng == None:
+			return "Invalid Range: use head [size], tail [size], bytes start-end, lines start-end, or all"
+		if rng == False:
+			return f"Open the whole {total} file"
+
+		return f"Open {describeRange(rng)} of {total} (read only)"
+
+	def validate(self, text):
+
+		return self.parse(text) != None
+
+	def confirm(self, text):
+
+		self.argz["range"] = self.parse(text) #False for the whole file
+
+	#pop()
+	def cancel(self):
+
+		self.argz.pathPop() #pop off the file that got us here
+		self.argz.pop("paths", None)
+
+	#all done
+	def next_input(self, args):
+
+		return None
+
 #input pallet action session options
 class optionsInputHandler(sublime_plugin.ListInputHandler):
 
@@ -742,6 +1127,13 @@ class optionsInputHandler(sublime_plugin.ListInputHandler):
 			lambda settings: f"Show Errors {'After' if settings['pathChecking'] else 'Before'} Selection",
 			"togglePathChecking"
 		)
+		LINK = (
+			"Link Profile",
+			"adaptive",
+			"~",
+			lambda settings: LinkProfile.describe(*settings["link"]) if settings.get("link") else "Link not measured yet",
+			"forgetLinkProfile"
+		)
 
 		def __new__(cls, text, annotation, kLetter, preview, action):
 
@@ -764,6 +1156,11 @@ class optionsInputHandler(sublime_plugin.ListInputHandler):
 	def togglePathChecking(settings):
 		settings["pathChecking"] = not settings["pathChecking"]
 
+	@staticmethod
+	def forgetLinkProfile(settings):
+		if settings.get("link"):
+			LinkProfile.forget(*settings["link"])
+
 
 	def __init__(self, argz):
 
@@ -772,6 +1169,7 @@ class optionsInputHandler(sublime_plugin.ListInputHandler):
 		self.settings = argz.settings
 
 	#show all Options
+	@traced
 	def list_items(self):
 
 		kColor = pathInputHandler.Kind.ACTION[0]
@@ -795,6 +1193,7 @@ class optionsInputHandler(sublime_plugin.ListInputHandler):
 			return f"Enable the {self.ACTIONS[value]} action"
 
 	#run action
+	@traced
 	def confirm(self, value):
 
 		if isinstance(value, str):
@@ -841,12 +1240,18 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 			return obj
 
 
+	PREVIEW_BYTES = 1024
+	PREVIEW_LINES = 12
+
 	def __init__(self, argz):
 
 		super().__init__()
 
 		self.argz = argz
 		self.ssh = argz["sshShell"]
+		self.entries = {} #name: index in the listing
+		self.heads = {} #name: (code, head bytes or folder listing) or None; cached per listing
+		self.fetching = set() #names whose fetch is running
 
 	@staticmethod
 	def isPath(value):
@@ -858,16 +1263,7 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 		strPath = pathVal[-1] if isinstance(pathVal, (tuple, list)) else pathVal
 		return strPath.endswith("/")
 
-	@staticmethod
-	def prettySize(bytes):
-
-		if bytes == 0:
-			return "0"
-		sizes = ("B", "K", "M", "G", "T", "P", "E", "Z", "Y") #future proof lol
-		i = int(math.floor(math.log(bytes, 1024))) #uses powers of 2 e.g. MiB
-		p = math.pow(1024, i)
-		s = bytes / p
-		return f"{int(round(s)) if s.is_integer() else round(s, 1)}{sizes[i]}"
+	prettySize = staticmethod(prettySize)
 
 	@staticmethod
 	def collapse(str, maxLen, splitChar=None): #turns "text,text,text" into "text,...,text"
@@ -892,18 +1288,21 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 		return str[:maxLen - len(end) + 1] + "..." + end #start and onward but including end (maybe should be even split?)
 
 	#ls, actions, and initial selection
+	@traced
 	def list_items(self):
 
 		#setup
 		lessXSI = self.argz.get("lessXSI")
 		path = self.ssh.quote(self.argz.strPath)
-		cmd = f"/bin/ls -1Lp {'-lgo' if not lessXSI else ''} {'-a' if self.argz.settings['hiddenFiles'] else ''} -- {path}"
+		cmd = makeLsCmd(path, self.argz.settings["hiddenFiles"], lessXSI)
 		files, retCode, err = self.ssh.runCmd(cmd)
 		if not lessXSI:
 			files = files[1:] #skip the total line
 		items = []
 		hasFile = False
 		self.error = None
+		self.sizes = {} #file sizes in bytes for rangeInputHandler
+		self.entries, self.heads, self.fetching = {}, {}, set() #new listing, new previews
 
 
 		#check ls
@@ -934,51 +1333,28 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 
 
 		#do
-		for file in files:
-
-			#split
-			fileInfo = file.split(maxsplit=6) if not lessXSI else [""]*6 + [file] #perms, links, bytes, dt1, dt2, dt3, name; requires LC_TIME=POSIX
-			lsConfused = False
-
-			#check
-			if len(fileInfo) == 5 and fileInfo[1] == fileInfo[2] == fileInfo[3] == "?":
-				lsConfused = True
-			elif len(fileInfo) != 7:
-				if not self.error:
-					print(f"OpenFileOverSSH: Unrecognized ls output:\n{chr(10).join(files)}") #char(10) is \n cause can't use a \ in an f string expr
-				self.error = f"Unrecognized file info (skipping): {file} : {fileInfo}"
-				print(f"OpenFileOverSSH: {self.error}")
-				continue
-
-			#parse
-			file = fileInfo[-1]
-			if file == "./":
-				continue #pointless to select current directory
-			isFolder = self.isFolder(file)
-
-			if isFolder: #folder
-				try:
-					size = int(fileInfo[1]) - 2 #number of sub-directories
-				except ValueError:
-					size = "?"
+		entries, self.error = parseLs(files, lessXSI)
+		for entry in entries:
 
-				annotation = f"->{size}"
+			file = entry.name
+			if entry.folder:
+				annotation = f"->{entry.size}"
 				kind = self.Kind.FOLDER
-
-			else: #file
-				try:
-					annotation = self.prettySize(int(fileInfo[2]))
-				except ValueError:
-					annotation = fileInfo[2]
-
+			else:
+				if isinstance(entry.size, int):
+					self.sizes[file] = entry.size
+					annotation = self.prettySize(entry.size)
+				else:
+					annotation = entry.size
 				kind = self.Kind.FILE
 				hasFile = True
 
-			if lsConfused: #confused e.g. link with deleted source (will trigger the file branch above)
+			if entry.confused: #confused e.g. link with deleted source (will trigger the file branch above)
 				kind = self.Kind.CONFUSED
 
 			#item
 			items.append(sublime.ListInputItem(file, file, annotation=annotation if not lessXSI else "", kind=kind))
+			self.entries[file] = len(self.entries)
 
 
 		#warning
@@ -1021,6 +1397,10 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 		items.append(sublime.ListInputItem("Options", self.Action.OPTIONS, annotation="Session Prefs", kind=self.Kind.ACTION))
 
 
+		#previews of the first entries
+		self.prefetch(0)
+
+
 		#default selection
 		try:
 			if self.argz.completion != None:
@@ -1045,12 +1425,76 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 		if not self.isPath(value):
 			preview = self.Action(value).preview
 			return preview(self) if callable(preview) else preview
+		elif isinstance(value, str) and value in self.entries:
+			return self.previewPath(value)
 		elif self.isFolder(value):
 			return "Enter Folder"
 		else:
 			return "Open File"
 
+	"""
+	 * Previews show the first lines of a file or the first entries of a folder
+	 * They are fetched in the background in batches of the previewBatch setting's number of entries with one command (see makeFramedCmd),
+	 *     starting with the top of the listing when it is shown and staying ahead of the selection as it moves down
+	 * Preview never waits for a fetch (it runs on the UI thread), it shows a loading note and the next preview of the entry uses the fetched data
+	"""
+
+	def prefetch(self, index):
+
+		count = sublime.load_settings(SETTINGS_FILE).get("previewBatch", 20)
+		names = [name for name in list(self.entries)[index:index + count] if name not in self.heads and name not in self.fetching] if count else []
+		if not names:
+			return
+
+		heads, fetching = self.heads, self.fetching #this listing's; list_items makes new ones
+		fetching.update(names)
+
+		ls = f"/bin/ls -1p{'A' if self.argz.settings['hiddenFiles'] else ''}"
+		cmds = [
+			f"{ls} -- {self.ssh.quote(self.argz.strPath + name)} | head -n {self.PREVIEW_LINES}" if self.isFolder(name) else f"head -c {self.PREVIEW_BYTES} -- {self.ssh.quote(self.argz.strPath + name)}"
+			for name in names
+		]
+
+		def fetch():
+			try:
+				out, code, _ = self.ssh.runCmd(makeFramedCmd(cmds), False, False, traceKind="prefetch")
+			except OSError:
+				out, code = b"", None
+			for name, result in zip(names, parseFramed(out, len(names)) if code == 0 else [None] * len(names)):
+				heads[name] = result
+				fetching.discard(name)
+
+		threading.Thread(target=fetch, daemon=True).start()
+
+	def previewPath(self, name):
+
+		count = sublime.load_settings(SETTINGS_FILE).get("previewBatch", 20)
+		index = self.entries[name]
+		if name not in self.heads and count:
+			self.prefetch(index)
+		self.prefetch(index + count // 2) #keep ahead of the selection
+
+		isFolder = self.isFolder(name)
+		title = "Enter Folder" if isFolder else "Open File"
+		if name in self.fetching:
+			return sublime.Html(f"<b>{title}</b><br><i>Loading preview...</i>")
+		result = self.heads.get(name)
+		if not result or result[0] != 0:
+			return title
+
+		data = result[1]
+		if isFolder:
+			lines = data.decode("UTF-8", "replace").splitlines() or ["(empty folder)"]
+		elif b"\0" in data:
+			lines = ["(binary file)"]
+		else:
+			lines = data.decode("UTF-8", "replace").splitlines()[:self.PREVIEW_LINES] or ["(empty file)"]
+
+		body = "<br>".join(html.escape(line.expandtabs(4)).replace(" ", "&nbsp;") for line in lines)
+		return sublime.Html(f"<b>{title}</b><br><div style=\"font-family: monospace\">{body}</div>")
+
 	#check file/folder
+	@traced
 	def validate(self, value, evt):
 
 		if not value:
@@ -1087,6 +1531,7 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 		return True
 
 	#push/update
+	@traced
 	def confirm(self, value, evt):
 
 		#next_input cannot determine if ../ should BackInputHandler because the path will already be updated, so it'll use self.popped
@@ -1122,6 +1567,11 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 		if self.isFolder(value):
 			return pathInputHandler(self.argz)
 
+		threshold = self.argz.__class__.settings.get("rangeThreshold", 52428800)
+		size = getattr(self, "sizes", {}).get(value) if isinstance(value, str) else None
+		if threshold and size and size > threshold:
+			return rangeInputHandler(self.argz, size) #too big to cat, ask for a part of it
+
 		return None
 
 	#fix Last Dir action
@@ -1137,6 +1587,7 @@ class pathInputHandler(sublime_plugin.ListInputHandler):
 class openFileOverSshCommand(sublime_plugin.WindowCommand):
 
 	#when run manually: specify a server string (user@server) and a paths array of strings (["path/to/file", "/path/to/file2.txt"])
+	@traced
 	def run(self, server, paths=None, **args):
 
 		#sort out self.argz (input()) vs paths (manual)
@@ -1156,84 +1607,1822 @@ class openFileOverSshCommand(sublime_plugin.WindowCommand):
 		#while that is an unlikely occurrence, I will use multiplexing if its available when opening a single file to ensure a non-glob is always opened correctly
 		useShell = args.get("sshShell") and (len(args["paths"]) > 1 or "ControlMaster=auto" not in getSshArgs()) #i.e. isMultipleFiles || isMultiplexingDisabled
 
-		for path in args["paths"]:
+		#on a slow link, the files are fetched with one command instead of a round trip each (see LinkProfile)
+		prefetched = [None] * len(args["paths"])
+		if useShell and len(args["paths"]) > 1 and "range" not in args and LinkProfile.isSlow(args["server"], args.get("port")):
+			limit = sublime.load_settings(SETTINGS_FILE).get("rangeThreshold", 52428800) or 0
+			out, code, _ = args["sshShell"].runCmd(openFileOverSshTextCommand.makeBatchCmd(args["paths"], limit), False, False)
+			if code == 0:
+				prefetched = parseFramed(out, len(args["paths"]))
 
-			#open a temp file with the correct extension
-			#I can't just make a new file because I want the syntax to be set based on the remote file's extension
-			_, ext = os.path.splitext(path)
-			file = tempfile.NamedTemporaryFile(suffix=ext)
-			view = self.window.open_file(file.name)
+		for path, fetched in zip(args["paths"], prefetched):
 
-			if useShell:
-				viewToShell[view.id()] = args["sshShell"]
+			extra = {}
+			if args.get("line"):
+				extra["ssh_line"] = args["line"] #go to line after loading (used by Find in Remote Files)
+			if args.get("range"):
+				extra["ssh_range"] = args["range"] #only open part of the file (see rangeInputHandler)
+			elif args.get("range") == False:
+				extra["ssh_probe"] = False #the whole file was asked for so don't ask again (see openFileOverSshTextCommand)
 
-			view.settings().set("ssh_server", args["server"])
-			view.settings().set("ssh_port", args.get("port"))
-			view.settings().set("ssh_path", path)
-
-			file.close()
+			#failed prefetches are fetched again on their own for their error message
+			self.openView(self.window, args["server"], args.get("port"), path, args["sshShell"] if useShell else None, fetched[1] if fetched and fetched[0] == 0 else None, extra)
 
 		if paths == None:
 			del self.argz #no need to keep this around and allows the SshShell.__del__() function to be called
 
+	#opens a view for a remote file that openFileOverSshEventListener.on_load fills in; fetched is the file's probe output if it was already downloaded
+	@staticmethod
+	def openView(window, server, port, path, shell=None, fetched=None, extra=None):
+
+		#open a temp file with the correct extension
+		#I can't just make a new file because I want the syntax to be set based on the remote file's extension
+		_, ext = os.path.splitext(path)
+		file = tempfile.NamedTemporaryFile(suffix=ext)
+		view = window.open_file(file.name)
+
+		if shell:
+			viewToShell[view.id()] = shell
+		if fetched != None:
+			viewToPrefetch[view.id()] = fetched
+
+		view.settings().set("ssh_server", server)
+		view.settings().set("ssh_port", port)
+		view.settings().set("ssh_path", path)
+		for key, value in (extra or {}).items():
+			view.settings().set(key, value)
+
+		file.close()
+		return view
+
 	def input(self, args):
 
 		self.argz = Argz(window=self.window)
-		return serverInputHandler(self.argz)
+		usePicker = sublime.load_settings(SETTINGS_FILE).get("hostPicker", True) and HostProbe.candidates()
+		if usePicker:
+			HostProbe.start(usePicker) #the picker doesn't wait, so start before it's shown
+		return hostInputHandler(self.argz) if usePicker else serverInputHandler(self.argz)
 
 
+#input pallet fleet hosts input
+class hostsInputHandler(sublime_plugin.TextInputHandler):
 
+	def __init__(self, args):
 
-class sofosCheekyMakeDirtyCommand(sublime_plugin.TextCommand):
-	def run(self, edit):
-		self.view.insert(edit, 0, " ")
-		self.view.erase(edit, sublime.Region(0, 1))
+		super().__init__()
 
-#sets the view's buffer to the remote file's contents
-class openFileOverSshTextCommand(sublime_plugin.TextCommand):
+		self.args = args
+		self.settings = sublime.load_settings(SETTINGS_FILE)
 
-	#an edit object is required for modifying a view/buffer and a text command is the only valid way to get one in sublime text 3/4
+	def placeholder(self):
 
-	def run(self, edit):
+		return "user@host1 host2:2222 @group"
 
-		settings = self.view.settings()
-		cmd = "cat -- " + shlex.quote(settings["ssh_path"])
-		setRO = False
+	def initial_text(self):
 
-		#read
-		if self.view.id() in viewToShell:
+		return self.settings.get("fleetHosts", "")
 
-			txt, code, err = viewToShell[self.view.id()].runCmd(cmd, False, False)
-			if code != 0 and err == None:
-				err, _, _ = viewToShell[self.view.id()].runCmd(f"{cmd} 2>&1", False, False)
-			del viewToShell[self.view.id()] #remove ref so the shell can close
+	def preview(self, text):
 
-		else:
+		hosts, unknown = openFileOverSshFleetCommand.parseHosts(text)
+		if unknown:
+			return f"Unknown host group{'s' if len(unknown) > 1 else ''}: {', '.join(unknown)} (see the hostGroups setting)"
+		return f"{len(hosts)} host{'s' if len(hosts) != 1 else ''}" + (f": {pathInputHandler.collapse(' '.join(server for server, _ in hosts), 100, ' ')}" if hosts else "")
 
-			p = subprocess.Popen(["ssh", *getSshArgs(port=settings.get("ssh_port")), settings["ssh_server"], cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=getStartupInfo())
-			txt, err = p.communicate()
-			code = p.returncode
+	def validate(self, text):
 
+		hosts, unknown = openFileOverSshFleetCommand.parseHosts(text)
+		return len(hosts) > 0 and not unknown
 
-		#error
-		if code != 0 and not (code == 1 and b"No such file or directory" in err): #ok to open a non existent file
-			path = f"{settings['ssh_server']}:{settings['ssh_path']}"
-			sshErr = code == 255 or code < 0
-			txt = (
-				makeErrorText(f"{'Failed' if sshErr else 'Unable'} to open this remote file ({path})", code, err) +
-				"\n\nYou can try to open this file again with the File > Revert File menu item. (The command pallet `File: Revert` will not work due to a bug in Sublime)"
-			).encode()
-			setRO = True
-			if not sshErr or len(viewToShell) == 0: #i.e. not ssh error or this is the last file being opened at the same time
-				sublime.error_message(makeErrorText(f"Unable to open remote file {path}", code, err))
+	def next_input(self, args):
 
-		#write
-		self.view.set_read_only(False)
-		self.view.set_encoding("UTF-8")
-		self.view.replace(edit, sublime.Region(0, self.view.size()), str(txt, "UTF-8", "ignore"))
+		return fleetPathInputHandler(self.args) if "path" not in self.args else None
+
+#input pallet fleet path input
+class fleetPathInputHandler(sublime_plugin.TextInputHandler):
+
+	def __init__(self, args):
+
+		super().__init__()
+
+		self.args = args
+		self.settings = sublime.load_settings(SETTINGS_FILE)
+
+	def name(self):
+
+		return "path"
+
+	def placeholder(self):
+
+		return "/etc/hosts"
+
+	def initial_text(self):
+
+		return self.settings.get("fleetPath", "")
+
+	def preview(self, text):
+
+		return f"{'Compare' if self.args.get('summary') else 'Open'} {text} on every host"
+
+	def validate(self, text):
+
+		return len(text) > 0
+
+#opens the same remote path on many servers at once
+class openFileOverSshFleetCommand(sublime_plugin.WindowCommand):
+
+	"""
+	 * Hosts are space separated user@server or user@server:port strings, and @name adds the hosts of the hostGroups setting's name group
+	 * The files are fetched in parallel by up to fleetConcurrency ssh processes, each with a fleetTimeout second timeout,
+	 *     so one slow or dead host doesn't hold up the rest
+	 * Each host's file is opened as its own remote view (named server/path) as soon as it arrives; the views are edited and saved like any other
+	 * With summary, a single view groups the hosts by the file's contents and diffs each version against the first host's
+	"""
+
+	@staticmethod
+	def parseHosts(text): #returns ([(server, port)], unknown group names)
+
+		groups = sublime.load_settings(SETTINGS_FILE).get("hostGroups", {})
+		hosts = []
+		unknown = []
+		for word in text.replace(",", " ").split():
+			if word.startswith("@"):
+				if word[1:] in groups:
+					hosts.extend(groups[word[1:]])
+				else:
+					unknown.append(word[1:])
+			else:
+				hosts.append(word)
+
+		parsed = []
+		for host in hosts:
+			server, sep, port = host.rstrip(":").rpartition(":")
+			parsed.append((server, port) if sep and port.isdecimal() else (host.rstrip(":"), ""))
+
+		return (list(dict.fromkeys(parsed)), unknown) #de-dupe but keep the order
+
+	def run(self, path, hosts, summary=False):
+
+		prefs = sublime.load_settings(SETTINGS_FILE)
+		prefs.set("fleetPath", path)
+		if isinstance(hosts, str):
+			prefs.set("fleetHosts", hosts)
+		sublime.save_settings(SETTINGS_FILE)
+
+		hosts, unknown = self.parseHosts(hosts) if isinstance(hosts, str) else ([(server, "") if isinstance(server, str) else tuple(server) for server in hosts], [])
+		if unknown or not hosts:
+			sublime.error_message(f"Unknown host group{'s' if len(unknown) > 1 else ''}: {', '.join(unknown)}" if unknown else "Fleet open needs at least one host")
+			return
+
+		concurrency = max(1, prefs.get("fleetConcurrency", 8))
+		timeout = prefs.get("fleetTimeout", 10)
+		limit = prefs.get("rangeThreshold", 52428800) or 0
+		cmd = openFileOverSshTextCommand.makeProbeCmd(path, limit)
+
+		sublime.status_message(f"OpenFileOverSSH: fetching {path} from {len(hosts)} hosts")
+
+		results = {} #(server, port): (stdout, code, stderr)
+		pending = list(reversed(hosts))
+		lock = threading.Lock()
+
+		def worker():
+			while True:
+				with lock:
+					if not pending:
+						return
+					host = pending.pop()
+				out, code, err = runSsh(*host, cmd, timeout=timeout)
+				with lock:
+					results[host] = (out, code, err)
+				if not summary:
+					sublime.set_timeout(lambda host=host, out=out, code=code: self.openResult(host, path, out, code)) #bound now, the worker moves on to the next host
+
+		def fetch():
+			workers = [threading.Thread(target=worker, daemon=True) for _ in range(min(concurrency, len(hosts)))]
+			for thread in workers:
+				thread.start()
+			for thread in workers:
+				thread.join()
+			sublime.set_timeout(lambda: self.done(path, hosts, results, summary))
+
+		threading.Thread(target=fetch, daemon=True).start()
+
+	def openResult(self, host, path, out, code):
+
+		if code == 0:
+			openFileOverSshCommand.openView(self.window, host[0], host[1], path, fetched=out)
+
+	@staticmethod
+	def hostName(host):
+		return host[0] + (f":{host[1]}" if host[1] else "")
+
+	def done(self, path, hosts, results, summary):
+
+		failed = [(host, results[host]) for host in hosts if results[host][1] != 0]
+		failures = [f"{self.hostName(host)}: {(err.decode('UTF-8', 'replace').strip().splitlines() or [f'exit code {code}'])[-1]}" for host, (_, code, err) in failed]
+
+		if summary:
+			self.showSummary(path, hosts, results, failures)
+		elif failures:
+			sublime.error_message(f"Opened {path} on {len(hosts) - len(failed)} of {len(hosts)} hosts. These failed:\n\n" + "\n".join(failures))
+		else:
+			sublime.status_message(f"OpenFileOverSSH: opened {path} on {len(hosts)} hosts")
+
+	def showSummary(self, path, hosts, results, failures):
+
+		#group by content; the probe header (see openFileOverSshTextCommand.makeProbeCmd) says if the contents were cut to the head
+		versions = {} #contents: [hosts]
+		for host in hosts:
+			out, code, _ = results[host]
+			if code != 0:
+				continue
+			header, _, body = out.partition(b"\n")
+			nums = header.split()
+			if len(nums) == 3 and (nums[1] != nums[2] or int(nums[0]) > len(body)): #binary, or larger than rangeThreshold so only the head was sent
+				body = f"(not compared: {'binary' if nums[1] != nums[2] else 'large'} file of {pathInputHandler.prettySize(int(nums[0]))})\n".encode()
+			versions.setdefault(body, []).append(host)
+
+		lines = [f"{path} on {len(hosts)} hosts: {len(versions)} version{'s' if len(versions) != 1 else ''}" + (f", {len(failures)} failed" if failures else ""), ""]
+		first = None
+		for i, (body, group) in enumerate(versions.items()):
+			text = body.decode("UTF-8", "replace")
+			lines.append(f"== Version {i + 1} ({len(group)} host{'s' if len(group) != 1 else ''}): {' '.join(self.hostName(host) for host in group)}")
+			if first == None:
+				first = (text, group[0])
+			else:
+				lines.extend(line.rstrip("\n") for line in difflib.unified_diff(
+					first[0].splitlines(True), text.splitlines(True), f"{self.hostName(first[1])}:{path}", f"{self.hostName(group[0])}:{path}"
+				))
+			lines.append("")
+
+		if failures:
+			lines.append("== Failed")
+			lines.extend(failures)
+
+		view = self.window.new_file()
+		view.set_name(f"Fleet: {path}")
+		view.set_scratch(True)
+		view.assign_syntax("Packages/Diff/Diff.sublime-syntax")
+		view.run_command("append", {"characters": "\n".join(lines) + "\n"})
+		view.set_read_only(True)
+
+	def input(self, args):
+
+		args = {**args}
+		return hostsInputHandler(args) if "hosts" not in args else fleetPathInputHandler(args) if "path" not in args else None
+
+
+#uploads a remote view's buffer to the same path on many servers
+class openFileOverSshFanOutCommand(sublime_plugin.TextCommand):
+
+	"""
+	 * Uploads run in parallel with up to fleetConcurrency ssh processes (which share the multiplexing master connection when it's on),
+	 *     and each upload is verified with the file's sha256 in the same round trip like a single save
+	 * Each host's result is added to an output panel as it finishes
+	 * After maxFailures (the fanOutMaxFailures setting, 0 for no limit) failed hosts, the hosts that haven't started are skipped
+	"""
+
+	PANEL = "sofos_fan_out"
+
+	def run(self, edit, hosts, maxFailures=None):
+
+		settings = self.view.settings()
+		prefs = sublime.load_settings(SETTINGS_FILE)
+		if isinstance(hosts, str):
+			prefs.set("fleetHosts", hosts)
+			sublime.save_settings(SETTINGS_FILE)
+
+		hosts, unknown = openFileOverSshFleetCommand.parseHosts(hosts) if isinstance(hosts, str) else ([(server, "") if isinstance(server, str) else tuple(server) for server in hosts], [])
+		if unknown or not hosts:
+			sublime.error_message(f"Unknown host group{'s' if len(unknown) > 1 else ''}: {', '.join(unknown)}" if unknown else "Fan-out save needs at least one host")
+			return
+
+		path = settings["ssh_path"]
+		data = self.view.substr(sublime.Region(0, self.view.size())).encode("UTF-8")
+		localHash = contentHash(data)
+		maxFailures = maxFailures if maxFailures != None else prefs.get("fanOutMaxFailures", 0)
+		concurrency = max(1, prefs.get("fleetConcurrency", 8))
+		cmd = f"cat > {shlex.quote(path)} && {remoteHashCmd([path])}"
+		hostName = openFileOverSshFleetCommand.hostName
+		width = max(len(hostName(host)) for host in hosts) + 2
+
+		window = self.view.window()
+		panel = window.create_output_panel(self.PANEL)
+		panel.settings().set("word_wrap", False)
+		panel.run_command("append", {"characters": f"Saving {path} ({pathInputHandler.prettySize(len(data))}) to {len(hosts)} hosts\n\n{'host':<{width}}{'result':<10}time\n"})
+		window.run_command("show_panel", {"panel": "output." + self.PANEL})
+
+		pending = list(reversed(hosts))
+		counts = {"ok": 0, "failed": 0}
+		lock = threading.Lock()
+
+		def report(line):
+			sublime.set_timeout(lambda: panel.run_command("append", {"characters": line + "\n"}))
+
+		def worker():
+			while True:
+				with lock:
+					if not pending or (maxFailures and counts["failed"] >= maxFailures):
+						return
+					host = pending.pop()
+
+				start = time.perf_counter()
+				out, code, err = runSsh(*host, cmd, data)
+				remoteHash = parseHashes(out, 1)[0] if code == 0 else None
+				elapsed = f"{(time.perf_counter() - start) * 1000:.0f}ms"
+
+				if code != 0:
+					result = "error", (err.decode("UTF-8", "replace").strip().splitlines() or [f"exit code {code}"])[-1]
+				elif remoteHash != None and remoteHash != localHash: #None is no sha256 tool
+					result = "mismatch", f"sha256 {remoteHash or 'unreadable'}"
+				else:
+					result = "ok", ""
+
+				with lock:
+					counts["ok" if result[0] == "ok" else "failed"] += 1
+				report(f"{hostName(host):<{width}}{result[0]:<10}{elapsed:<9}{result[1]}")
+
+		def fanOut():
+			workers = [threading.Thread(target=worker, daemon=True) for _ in range(min(concurrency, len(hosts)))]
+			for thread in workers:
+				thread.start()
+			for thread in workers:
+				thread.join()
+
+			for host in reversed(pending):
+				report(f"{hostName(host):<{width}}skipped")
+			summary = f"{counts['ok']} saved, {counts['failed']} failed" + (f", {len(pending)} skipped after {maxFailures} failures" if pending else "")
+			report(f"\n{summary}")
+			sublime.set_timeout(lambda: sublime.status_message(f"OpenFileOverSSH: fan-out save of {path}: {summary}"))
+
+		threading.Thread(target=fanOut, daemon=True).start()
+
+	def is_enabled(self):
+
+		settings = self.view.settings()
+		return settings.has("ssh_server") and settings.has("ssh_path") and not settings.has("ssh_range") and not self.view.is_read_only()
+
+	def input(self, args):
+
+		return hostsInputHandler({**args, "path": self.view.settings().get("ssh_path")}) if "hosts" not in args else None
+
+
+#shows the Trace's per server latency percentiles and throughput in an output panel and optionally exports the raw records as JSON
+class openFileOverSshTraceCommand(sublime_plugin.WindowCommand):
+
+	PANEL = "sofos_trace"
+
+	@staticmethod
+	def ms(seconds):
+		return f"{seconds * 1000:.1f}ms"
+
+	def run(self, export=False):
+
+		records = Trace.snapshot()
+		summary = Trace.summary(records)
+
+		lines = [f"Open File Over SSH Trace: {len(records)} records (traceSize: {Trace.records.maxlen})", ""]
+
+		if summary:
+			lines.append(f"{'server':<32} {'ops':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'queue':>9} {'in':>8} {'out':>8} {'rate':>9} {'errors':>6}")
+			for (server, port), stats in sorted(summary.items(), key=lambda item: str(item[0])):
+				lines.append(
+					f"{server + (':' + str(port) if port else ''):<32} {stats['ops']:>6} " +
+					" ".join(f"{self.ms(stats[key]):>9}" for key in ("p50", "p90", "p99", "max", "queue")) +
+					f" {pathInputHandler.prettySize(stats['bytesIn']):>8} {pathInputHandler.prettySize(stats['bytesOut']):>8} {pathInputHandler.prettySize(int(stats['throughput'])) + '/s':>9} {stats['errors']:>6}"
+				)
+		else:
+			lines.append("No remote operations recorded yet.")
+
+		steps = {}
+		for record in records:
+			if record["kind"] == "step":
+				steps.setdefault(record["what"], []).append(record["rtt"])
+
+		if steps:
+			lines.extend(["", f"{'step':<44} {'calls':>6} {'p50':>9} {'p90':>9} {'max':>9}"])
+			for name, times in sorted(steps.items()):
+				times.sort()
+				lines.append(f"{name:<44} {len(times):>6} {self.ms(Trace.percentile(times, 50)):>9} {self.ms(Trace.percentile(times, 90)):>9} {self.ms(times[-1]):>9}")
+
+		if Watchdog.reports:
+			lines.extend(["", "UI thread blocks (watchdog):"])
+			for report in list(Watchdog.reports)[-10:]:
+				lines.append(
+					f"  {time.strftime('%H:%M:%S', time.localtime(report['time']))} {self.ms(report['blocked']):>9} {report['handler']}" +
+					(f" (remote: {report['remote']})" if report["remote"] else "")
+				)
+				if report["stack"]:
+					lines.extend("    " + line for line in "".join(report["stack"][-4:]).rstrip("\n").split("\n"))
+
+		if records:
+			lines.extend(["", "Most recent:"])
+			for record in records[-15:]:
+				lines.append(
+					f"  {time.strftime('%H:%M:%S', time.localtime(record['time']))} {record['kind']:<8} {record['what']:<40.40} {self.ms(record['rtt']):>9}" +
+					(f" code {record['code']}" if record["code"] != None else "")
+				)
+
+		if export:
+			path = export if isinstance(export, str) else os.path.join(sublime.cache_path(), "OpenFileOverSSH", time.strftime("trace-%Y%m%d-%H%M%S.json"))
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			with open(path, "w") as file:
+				json.dump({"summary": [{"server": server, "port": port, **stats} for (server, port), stats in summary.items()], "records": records, "blocks": list(Watchdog.reports)}, file, indent="\t")
+			lines.extend(["", f"Exported to {path}"])
+			sublime.status_message(f"OpenFileOverSSH: trace exported to {path}")
+
+		panel = self.window.create_output_panel(self.PANEL)
+		panel.run_command("append", {"characters": "\n".join(lines) + "\n"})
+		self.window.run_command("show_panel", {"panel": "output." + self.PANEL})
+
+
+class openFileOverSshProfileCommand(sublime_plugin.WindowCommand):
+
+	PANEL = "sofos_profile"
+
+	def run(self, action="start"):
+
+		if action == "start":
+			Profiler.start()
+			sublime.status_message("OpenFileOverSSH: profiling started; run Stop Profiling for the report")
+			return
+
+		report, path = Profiler.stop(os.path.join(sublime.cache_path(), "OpenFileOverSSH", "profiles"))
+		if path:
+			sublime.status_message(f"OpenFileOverSSH: profile saved to {path}")
+
+		panel = self.window.create_output_panel(self.PANEL)
+		panel.run_command("append", {"characters": report + "\n"})
+		self.window.run_command("show_panel", {"panel": "output." + self.PANEL})
+
+	def is_enabled(self, action="start"):
+		return Profiler.active != (action == "start")
+
+
+#finds the remote view of server:path in window or None
+def findRemoteView(window, server, port, path):
+
+	for view in window.views():
+		settings = view.settings()
+		if settings.get("ssh_server") == server and str(settings.get("ssh_port") or "") == str(port or "") and settings.get("ssh_path") == path:
+			return view
+	return None
+
+#moves the cursor to the start of a 1 based line number
+def goToLine(view, line):
+
+	point = view.text_point(line - 1, 0)
+	view.sel().clear()
+	view.sel().add(sublime.Region(point, point))
+	view.show_at_center(point)
+
+#the server and folder of the active remote view, or the last file browser server and folder (server is None if there isn't one)
+#rootSetting is a setting with a remembered folder that is used instead of the file browser's
+def defaultLocation(window, rootSetting=None):
+
+	settings = window.active_view() and window.active_view().settings()
+	if settings and settings.has("ssh_server") and settings.has("ssh_path"):
+		return settings["ssh_server"], settings.get("ssh_port") or "", os.path.dirname(settings["ssh_path"])
+
+	prefs = sublime.load_settings(SETTINGS_FILE)
+	text = prefs.get("server", "")
+	if not serverInputHandler.checkSyntax(text):
+		return None, None, ""
+	path = "".join(prefs.get("path", []))
+	return text[:text.index(":")], text[text.index(":")+1:text.rindex(":")], (rootSetting and prefs.get(rootSetting)) or path[:path.rfind("/") + 1]
+
+#input pallet find pattern input
+class patternInputHandler(sublime_plugin.TextInputHandler):
+
+	def __init__(self, args):
+
+		super().__init__()
+
+		self.args = args
+		self.settings = sublime.load_settings(SETTINGS_FILE)
+
+	def placeholder(self):
+
+		return "text to find"
+
+	def initial_text(self):
+
+		return self.settings.get("findPattern", "")
+
+	def preview(self, text):
+
+		return f"Find {'Regex' if self.args.get('regex') else 'Text'} in {self.args['server']}:{self.args.get('root') or '~'}" if "root" in self.args else None
+
+	def validate(self, text):
+
+		return len(text) > 0
+
+	def next_input(self, args):
+
+		return rootInputHandler(self.args) if "root" not in self.args else None
+
+#input pallet find root folder input
+class rootInputHandler(sublime_plugin.TextInputHandler):
+
+	def __init__(self, args):
+
+		super().__init__()
+
+		self.args = args
+
+	def placeholder(self):
+
+		return "folder (empty for home)"
+
+	def initial_text(self):
+
+		return self.args.get("defaultRoot", "")
+
+	def preview(self, text):
+
+		return f"{self.args.get('action', 'Search')} {self.args['server']}:{text or '~'}"
+
+#searches remote files with rg or grep on the server and streams the matches into an output panel
+class openFileOverSshFindCommand(sublime_plugin.WindowCommand):
+
+	"""
+	 * The search runs on the server (rg if installed, otherwise grep -rn) so only the matches are transferred.
+	 * Matches are shown in the Find Results format as they arrive and double clicking a match opens the remote file at that line.
+	 * The output is capped by the findMaxOutput setting; the search is stopped once the cap is reached.
+	"""
+
+	PANEL = "sofos_find"
+	MAX_STDERR = 65536 #bytes of the search's errors kept for the error message
+	MATCH_LINE = re.compile(r"(.*?):(\d+):(.*)") #path:line:text, the path ends at the first :digits:
+	searches = {} #window.id(): Popen of the running search
+
+	def run(self, pattern, server=None, port=None, root=None, regex=False, defaultRoot=None):
+
+		if server == None:
+			server, port, _ = defaultLocation(self.window, "findRoot")
+			if server == None:
+				sublime.error_message("Find in Remote Files needs a server. Open a remote file or connect with the Open File Over SSH command first.")
+				return
+
+		prefs = sublime.load_settings(SETTINGS_FILE)
+		prefs.set("findPattern", pattern)
+		prefs.set("findRoot", root or "")
+		sublime.save_settings(SETTINGS_FILE)
+
+		self.stop()
+
+		flags = "" if regex else "F"
+		quoted = shlex.quote(pattern)
+		cmd = (
+			(f"cd -- {shlex.quote(root)} && " if root else "") +
+			f"if command -v rg >/dev/null 2>&1; then rg -n{flags} --null --no-heading --color never -e {quoted} .; " +
+			f"else z=; echo | grep -Z '' >/dev/null 2>&1 && z=Z; grep -rnI{flags}$z -e {quoted} .; fi" #a NUL after the path (when grep has -Z) so paths can contain :
+		)
+
+		panel = self.window.create_output_panel(self.PANEL)
+		panel.settings().set("sofos_find", {"server": server, "port": port or "", "root": root or ""})
+		panel.settings().set("result_file_regex", r"^(\S.*):$") #used by sublime for highlighting; opening is done by openFileOverSshFindListener
+		panel.settings().set("result_line_regex", r"^ +(\d+):")
+		panel.settings().set("word_wrap", False)
+		panel.assign_syntax("Packages/Default/Find Results.hidden-tmLanguage")
+		panel.run_command("append", {"characters": f"Searching {server}:{root or '~'} for {'regex' if regex else 'text'} \"{pattern}\"\n\n"})
+		self.window.run_command("show_panel", {"panel": "output." + self.PANEL})
+
+		proc = subprocess.Popen(["ssh", *getSshArgs(server=server, port=port), server, cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=getStartupInfo())
+		self.searches[self.window.id()] = proc
+		threading.Thread(target=self.stream, args=(proc, panel, server, port, cmd), daemon=True).start()
+
+	def stop(self):
+
+		proc = self.searches.pop(self.window.id(), None)
+		if proc and proc.poll() == None:
+			proc.kill()
+
+	def stream(self, proc, panel, server, port, cmd):
+
+		maxOutput = sublime.load_settings(SETTINGS_FILE).get("findMaxOutput", 1048576)
+		start = time.perf_counter()
+		lastFile = None
+		received = 0
+		matches = 0
+		batch = []
+		flushed = time.perf_counter()
+		truncated = False
+
+		err = bytearray()
+		def drain(): #read stderr as it comes so a chatty search (e.g. grep's Permission denied lines) can't fill the pipe and stall
+			for line in proc.stderr:
+				if len(err) < self.MAX_STDERR:
+					err.extend(line)
+		drainer = threading.Thread(target=drain, daemon=True)
+		drainer.start()
+
+		def flush():
+			if batch:
+				text = "".join(batch)
+				batch.clear()
+				sublime.set_timeout(lambda: panel.run_command("append", {"characters": text}))
+
+		for line in proc.stdout:
+
+			received += len(line)
+			if maxOutput and received > maxOutput:
+				truncated = True
+				proc.kill()
+				break
+
+			#path\0line:text, or path:line:text from a grep without -Z (split at the first :digits:)
+			line = line.decode("UTF-8", "ignore").rstrip("\n")
+			if "\0" in line:
+				path, _, rest = line.partition("\0")
+				num, sep, text = rest.partition(":")
+				if not sep or not num.isdecimal():
+					continue
+			else:
+				match = self.MATCH_LINE.match(line)
+				if not match:
+					continue
+				path, num, text = match.groups()
+			path = path[2:] if path.startswith("./") else path
+
+			if path != lastFile:
+				batch.append(("\n" if lastFile else "") + f"{path}:\n")
+				lastFile = path
+			batch.append(f"{num:>6}: {text}\n")
+			matches += 1
+
+			if time.perf_counter() - flushed > 0.1: #append in batches so the panel isn't flooded with commands
+				flush()
+				flushed = time.perf_counter()
+
+		code = proc.wait()
+		drainer.join()
+		Trace.add("spawn", server, port, cmd, rtt=time.perf_counter() - start, bytesIn=received, bytesOut=0, code=code)
+
+		if self.searches.get(self.window.id()) is not proc:
+			return #cancelled by a new search which has taken over the panel
+
+		if truncated:
+			batch.append(f"\n\nOutput limit reached ({pathInputHandler.prettySize(maxOutput)}); search stopped. Change the findMaxOutput setting to see more.\n")
+		elif code == 255 or code < 0 or code > 1 and not matches: #grep and rg return 1 for no matches
+			batch.append("\n\n" + makeErrorText("Search failed", code, bytes(err)) + "\n")
+		else:
+			skipped = bytes(err).decode("UTF-8", "ignore").strip().split("\n")[0] if code > 1 else "" #e.g. unreadable folders
+			batch.append(f"\n\n{matches} match{'es' if matches != 1 else ''} in {pathInputHandler.prettySize(received)} of results" + (f"; some paths could not be searched ({skipped})" if skipped else "") + "\n")
+		flush()
+
+		del self.searches[self.window.id()]
+
+	def input(self, args):
+
+		if "server" not in args:
+			server, port, root = defaultLocation(self.window, "findRoot")
+			if server == None:
+				return None #run will show the error
+			args = {**args, "server": server, "port": port, "defaultRoot": args.get("defaultRoot", root)}
+		else:
+			args = {**args, "defaultRoot": args.get("defaultRoot", "")}
+
+		return patternInputHandler(args) if "pattern" not in args else rootInputHandler(args) if "root" not in args else None
+
+#opens remote files from the Find in Remote Files panel with a double click
+class openFileOverSshFindListener(sublime_plugin.EventListener):
+
+	def on_text_command(self, view, command_name, args):
+
+		if command_name != "drag_select" or args.get("by") != "words" or not view.settings().has("sofos_find"):
+			return None
+
+		point = view.window_to_text((args["event"]["x"], args["event"]["y"])) if "event" in args else view.sel()[0].begin()
+		row, _ = view.rowcol(point)
+		line = view.substr(view.line(point))
+
+		#a match line or a file line
+		num, sep, _ = line.strip().partition(":")
+		if sep and num.isdecimal() and line.startswith(" "):
+			lineNum = int(num)
+			while row > 0:
+				row -= 1
+				header = view.substr(view.line(view.text_point(row, 0)))
+				if header and not header.startswith(" "):
+					break
+			else:
+				return None
+		elif line.endswith(":") and not line.startswith(" "):
+			header, lineNum = line, 1
+		else:
+			return None
+
+		search = view.settings()["sofos_find"]
+		path = search["root"] + ("/" if search["root"] and not search["root"].endswith("/") else "") + header[:-1]
+		window = view.window()
+
+		existing = findRemoteView(window, search["server"], search["port"], path)
+		if existing:
+			window.focus_view(existing)
+			goToLine(existing, lineNum)
+		else:
+			window.run_command("open_file_over_ssh", {"server": search["server"], "port": search["port"], "paths": [path], "line": lineNum})
+
+		return ("SOFOS_NOOP", {})
+
+
+
+
+#a local mirror of a remote folder so Sublime's sidebar, Goto Anything, and index can see remote files
+class Mount():
+
+	"""
+	 * The mirror is a tree of empty placeholder files under cache_path()/OpenFileOverSSH/mounts/ that are filled with the remote contents when opened
+	 * Each mount has a manifest (next to its folder) with each file's remote size and mtime, and whether it has been filled
+	 * Saving a mirrored file uploads it (see openFileOverSshMountListener)
+	 * Syncing lists the remote folder with one batched stat, re-fetches changed filled files with one command, and adds/removes placeholders
+	"""
+
+	mounts = {} #local folder: Mount
+	lock = threading.Lock() #guards manifests and placeholder writes between syncs, fills, and saves
+	stopped = threading.Event() #ends syncLoop when the plugin is unloaded (or reloaded)
+
+	#prints "size mtime" of a file; GNU stat then BSD stat
+	STAT_FUNC = "sofosStat() { stat -c '%s %Y' -- \"$1\" 2>/dev/null || stat -f '%z %m' -- \"$1\"; }; "
+
+	def __init__(self, server, port, root, folder, files=None):
+
+		self.server = server
+		self.port = str(port or "")
+		self.root = root
+		self.folder = folder
+		self.files = files or {} #relative path: [remote size, remote mtime, filled]
+
+	@staticmethod
+	def baseDir():
+		return os.path.join(sublime.cache_path(), "OpenFileOverSSH", "mounts")
+
+	@classmethod
+	def create(cls, server, port, root):
+
+		name = f"{server}{'_' + str(port) if port else ''}_{root.strip('/').replace('/', '_') or 'home'}_{hashlib.sha1(f'{server}:{port}:{root}'.encode()).hexdigest()[:8]}"
+		folder = os.path.join(cls.baseDir(), "".join(char if char.isalnum() or char in "._-@" else "_" for char in name))
+		mount = cls.mounts.get(folder) or cls(server, port, root, folder)
+		os.makedirs(folder, exist_ok=True)
+		cls.mounts[folder] = mount
+		mount.save()
+		return mount
+
+	#loads the manifests of previous sessions' mounts
+	@classmethod
+	def load(cls):
+
+		try:
+			names = os.listdir(cls.baseDir())
+		except FileNotFoundError:
+			return
+
+		for name in names:
+			if name.endswith(".json"):
+				try:
+					with open(os.path.join(cls.baseDir(), name)) as file:
+						data = json.load(file)
+					folder = os.path.join(cls.baseDir(), name[:-len(".json")])
+					cls.mounts[folder] = cls(data["server"], data["port"], data["root"], folder, data["files"])
+				except (OSError, ValueError, KeyError) as e:
+					print(f"OpenFileOverSSH: Unable to load mount {name}: {e}")
+
+	#returns (mount, relative path) for a local file in a mirror or (None, None)
+	@classmethod
+	def find(cls, fileName):
+
+		if not fileName:
+			return (None, None)
+		for folder, mount in cls.mounts.items():
+			if fileName.startswith(folder + os.sep):
+				return (mount, os.path.relpath(fileName, folder).replace(os.sep, "/"))
+		return (None, None)
+
+	def save(self):
+
+		with open(self.folder + ".json", "w") as file:
+			json.dump({"server": self.server, "port": self.port, "root": self.root, "files": self.files}, file)
+
+	def localPath(self, rel):
+
+		path = os.path.normpath(os.path.join(self.folder, rel))
+		if not path.startswith(self.folder + os.sep):
+			raise ValueError(f"{rel} is outside of the mount")
+		return path
+
+	def remoteCmd(self, cmd, input=None):
+
+		return runSsh(self.server, self.port, f"cd -- {shlex.quote(self.root)} && {cmd}" if self.root else cmd, input)
+
+	#lists the remote folder; returns ({relative path: (size, mtime)}, whether mountMaxFiles cut the listing short) or (None, False) on error
+	def list(self):
+
+		settings = sublime.load_settings(SETTINGS_FILE)
+		noHidden = "" if settings.get("showHiddenFiles", False) else "! -path '*/.*'"
+		maxFiles = settings.get("mountMaxFiles", 20000)
+		find = f"find . -type f {noHidden} -exec stat"
+		out, code, err = self.remoteCmd(
+			f"if stat -c %s . >/dev/null 2>&1; then {find} -c '%s %Y %n' {{}} +; else {find} -f '%z %m %N' {{}} +; fi 2>/dev/null | head -n {maxFiles}"
+		)
+		if code == 255 or code < 0 or (code != 0 and not out):
+			print(makeErrorText(f"OpenFileOverSSH: Unable to list {self.server}:{self.root or '~'}", code, err))
+			return (None, False)
+
+		files = {}
+		lines = out.decode("UTF-8", "ignore").split("\n")
+		for line in lines:
+			size, mtime, path = (line.split(" ", 2) + ["", ""])[:3]
+			if size.isdigit() and mtime.isdigit() and path.startswith("./"):
+				files[path[2:]] = (int(size), int(mtime))
+		return (files, bool(maxFiles) and sum(1 for line in lines if line) >= maxFiles)
+
+	#fetches files with one remote command; returns {relative path: (data, size, mtime) or None if unreadable}
+	def fetch(self, rels):
+
+		out, code, err = self.remoteCmd(
+			self.STAT_FUNC +
+			f"for p in {' '.join(shlex.quote(rel) for rel in rels)}; do " +
+			'if [ -f "$p" ] && [ -r "$p" ] && set -- $(sofosStat "$p"); then echo "$1 $2"; head -c "$1" -- "$p"; else echo -; fi; done'
+		)
+		if code != 0:
+			raise OSError(makeErrorText(f"Unable to read from {self.server}:{self.root or '~'}", code, err))
+
+		files = {}
+		pos = 0
+		for rel in rels:
+			end = out.index(b"\n", pos)
+			header = out[pos:end].split()
+			pos = end + 1
+			if len(header) != 2:
+				files[rel] = None
+				continue
+			size, mtime = int(header[0]), int(header[1])
+			files[rel] = (out[pos:pos+size], size, mtime)
+			pos += size
+		return files
+
+	def writeLocal(self, rel, data):
+
+		path = self.localPath(rel)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, "wb") as file:
+			file.write(data)
+
+	#fills a placeholder with the remote contents
+	def fill(self, rel):
+
+		data, size, mtime = self.fetch([rel])[rel] or (None, 0, 0)
+		if data == None:
+			raise OSError(f"{self.server}:{self.root}/{rel} is missing or unreadable")
+		with self.lock:
+			self.writeLocal(rel, data)
+			self.files[rel] = [size, mtime, True]
+			self.save()
+
+	#uploads a mirrored file's local contents
+	def upload(self, rel, data):
+
+		out, code, err = self.remoteCmd(f"{self.STAT_FUNC}cat > {shlex.quote(rel)} && sofosStat {shlex.quote(rel)}", data)
+		if code != 0:
+			raise OSError(makeErrorText(f"Unable to save remote file {self.server}:{self.root}/{rel}", code, err))
+
+		stat = out.split()
+		with self.lock:
+			self.files[rel] = [int(stat[0]), int(stat[1]), True] if len(stat) == 2 else [len(data), 0, True]
+			self.save()
+
+	#brings the mirror up to date; returns (added, removed, refreshed) counts or None if the listing failed
+	def sync(self, isDirty=lambda path: False):
+
+		remote, truncated = self.list()
+		if remote == None:
+			return None
+
+		with self.lock:
+			local = dict(self.files)
+
+		added = [rel for rel in remote if rel not in local]
+		removed = [rel for rel in local if rel not in remote] if not truncated else [] #files past mountMaxFiles aren't gone
+		changed = [rel for rel in remote if rel in local and local[rel][2] and tuple(local[rel][:2]) != remote[rel] and not isDirty(self.localPath(rel))]
+
+		fetched = self.fetch(changed) if changed else {}
+
+		with self.lock:
+			for rel in added:
+				path = self.localPath(rel)
+				if not os.path.exists(path):
+					self.writeLocal(rel, b"")
+				self.files[rel] = [*remote[rel], False]
+			for rel in removed:
+				if not self.files[rel][2]: #unfilled placeholder, keep filled files in case they are open
+					try:
+						os.remove(self.localPath(rel))
+					except OSError:
+						pass
+				del self.files[rel]
+			for rel, result in fetched.items():
+				if result:
+					self.writeLocal(rel, result[0]) #Sublime reloads open views that aren't dirty
+					self.files[rel] = [result[1], result[2], True]
+			self.save()
+
+		return (len(added), len(removed), len(fetched))
+
+	def unmount(self):
+
+		with self.lock:
+			self.mounts.pop(self.folder, None)
+			shutil.rmtree(self.folder, ignore_errors=True)
+			try:
+				os.remove(self.folder + ".json")
+			except OSError:
+				pass
+
+	#syncs mounts that are in an open window's sidebar every mountSyncInterval seconds
+	@classmethod
+	def syncLoop(cls):
+
+		while True:
+			interval = sublime.load_settings(SETTINGS_FILE).get("mountSyncInterval", 60)
+			if cls.stopped.wait(interval or 60):
+				return
+			if not interval:
+				continue
+
+			folders = {folder for window in sublime.windows() for folder in window.folders()}
+			dirty = {view.file_name() for window in sublime.windows() for view in window.views() if view.is_dirty()}
+			for mount in [mount for folder, mount in list(cls.mounts.items()) if folder in folders]:
+				try:
+					mount.sync(lambda path: path in dirty)
+				except (OSError, ValueError) as e:
+					print(f"OpenFileOverSSH: Unable to sync {mount.server}:{mount.root or '~'}: {e}")
+
+#mounts a remote folder: adds a lazily filled local mirror of it to the window's sidebar
+class openFileOverSshMountCommand(sublime_plugin.WindowCommand):
+
+	def run(self, root, server=None, port=None, defaultRoot=None):
+
+		if server == None:
+			server, port, _ = defaultLocation(self.window)
+			if server == None:
+				sublime.error_message("Mounting a remote folder needs a server. Open a remote file or connect with the Open File Over SSH command first.")
+				return
+
+		mount = Mount.create(server, port, root.rstrip("/") if root != "/" else root)
+
+		project = self.window.project_data() or {}
+		folders = project.setdefault("folders", [])
+		if not any(folder.get("path") == mount.folder for folder in folders):
+			folders.append({"path": mount.folder, "name": f"{server}:{root or '~'}"})
+			self.window.set_project_data(project)
+
+		def sync():
+			self.window.status_message(f"OpenFileOverSSH: Mounting {server}:{root or '~'}...")
+			counts = mount.sync()
+			if counts == None:
+				sublime.set_timeout(lambda: sublime.error_message(f"Unable to list {server}:{root or '~'}. See the console for details."))
+			else:
+				self.window.status_message(f"OpenFileOverSSH: Mounted {server}:{root or '~'} ({len(mount.files)} files)")
+		threading.Thread(target=sync, daemon=True).start()
+
+	def input(self, args):
+
+		if "server" not in args:
+			server, port, root = defaultLocation(self.window)
+			if server == None:
+				return None #run will show the error
+			args = {**args, "server": server, "port": port, "defaultRoot": args.get("defaultRoot", root), "action": "Mount"}
+
+		return rootInputHandler(args) if "root" not in args else None
+
+#syncs the mounts in the window's sidebar now, or unmounts them
+class openFileOverSshMountSyncCommand(sublime_plugin.WindowCommand):
+
+	def run(self, unmount=False):
+
+		mounts = [Mount.mounts[folder] for folder in self.window.folders() if folder in Mount.mounts]
+
+		if unmount:
+			project = self.window.project_data() or {}
+			project["folders"] = [folder for folder in project.get("folders", []) if folder.get("path") not in Mount.mounts]
+			self.window.set_project_data(project)
+			for mount in mounts:
+				mount.unmount()
+			return
+
+		dirty = {view.file_name() for view in self.window.views() if view.is_dirty()}
+		def sync():
+			for mount in mounts:
+				counts = mount.sync(lambda path: path in dirty)
+				if counts:
+					self.window.status_message(f"OpenFileOverSSH: Synced {mount.server}:{mount.root or '~'} ({counts[0]} added, {counts[1]} removed, {counts[2]} updated)")
+		threading.Thread(target=sync, daemon=True).start()
+
+	def is_enabled(self):
+		return any(folder in Mount.mounts for folder in self.window.folders())
+
+#fills mirrored files when they are opened and uploads them when they are saved
+class openFileOverSshMountListener(sublime_plugin.EventListener):
+
+	def on_load(self, view):
+
+		mount, rel = Mount.find(view.file_name())
+		if not mount or mount.files.get(rel, [0, 0, True])[2]:
+			return
+
+		limit = sublime.load_settings(SETTINGS_FILE).get("rangeThreshold", 52428800)
+		if limit and mount.files[rel][0] > limit:
+			view.set_status("ssh_mount", "Too large to mirror; open it with Open File Over SSH")
+			return
+
+		view.set_status("ssh_mount", f"Loading from {mount.server}")
+		def fill():
+			try:
+				mount.fill(rel)
+				sublime.set_timeout(lambda: view.run_command("revert")) #the placeholder is now the real file
+			except OSError as e:
+				sublime.set_timeout(lambda msg=str(e): sublime.error_message(msg)) #e is unbound after the except block
+			finally:
+				sublime.set_timeout(lambda: view.erase_status("ssh_mount"))
+		threading.Thread(target=fill, daemon=True).start()
+
+	def on_post_save(self, view):
+
+		mount, rel = Mount.find(view.file_name())
+		if not mount:
+			return
+		if rel in mount.files and not mount.files[rel][2]:
+			sublime.error_message(f"Not saving {rel} to {mount.server} because it was never loaded from the server")
+			return
+
+		try:
+			with open(view.file_name(), "rb") as file:
+				mount.upload(rel, file.read())
+		except OSError as e:
+			sublime.error_message(str(e))
+
+
+#toggles follow (tail) mode on a remote view: new bytes appended to the remote file are appended to the view
+class openFileOverSshFollowCommand(sublime_plugin.TextCommand):
+
+	"""
+	 * A background thread polls the remote file over its own SshShell every followInterval seconds.
+	 * Each poll sends the last byte offset and inode, and the server replies with only the bytes after that offset.
+	 * Following starts at the remote size recorded when the file was opened or saved (the ssh_size view setting), not at the buffer's length.
+	 *     Without one (e.g. part of a file was opened), the view is replaced with the last CHUNK bytes' whole lines instead of downloading the whole file.
+	 * If the file was truncated (smaller than the offset) or rotated (different inode), reading starts over from the beginning.
+	 * A missing file (e.g. in the middle of a rotation) is reported with a "missing" header instead of an exit, which would end the SshShell.
+	 * The view is read only while following and keeps at most followMaxLines lines.
+	 * Since the view may no longer contain the whole file, it stays read only after following stops until it is reverted.
+	"""
+
+	CHUNK = 1048576 #max bytes read per poll
+	followers = {} #view.id(): threading.Event that stops the follower
+
+	def run(self, edit, follow=None):
+
+		following = self.view.id() in self.followers
+		if follow == following:
+			return
+
+		if following:
+			self.stop(self.view)
+			sublime.status_message("OpenFileOverSSH: stopped following; revert the file to edit it")
+			return
+
+		settings = self.view.settings()
+		offset = settings.get("ssh_size") #the remote size when the view was last opened, saved, or followed; unsaved edits don't move it
+
+		stop = threading.Event()
+		self.followers[self.view.id()] = stop
+		self.view.set_read_only(True)
+		self.view.settings().set("mini_diff", False) #appended text would all show as modified
+		self.view.set_status("ssh_follow", "Following")
+		threading.Thread(target=self.follow, args=(self.view, settings["ssh_server"], settings.get("ssh_port"), settings["ssh_path"], offset, stop), daemon=True).start()
+
+	def is_enabled(self):
+		return self.view.settings().has("ssh_server") and self.view.settings().has("ssh_path") and not self.view.settings().has("ssh_range")
+
+	def is_checked(self):
+		return self.view.id() in self.followers
+
+	@classmethod
+	def stop(cls, view):
+
+		stop = cls.followers.pop(view.id(), None)
+		if stop:
+			stop.set()
+			view.erase_status("ssh_follow")
+
+	@classmethod
+	def follow(cls, view, server, port, path, offset, stop):
+
+		shell = SshShell(server, port)
+		if not shell.isAlive():
+			sublime.set_timeout(lambda: (cls.stop(view), sublime.error_message(makeErrorText(f"Unable to follow {server}:{path}", shell.retCode, shell.error))))
+			return
+
+		decoder = codecs.getincrementaldecoder("UTF-8")("ignore")
+		inode = ""
+		quoted = shlex.quote(path)
+		unknown = offset == None #e.g. part of a file was opened; the first read replaces the view with the file's end
+		missing = False
+
+		try:
+			while not stop.is_set() and view.is_valid():
+
+				settings = sublime.load_settings(SETTINGS_FILE)
+
+				#header line is "inode size offset rotated" followed by the bytes after offset, or "missing"; no exit because this runs in the SshShell
+				#offset is reset to 0 on truncation or rotation, and an unknown offset starts CHUNK bytes before the end
+				start = f"$((s > {cls.CHUNK} ? s - {cls.CHUNK} : 0))" if unknown else offset
+				out, code, err = shell.runCmd(
+					f"p={quoted}; if [ -e \"$p\" ] && set -- $(ls -iLd -- \"$p\" 2>/dev/null) && s=$(($(wc -c < \"$p\"))); then o={start}; r=0; " +
+					f"if {{ [ -n '{inode}' ] && [ \"$1\" != '{inode}' ]; }} || [ \"$s\" -lt \"$o\" ]; then o=0; r=1; fi; " +
+					f"printf '%s %s %s %s\\n' \"$1\" \"$s\" \"$o\" \"$r\"; tail -c +$((o+1)) -- \"$p\" | head -c {cls.CHUNK}; " +
+					"else printf 'missing\\n'; fi",
+					False, False
+				)
+
+				if code == 255 or not shell.isAlive():
+					sublime.set_timeout(lambda: (cls.stop(view), sublime.error_message(makeErrorText(f"Lost connection while following {server}:{path}", code, err))))
+					return
+
+				header, _, data = out.partition(b"\n")
+				fields = header.decode("UTF-8", "replace").split()
+				if code == 0 and len(fields) == 4:
+					if missing:
+						missing = False
+						sublime.set_timeout(lambda: view.set_status("ssh_follow", "Following"))
+					inode, size, begin, rotated = fields
+					rotated = rotated == "1"
+					reset = rotated or unknown
+					if unknown and int(begin) > 0:
+						cut = data.find(b"\n") + 1 #start at a whole line
+						begin, data = int(begin) + cut, data[cut:]
+					unknown = False
+					offset = int(begin) + len(data)
+					if reset:
+						decoder.reset()
+					text = decoder.decode(data)
+					if text or reset:
+						sublime.set_timeout(lambda text=text, reset=reset, rotated=rotated, offset=offset: (view.run_command("sofos_follow_append", {"text": text, "reset": reset, "rotated": rotated}), view.settings().set("ssh_size", offset)))
+					if offset < int(size):
+						continue #more to read right away
+				elif not missing:
+					missing = True
+					sublime.set_timeout(lambda: view.set_status("ssh_follow", "Following (remote file missing)"))
+
+				stop.wait(settings.get("followInterval", 1))
+
+		finally:
+			shell.close()
+
+#appends followed text to a view (see openFileOverSshFollowCommand)
+class sofosFollowAppendCommand(sublime_plugin.TextCommand):
+
+	def run(self, edit, text, reset=False, rotated=False): #reset replaces the view's text, rotated also notes why
+
+		view = self.view
+		atEnd = all(region.end() == view.size() for region in view.sel())
+
+		view.set_read_only(False)
+		if reset:
+			view.replace(edit, sublime.Region(0, view.size()), "")
+		if rotated:
+			text = "--- remote file was truncated or rotated ---\n" + text
+		view.insert(edit, view.size(), text)
+
+		#trim from the top
+		maxLines = sublime.load_settings(SETTINGS_FILE).get("followMaxLines", 10000)
+		lines = view.rowcol(view.size())[0]
+		if maxLines and lines > maxLines:
+			view.erase(edit, sublime.Region(0, view.text_point(lines - maxLines, 0)))
+
+		view.set_read_only(True)
+		view.set_scratch(True) #nothing to save
+
+		if atEnd:
+			view.sel().clear()
+			view.sel().add(sublime.Region(view.size()))
+			view.show(view.size())
+
+#moves a partially opened file's window (see rangeInputHandler) forwards (direction 1) or backwards (direction -1)
+class openFileOverSshRangeCommand(sublime_plugin.TextCommand):
+
+	@traced
+	def run(self, edit, direction=1):
+
+		settings = self.view.settings()
+		rng = dict(settings["ssh_range"])
+		rng["start"] = max(rng["start"] + direction * rng["count"], 0 if rng["unit"] == "bytes" else 1)
+		if rng["start"] == settings["ssh_range"]["start"]:
+			sublime.status_message("OpenFileOverSSH: already at the start of the file")
+			return
+
+		out, code, err = runSsh(settings["ssh_server"], settings.get("ssh_port"), makeRangeCmd(settings["ssh_path"], rng))
+		if code != 0:
+			sublime.error_message(makeErrorText(f"Unable to read remote file {settings['ssh_server']}:{settings['ssh_path']}", code, err))
+			return
+		if not out:
+			sublime.status_message("OpenFileOverSSH: already at the end of the file")
+			return
+
+		#only the window is transferred and kept, so memory is bounded by the window size and not the file size
+		text = str(out, "UTF-8", "ignore")
+		settings.set("ssh_range", rng)
+		self.view.set_read_only(False)
+		self.view.replace(edit, sublime.Region(0, self.view.size()), text)
+		self.view.set_read_only(True)
+		self.view.set_reference_document(text)
+		self.view.set_scratch(True) #on_modified makes it look like an edit
+		self.view.set_status("ssh_range", f"Showing {describeRange(rng)} (read only)")
+
+		self.view.sel().clear()
+		self.view.sel().add(sublime.Region(0, 0))
+		self.view.show(0)
+
+	def is_enabled(self):
+		return self.view.settings().has("ssh_range")
+
+class sofosCheekyMakeDirtyCommand(sublime_plugin.TextCommand):
+	def run(self, edit):
+		self.view.insert(edit, 0, " ")
+		self.view.erase(edit, sublime.Region(0, 1))
+
+#sets the view's buffer to the remote file's contents
+class openFileOverSshTextCommand(sublime_plugin.TextCommand):
+
+	#an edit object is required for modifying a view/buffer and a text command is the only valid way to get one in sublime text 3/4
+
+	PROBE_SIZE = 4096
+
+	"""
+	 * Opening a file is one round trip that probes the file before sending it
+	 * The first line of the output is "size headBytes nonNulHeadBytes" for regular files (or "-" for anything else)
+	 * A file with a NUL in its head (binary) or larger than the rangeThreshold setting only sends its head,
+	 *     and the user picks what to do with it (see askProbe) instead of downloading hundreds of MB of garbage
+	 * The ssh_probe view setting remembers the choice: True (default) probes, False opens the whole file, and "hex" shows a hex view of the head
+	"""
+
+	@classmethod
+	def makeProbeCmd(cls, path, limit):
+
+		head = f'head -c {cls.PROBE_SIZE} -- "$p"'
+		return (
+			f"p={shlex.quote(path)}; "
+			'if [ -f "$p" ] && [ -r "$p" ]; then '
+			f's=$(($(wc -c < "$p"))); n=$(($({head} | wc -c))); b=$(($({head} | tr -d "\\000" | wc -c))); echo $s $n $b; '
+			f'if [ $n -eq $b ] && {{ [ {limit} -eq 0 ] || [ $s -le {limit} ]; }}; then cat -- "$p"; else {head}; fi; '
+			'else echo -; cat -- "$p"; fi' #no exec because this can run in the SshShell
+		)
+
+	#one command that probes every path (see makeFramedCmd)
+	@classmethod
+	def makeBatchCmd(cls, paths, limit):
+
+		return makeFramedCmd([cls.makeProbeCmd(path, limit) for path in paths])
+
+	@staticmethod
+	def hexDump(data):
+
+		lines = []
+		for i in range(0, len(data), 16):
+			chunk = data[i:i+16]
+			text = "".join(chr(byte) if 32 <= byte < 127 else "." for byte in chunk)
+			lines.append(f"{i:08x}  {' '.join(f'{byte:02x}' for byte in chunk):<47}  |{text}|")
+		return "\n".join(lines) + "\n"
+
+	@traced
+	def run(self, edit):
+
+		settings = self.view.settings()
+		rng = settings.get("ssh_range")
+		probe = settings.get("ssh_probe", True) if not rng else False
+		limit = sublime.load_settings(SETTINGS_FILE).get("rangeThreshold", 52428800) or 0
+		if rng:
+			cmd = makeRangeCmd(settings["ssh_path"], rng)
+		elif probe:
+			cmd = self.makeProbeCmd(settings["ssh_path"], limit if probe != "hex" else -1) #-1 always stops after the head
+		else:
+			cmd = "cat -- " + shlex.quote(settings["ssh_path"])
+		setRO = bool(rng) #a part of a file can't be saved
+		txt = None
+
+		#delta reload: when the buffer still has the last synced contents only the changes are downloaded (see deltaFetch)
+		deltaMin = sublime.load_settings(SETTINGS_FILE).get("deltaReload", 1048576)
+		if deltaMin and not rng and probe != "hex" and self.view.id() not in viewToShell and settings.has("ssh_sha256") and self.view.size() >= deltaMin:
+			old = self.view.substr(sublime.Region(0, self.view.size())).encode("UTF-8")
+			if contentHash(old) == settings["ssh_sha256"]:
+				txt = deltaFetch(settings["ssh_server"], settings.get("ssh_port"), settings["ssh_path"], old)
+				if txt != None:
+					code, err, probe = 0, b"", False #already open so no need to probe
+
+		#read
+		if txt != None:
+			pass #delta reloaded
+		elif self.view.id() in viewToPrefetch:
+			txt, code, err = viewToPrefetch.pop(self.view.id()), 0, b""
+			viewToShell.pop(self.view.id(), None)
+		elif self.view.id() in viewToShell:
+
+			txt, code, err = viewToShell[self.view.id()].runCmd(cmd, False, False)
+			if code != 0 and err == None:
+				err, _, _ = viewToShell[self.view.id()].runCmd(f"{cmd} 2>&1", False, False)
+				err = err.partition(b"\n")[2] if probe else err
+			del viewToShell[self.view.id()] #remove ref so the shell can close
+
+		else:
+
+			txt, code, err = runSsh(settings["ssh_server"], settings.get("ssh_port"), cmd)
+
+		#probe
+		stopped = None
+		if probe:
+			header, _, txt = txt.partition(b"\n")
+			try:
+				size, headBytes, textBytes = (int(num) for num in header.split())
+				if headBytes != textBytes or (limit and size > limit) or probe == "hex":
+					stopped = (size, headBytes != textBytes, txt)
+			except ValueError: #"-" i.e. not a regular file so it wasn't probed
+				pass
+
+
+		#synced hash (see openFileOverSshEventListener.checkRestored)
+		#the remote size is where follow mode starts reading (see openFileOverSshFollowCommand)
+		if code == 0 and not rng and not stopped:
+			settings.set("ssh_sha256", contentHash(txt))
+			settings.set("ssh_size", len(txt))
+		else:
+			settings.erase("ssh_sha256")
+			settings.erase("ssh_size")
+
+		#error
+		if code != 0 and not (code == 1 and b"No such file or directory" in err): #ok to open a non existent file
+			path = f"{settings['ssh_server']}:{settings['ssh_path']}"
+			sshErr = code == 255 or code < 0
+			txt = (
+				makeErrorText(f"{'Failed' if sshErr else 'Unable'} to open this remote file ({path})", code, err) +
+				"\n\nYou can try to open this file again with the File > Revert File menu item. (The command pallet `File: Revert` will not work due to a bug in Sublime)"
+			).encode()
+			setRO = True
+			if not sshErr or len(viewToShell) == 0: #i.e. not ssh error or this is the last file being opened at the same time
+				sublime.error_message(makeErrorText(f"Unable to open remote file {path}", code, err))
+
+		#stopped by the probe
+		elif stopped:
+			size, binary, head = stopped
+			if probe == "hex":
+				txt = self.hexDump(head).encode()
+				self.view.set_status("ssh_probe", f"Hex view of the first {pathInputHandler.prettySize(len(head))} (read only)")
+			else:
+				txt = (
+					f"This remote file {'looks binary' if binary else 'is large'} ({pathInputHandler.prettySize(size)}) so it was not downloaded.\n\n"
+					"You can choose what to do with it again with the File > Revert File menu item."
+				).encode()
+				sublime.set_timeout(lambda: self.askProbe(self.view, size, binary))
+			setRO = True
+
+		#write
+		self.view.set_read_only(False)
+		self.view.set_encoding("UTF-8")
+		self.view.replace(edit, sublime.Region(0, self.view.size()), str(txt, "UTF-8", "ignore"))
 
 		if setRO:
 			self.view.set_read_only(True)
+		if rng:
+			self.view.set_status("ssh_range", f"Showing {describeRange(rng)} (read only)")
+		if probe != "hex":
+			self.view.erase_status("ssh_probe")
+
+	@staticmethod
+	def askProbe(view, size, binary):
+
+		rangeSize = sublime.load_settings(SETTINGS_FILE).get("rangeSize", 1048576)
+		prettySize = pathInputHandler.prettySize
+		items = [
+			"Cancel: close this file",
+			f"Open a hex view of the first {prettySize(openFileOverSshTextCommand.PROBE_SIZE)}",
+			f"Open the first {prettySize(min(rangeSize, size))} (read only)",
+			f"Continue: open the whole {prettySize(size)} file"
+		]
+
+		def onSelect(i):
+
+			if i < 0:
+				return #leave the message in the view
+			if i == 0:
+				view.close()
+				return
+
+			if i == 1:
+				view.settings().set("ssh_probe", "hex")
+			elif i == 2:
+				view.settings().set("ssh_range", {"unit": "bytes", "start": 0, "count": rangeSize})
+			else:
+				view.settings().set("ssh_probe", False)
+
+			sublime_plugin.find_view_event_listener(view, openFileOverSshEventListener).on_revert()
+
+		view.window().show_quick_panel(items, onSelect, placeholder=f"{view.settings()['ssh_path']} {'looks binary' if binary else 'is large'}")
+
+#a remote view's incremental diff reference (the contents last opened or saved) without keeping a full copy of every large file in memory
+class DiffReference():
+
+	"""
+	 * Small references are kept as a str, larger ones are zlib compressed,
+	 *     and compressed ones that are still large are spilled to a temp file
+	 * References over the diffMaxSize setting only keep a hash and incremental diff is turned off for their view
+	"""
+
+	PLAIN_SIZE = 256 * 1024
+	SPILL_SIZE = 1024 * 1024
+
+	def __init__(self, text=""):
+
+		self.file = None
+		self.set(text)
+
+	def set(self, text):
+
+		self.close()
+		data = text.encode("UTF-8")
+		maxSize = sublime.load_settings(SETTINGS_FILE).get("diffMaxSize", 16777216)
+
+		self.size = len(data)
+		self.hash = contentHash(data)
+		self.text = self.packed = None
+
+		if maxSize != None and self.size > maxSize:
+			pass #hash only
+		elif self.size <= self.PLAIN_SIZE:
+			self.text = text
+		else:
+			packed = zlib.compress(data, 1) #text compresses well even at the fastest level
+			if len(packed) <= self.SPILL_SIZE:
+				self.packed = packed
+			else:
+				self.file = tempfile.TemporaryFile()
+				self.file.write(packed)
+
+	#returns the reference str or None if only the hash was kept
+	def get(self):
+
+		if self.text != None:
+			return self.text
+		if self.packed != None:
+			return zlib.decompress(self.packed).decode("UTF-8")
+		if self.file:
+			self.file.seek(0)
+			return zlib.decompress(self.file.read()).decode("UTF-8")
+		return None
+
+	def close(self):
+
+		if self.file:
+			self.file.close()
+			self.file = None
+
+#write-behind saves (see the writeBehind setting): saves are journaled locally and uploaded in the background so network blips don't fail them
+class Journal():
+
+	"""
+	 * Each pending save is a content file and a json header under cache_path()/OpenFileOverSSH/journal/ written before the save is acknowledged
+	 *     (temp file, fsync, then rename so a crash leaves the old or the new file but never half of one)
+	 * There is one entry per remote file; saving again replaces the content but keeps the base hash (the server's contents the edits started from)
+	 * The flusher uploads the entries oldest first, each with one command that only writes if the remote file still has the base hash
+	 *     A remote file that changed is a conflict: nothing is overwritten until the user picks what to do (see openFileOverSshJournalCommand)
+	 *     Unreachable servers are retried every writeBehindInterval seconds, and entries survive restarts
+	"""
+
+	entries = {} #id: {server, port, path, base, hash, time, state: pending/conflict/error, error}
+	lock = threading.Lock() #guards entries and their files
+	flushLock = threading.Lock() #one upload at a time
+	wake = threading.Event() #flush now
+	stopped = threading.Event() #set by plugin_unloaded to end flushLoop
+
+	@staticmethod
+	def baseDir():
+		return os.path.join(sublime.cache_path(), "OpenFileOverSSH", "journal")
+
+	@staticmethod
+	def entryId(server, port, path):
+		return hashlib.sha1(f"{server}:{port or ''}:{path}".encode()).hexdigest()[:16]
+
+	@staticmethod
+	def writeDurably(path, data):
+
+		with open(path + ".tmp", "wb") as file:
+			file.write(data)
+			file.flush()
+			os.fsync(file.fileno())
+		os.replace(path + ".tmp", path)
+
+	@classmethod
+	def get(cls, server, port, path):
+
+		with cls.lock:
+			entry = cls.entries.get(cls.entryId(server, port, path))
+			return dict(entry) if entry else None
+
+	@classmethod
+	def add(cls, server, port, path, base, data):
+
+		key = cls.entryId(server, port, path)
+		with cls.lock:
+			old = cls.entries.get(key)
+			entry = {
+				"server": server,
+				"port": str(port or ""),
+				"path": path,
+				"base": old["base"] if old else base,
+				"hash": contentHash(data),
+				"time": old["time"] if old else time.time(), #keeps its place in line
+				"state": "conflict" if old and old["state"] == "conflict" else "pending", #the server still has someone else's changes
+				"error": None
+			}
+			os.makedirs(cls.baseDir(), exist_ok=True)
+			cls.writeDurably(os.path.join(cls.baseDir(), key + ".data"), data)
+			cls.writeDurably(os.path.join(cls.baseDir(), key + ".json"), json.dumps(entry).encode())
+			cls.entries[key] = entry
+
+		cls.wake.set()
+
+	@classmethod
+	def remove(cls, key, hash=None): #hash: only remove if the entry wasn't saved again since
+
+		with cls.lock:
+			if key not in cls.entries or hash != None and cls.entries[key]["hash"] != hash:
+				return False
+			del cls.entries[key]
+			for ext in (".json", ".data"):
+				try:
+					os.remove(os.path.join(cls.baseDir(), key + ext))
+				except FileNotFoundError:
+					pass
+			return True
+
+	@classmethod
+	def update(cls, key, **changes):
+
+		with cls.lock:
+			if key in cls.entries:
+				cls.entries[key].update(changes)
+				cls.writeDurably(os.path.join(cls.baseDir(), key + ".json"), json.dumps(cls.entries[key]).encode())
+
+	@classmethod
+	def load(cls):
+
+		try:
+			names = os.listdir(cls.baseDir())
+		except FileNotFoundError:
+			return
+
+		for name in names:
+			if not name.endswith(".json"):
+				continue
+			key = name[:-len(".json")]
+			try:
+				with open(os.path.join(cls.baseDir(), name)) as file:
+					entry = json.load(file)
+				with open(os.path.join(cls.baseDir(), key + ".data"), "rb") as file:
+					entry["hash"] = contentHash(file.read()) #the content is written first so it may be newer than the header
+				cls.entries[key] = entry
+			except (OSError, ValueError) as e:
+				print(f"OpenFileOverSSH: Unable to load journaled save {name}: {e}")
+
+		for entry in cls.entries.values():
+			sublime.set_timeout(lambda entry=entry: cls.showState(entry))
+
+	@classmethod
+	def flush(cls, retry=False): #retry: also retry the uploads that failed (not conflicts)
+
+		with cls.lock:
+			keys = sorted((key for key, entry in cls.entries.items() if entry["state"] == "pending" or retry and entry["state"] == "error"), key=lambda key: cls.entries[key]["time"])
+
+		for key in keys:
+			cls.upload(key)
+
+	@classmethod
+	def upload(cls, key, overwrite=False):
+
+		with cls.flushLock:
+
+			with cls.lock:
+				if key not in cls.entries:
+					return
+				entry = dict(cls.entries[key])
+				with open(os.path.join(cls.baseDir(), key + ".data"), "rb") as file:
+					data = file.read()
+
+			path = shlex.quote(entry["path"])
+			cmd = f"cat > {path} && {remoteHashCmd([entry['path']])}"
+			if entry["base"] and not overwrite:
+				cmd = f'c=$({remoteHashCmd([entry["path"]])}); if [ "$c" = {entry["base"]} ] || [ -z "$c" ]; then {cmd}; else printf "conflict %s\\n" "$c"; cat > /dev/null; fi' #-z: no sha256 tool
+
+			out, code, err = runSsh(entry["server"], entry["port"], cmd, data)
+			remoteHash = parseHashes(out, 1)[0] if code == 0 else None
+
+			if code == 255 or code < 0:
+				cls.update(key, error=makeErrorText("Unable to reach the server", code, err)) #still pending; the next flush tries again
+			elif code != 0:
+				cls.update(key, state="error", error=makeErrorText("Unable to save", code, err))
+			elif out.startswith(b"conflict"):
+				cls.update(key, state="conflict", error=f"The remote file changed since it was opened (sha256 {out.split()[1].decode() if len(out.split()) > 1 else 'missing'})")
+			elif remoteHash != None and remoteHash != entry["hash"]:
+				cls.update(key, state="error", error=f"The uploaded file does not match (sha256 {remoteHash or 'unreadable'} instead of {entry['hash']})")
+			else:
+				entry["state"] = "saved"
+				if not cls.remove(key, entry["hash"]):
+					cls.update(key, base=entry["hash"], state="pending") #saved again during the upload; the newer save goes next
+
+			with cls.lock:
+				current = dict(cls.entries.get(key, entry))
+			sublime.set_timeout(lambda: cls.showState(current, entry["hash"] if entry["state"] == "saved" else None, notify=current["state"] in ("conflict", "error"), size=len(data)))
+
+	#shows an entry's state on its views; uploaded is the hash of the content that made it to the server and size its length
+	@staticmethod
+	def showState(entry, uploaded=None, notify=False, size=None):
+
+		status = {
+			"pending": "Saved locally; waiting to upload" + (" (server unreachable)" if entry.get("error") else ""),
+			"conflict": "Not uploaded: the remote file changed (see Resolve Journaled Save)",
+			"error": "Upload failed (see Resolve Journaled Save)"
+		}.get(entry["state"])
+
+		for window in sublime.windows():
+			for view in window.views():
+				settings = view.settings()
+				if settings.get("ssh_server") == entry["server"] and str(settings.get("ssh_port") or "") == entry["port"] and settings.get("ssh_path") == entry["path"]:
+					if uploaded:
+						settings.set("ssh_sha256", uploaded)
+						settings.set("ssh_size", size)
+					if status:
+						view.set_status("ssh_sync", status)
+					else:
+						view.erase_status("ssh_sync")
+
+		if notify:
+			sublime.error_message(f"The save of {entry['server']}:{entry['path']} was kept locally and not uploaded.\n\n{entry['error']}\n\nUse Open File Over SSH: Resolve Journaled Save to overwrite the remote file or discard the save.")
+
+	@classmethod
+	def flushLoop(cls):
+
+		while True:
+			cls.wake.wait(sublime.load_settings(SETTINGS_FILE).get("writeBehindInterval", 10))
+			cls.wake.clear()
+			if cls.stopped.is_set():
+				return
+			try:
+				if cls.entries:
+					cls.flush()
+			except Exception as e: #keep the loop alive, the entries are retried next time
+				print(f"OpenFileOverSSH: Unable to flush journaled saves: {e!r}")
+
+#uploads, overwrites with, or discards journaled saves (see Journal)
+class openFileOverSshJournalCommand(sublime_plugin.TextCommand):
+
+	def run(self, edit, action="flush"):
+
+		settings = self.view.settings()
+		key = Journal.entryId(settings.get("ssh_server"), settings.get("ssh_port"), settings.get("ssh_path"))
+
+		if action == "flush":
+			threading.Thread(target=Journal.flush, args=(True,), daemon=True).start()
+		elif action == "overwrite":
+			threading.Thread(target=Journal.upload, args=(key, True), daemon=True).start()
+		elif action == "discard":
+			entry = Journal.get(settings["ssh_server"], settings.get("ssh_port"), settings["ssh_path"])
+			if entry and Journal.remove(key):
+				Journal.showState({**entry, "state": None})
+				sublime_plugin.find_view_event_listener(self.view, openFileOverSshEventListener).on_revert() #back to the server's contents
+
+	def is_enabled(self, action="flush"):
+
+		settings = self.view.settings()
+		if action == "flush":
+			return bool(Journal.entries)
+		entry = settings.has("ssh_server") and Journal.get(settings["ssh_server"], settings.get("ssh_port"), settings.get("ssh_path"))
+		return bool(entry) and (action == "discard" or entry["state"] != "pending")
+
+
+#saves a large view without copying it whole: the buffer is encoded a chunk at a time into ssh's stdin, written to a remote temp file, and moved over the file
+class StreamSave():
+
+	"""
+	 * Only one encoded chunk of CHUNK characters is in memory at a time (instead of the whole buffer as a str and again as bytes)
+	 * The upload goes to a temp file next to the remote file, named per save so a temp file left by an earlier save is never resumed
+	 *     If the connection drops, the temp file's size is the confirmed offset and the upload resumes from there right away (up to RETRIES times)
+	 *     A missing temp file (the connection dropped before it was made) starts over, and so does a server without a sha256 tool (the resumed file couldn't be verified)
+	 *     A failed upload's temp file is removed when the server can still be reached
+	 * The temp file's size and sha256 are checked before it replaces the file, so an interrupted upload never leaves a partial file
+	 * The temp file gets the file's permissions from ls -ld (setuid, setgid, and sticky bits are dropped)
+	 * Symlinks, hard linked files, and files owned by someone else are copied over in place instead so the link and owner are kept
+	"""
+
+	CHUNK = 1048576
+	RETRIES = 3
+
+	def __init__(self, view, server, port, path):
+
+		self.view = view
+		self.server = server
+		self.port = port
+		self.path = path
+		head, sep, name = path.rpartition("/")
+		token = "".join(random.choice(string.ascii_lowercase + string.digits) for _ in range(8))
+		self.tmp = f"{head}{sep}.{name}.sofos-upload-{token}" #same folder so the move is a rename
+
+	def chunks(self, offset=0): #yields the encoded buffer from byte offset on
+
+		pos = 0
+		size = self.view.size()
+		for start in range(0, size, self.CHUNK):
+			chunk = self.view.substr(sublime.Region(start, min(start + self.CHUNK, size))).encode("UTF-8")
+			if pos + len(chunk) > offset:
+				yield chunk[max(0, offset - pos):]
+			pos += len(chunk)
+
+	def hash(self): #returns (sha256, size in bytes)
+
+		sha = hashlib.sha256()
+		size = 0
+		for chunk in self.chunks():
+			sha.update(chunk)
+			size += len(chunk)
+		return (sha.hexdigest(), size)
+
+	def send(self, offset): #returns (code, stderr)
+
+		cmd = f"cat {'>>' if offset else '>'} {shlex.quote(self.tmp)}"
+		start = time.perf_counter()
+		sent = 0
+		p = subprocess.Popen(["ssh", *getSshArgs(server=self.server, port=self.port), self.server, cmd], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, startupinfo=getStartupInfo())
+
+		with Watchdog.remoteCmd(f"{self.server}: {cmd}"):
+			try:
+				for chunk in self.chunks(offset):
+					p.stdin.write(chunk)
+					sent += len(chunk)
+				p.stdin.close()
+			except OSError: #the connection dropped (broken pipe); the exit code says so
+				pass
+			err = p.stderr.read()
+			code = p.wait()
+
+		Trace.add("spawn", self.server, self.port, cmd, rtt=time.perf_counter() - start, bytesIn=len(err), bytesOut=sent, code=code)
+		return (code, err)
+
+	def resumeCmd(self): #prints the offset to resume from
+
+		t = shlex.quote(self.tmp)
+		return f"if {{ command -v sha256sum || command -v shasum; }} >/dev/null 2>&1 && [ -f {t} ]; then wc -c < {t}; else echo 0; fi"
+
+	def finishCmd(self, localHash, size):
+
+		t, p = shlex.quote(self.tmp), shlex.quote(self.path)
+		perm = lambda first, last: f"$(printf %s \"$m\" | cut -c{first}-{last} | tr -d -)"
+		return (
+			"{ " + REMOTE_HASH_FUNC +
+			f'if [ "$(($(wc -c < {t})))" != {size} ]; then echo "Uploaded size does not match" >&2; exit 3; fi; '
+			f'h=$(sofosHash < {t} 2>/dev/null); h=${{h%% *}}; if [ -n "$h" ] && [ "$h" != {localHash} ]; then rm -f -- {t}; echo "Uploaded sha256 does not match" >&2; exit 3; fi; }} && '
+			f'if [ -L {p} ] || {{ [ -e {p} ] && {{ ! [ -O {p} ] || [ "$(ls -ld -- {p} | awk \'{{print $2}}\')" -gt 1 ]; }}; }}; then cat -- {t} > {p} && rm -f -- {t}; '
+			f'else {{ ! [ -e {p} ] || {{ m=$(ls -ld -- {p} | cut -c2-10 | sed \'s/[st]/x/g; s/[ST]/-/g\'); chmod "u={perm(1, 3)},g={perm(4, 6)},o={perm(7, 9)}" {t}; }}; }} && mv -f -- {t} {p}; fi && '
+			+ remoteHashCmd([self.path])
+		)
+
+	def save(self, localHash, size): #returns (stdout, code, stderr) of the final move like runSsh
+
+		offset = 0
+		for attempt in range(self.RETRIES + 1):
+
+			if attempt: #no pause between attempts, this runs in on_pre_save on the UI thread (each attempt's connect already waits up to the timeout setting)
+				out, code, err = runSsh(self.server, self.port, self.resumeCmd())
+				if code != 0:
+					if code == 255 or code < 0:
+						continue
+					break
+				offset = min(int(out.strip() or 0), size)
+				if offset:
+					print(f"OpenFileOverSSH: resuming the upload of {self.server}:{self.path} at {pathInputHandler.prettySize(offset)}")
+
+			code, err = self.send(offset)
+			if code == 0:
+				out, code, err = runSsh(self.server, self.port, self.finishCmd(localHash, size))
+				if code != 0:
+					self.discard(code)
+				return (out, code, err)
+			if code != 255 and code >= 0:
+				break #not the connection; retrying won't help
+
+		self.discard(code)
+		return (b"", code, err)
+
+	def discard(self, code): #removes the temp file unless the connection is down (which would only add a wait)
+
+		if code != 255 and code >= 0:
+			runSsh(self.server, self.port, f"rm -f -- {shlex.quote(self.tmp)}")
 
 #takes care of writing the file to the remote location and keeping track of modifications
 class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
@@ -1242,9 +3431,10 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 
 		self.view = view
 		self.settings = view.settings()
-		self.diffRef = ""
+		self.diffRef = DiffReference()
 		self.viewName = True #name has to change each time its set
 		self.dirtyWhenDoHacks = False #used to not set_scratch(True) e.g. on failed save
+		self.batchSaved = None #True or False when Save All already uploaded (or failed to upload) this view (see openFileOverSshSaveAllListener)
 
 		self.FAKE_LOCAL_PATH = self.settings["ssh_server"] + "/" + self.settings["ssh_path"] #nice file and path name
 
@@ -1255,10 +3445,15 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 			#on_load will not be called so must set up hacks here
 			#it'd be ok if this ran every __init__ but there's no reason to do all this if on_load is about to be called
 			self.view.set_name("SOFOS") #ensure doHack's name will be different from the current name
-			self.diffRef = self.view.substr(sublime.Region(0, self.view.size()))
+			self.diffRef.set(self.view.substr(sublime.Region(0, self.view.size())))
 			self.dirtyWhenDoHacks = view.is_dirty()
 			self.doHacks()
 
+			#the server's file could have changed while sublime was closed, but checking now would make startup wait on the network
+			#so check when the view is first activated (see checkRestored); partially opened files are skipped because hashing them reads the whole file
+			if not self.settings.has("ssh_range"):
+				restoredViews.setdefault((self.settings["ssh_server"], str(self.settings.get("ssh_port") or "")), []).append(self)
+
 	@classmethod
 	def is_applicable(cls, settings):
 		return settings.has("ssh_server") and settings.has("ssh_path")
@@ -1283,7 +3478,11 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 		self.viewName = not self.viewName
 		self.view.set_name(str(self.viewName)) #sets the name so retarget() will behave (see above)
 		self.view.retarget(self.FAKE_LOCAL_PATH) #sets the view/buffer path so the file name looks nice
-		self.view.set_reference_document(self.diffRef) #set the diff ref to the saved original file (otherwise the diffs are all messed up)
+		diffRef = self.diffRef.get()
+		if diffRef != None:
+			self.view.set_reference_document(diffRef) #set the diff ref to the saved original file (otherwise the diffs are all messed up)
+		else:
+			self.view.settings().set("mini_diff", False) #too big to keep a reference (see diffMaxSize)
 		if not self.dirtyWhenDoHacks:
 			self.view.set_scratch(True) #on_mod sets this to false
 		else:
@@ -1291,17 +3490,77 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 			self.dirtyWhenDoHacks = False
 
 
+	@classmethod
+	def checkRestored(cls, server, port):
+
+		"""
+		 * Checks all of a server's restored remote views at once with a single remote command that hashes each file.
+		 * The hash is compared with the ssh_sha256 view setting (which is saved with the session) and only changed files are reloaded.
+		 * Changed files with unsaved edits are not reloaded; the status bar shows the conflict instead.
+		"""
+
+		listeners = [listener for listener in restoredViews.pop((server, port), []) if listener.view.is_valid()]
+		if not listeners:
+			return None
+
+		def check():
+			out, code, err = runSsh(server, port, remoteHashCmd([listener.settings["ssh_path"] for listener in listeners]))
+			sublime.set_timeout(lambda: cls.onRestoredChecked(server, port, listeners, parseHashes(out, len(listeners)), code, err))
+
+		thread = threading.Thread(target=check, daemon=True)
+		thread.start()
+		return thread
+
+	@classmethod
+	def onRestoredChecked(cls, server, port, listeners, hashes, code, err):
+
+		if code == 255 or code < 0: #couldn't connect; try again the next time one is activated
+			print(makeErrorText(f"OpenFileOverSSH: Unable to check restored remote files on {server}", code, err))
+			restoredViews.setdefault((server, port), []).extend(listeners)
+			return
+
+		for listener, remoteHash in zip(listeners, hashes):
+
+			view = listener.view
+			if not view.is_valid():
+				continue
+
+			if remoteHash == False:
+				view.set_status("ssh_sync", "Remote file is missing")
+			elif remoteHash != None and remoteHash == listener.settings.get("ssh_sha256"):
+				view.erase_status("ssh_sync")
+			elif not view.is_dirty():
+				listener.on_revert(list(view.sel())) #changed (or unknown), reload it
+			else:
+				view.set_status("ssh_sync", "Remote file changed since last sync")
+				sublime.status_message(f"OpenFileOverSSH: {server}:{listener.settings['ssh_path']} changed on the server and has unsaved edits here")
+
+	def on_activated(self):
+
+		key = (self.settings["ssh_server"], str(self.settings.get("ssh_port") or ""))
+		if self in restoredViews.get(key, ()):
+			return self.checkRestored(*key)
+
+	@traced
 	def on_load(self):
 
+		openFileOverSshFollowCommand.stop(self.view) #reverting replaces the followed text with the whole file
+		self.view.settings().erase("mini_diff")
+		self.view.erase_status("ssh_sync")
 		self.view.run_command("open_file_over_ssh_text") #open dat remote file
 
 		self.view.sel().clear() #erase selections (the whole view will be selected, idk why)
 		self.view.sel().add(sublime.Region(0, 0)) #put cursor on first line (default sublime behavior when a normal file is opened)
 
-		self.diffRef = self.view.substr(sublime.Region(0, self.view.size())) #save the contents of the buffer in order to mimic sublime's incremental diff on a normal file
+		if self.settings.get("ssh_line"):
+			goToLine(self.view, self.settings["ssh_line"])
+			self.settings.erase("ssh_line")
+
+		self.diffRef.set(self.view.substr(sublime.Region(0, self.view.size()))) #save the contents of the buffer in order to mimic sublime's incremental diff on a normal file
 
 		self.doHacks()
 
+	@traced
 	def on_revert(self, prevSel=None):
 
 		#this (is supposed to) handle the revert command run from the command pallet (or File menu)
@@ -1348,6 +3607,7 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 			self.on_revert(list(self.view.sel()) if not self.view.is_read_only() else None) #don't save error text selection
 			return ("SOFOS_NOOP", {}) #sublime ignores non-existent commands
 
+	@traced
 	def on_pre_save(self):
 
 		#this gets called after the save dialog has exited when this file is not view.retarget()'ed (see openFileOverSshCommand.run() and doHacks())
@@ -1364,17 +3624,68 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 		 *     just like anyone would do normally when they wanted to copy a local file to a remote location
 		"""
 
-		if not self.view.is_read_only(): #don't save the error message lol
+		prefs = sublime.load_settings(SETTINGS_FILE)
+		writable = not self.view.is_read_only() #don't save the error message lol
+		streamSize = prefs.get("streamSaveSize", 8388608)
+		stream = None
+		if writable and streamSize and self.view.size() >= streamSize and not prefs.get("writeBehind", False):
+			stream = StreamSave(self.view, self.settings["ssh_server"], self.settings.get("ssh_port"), self.settings["ssh_path"])
+			data = None
+			localHash, size = stream.hash()
+		else:
+			data = self.view.substr(sublime.Region(0, self.view.size())).encode("UTF-8") if writable else None
+			localHash = contentHash(data) if writable else None
+		batchSaved, self.batchSaved = self.batchSaved, None
+
+		if batchSaved != None:
+
+			#Save All already uploaded it with the rest of its server's files
+			self.dirtyWhenDoHacks = not batchSaved
+
+		elif writable and prefs.get("writeBehind", False) and (
+			localHash != self.settings.get("ssh_sha256") or Journal.get(self.settings["ssh_server"], self.settings.get("ssh_port"), self.settings["ssh_path"])
+		):
+
+			#write-behind: saved once it's in the local journal, uploaded in the background (see Journal)
+			try:
+				Journal.add(self.settings["ssh_server"], self.settings.get("ssh_port"), self.settings["ssh_path"], self.settings.get("ssh_sha256"), data)
+				self.view.set_status("ssh_sync", "Saved locally; uploading")
+			except OSError as e:
+				sublime.error_message(f"Unable to save {self.settings['ssh_server']}:{self.settings['ssh_path']} to the local journal\n\n{e}")
+				self.dirtyWhenDoHacks = True
+
+		elif writable and localHash == self.settings.get("ssh_sha256"):
+
+			#the buffer is byte-identical to what was last read from or written to the server (e.g. a format on save that changed nothing)
+			sublime.status_message("OpenFileOverSSH: no changes to save")
 
-			p = subprocess.Popen(["ssh", *getSshArgs(port=self.settings.get("ssh_port")), self.settings["ssh_server"], "cat > " + shlex.quote(self.settings["ssh_path"])], stdin=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=getStartupInfo()) #ssh cp stdin to remote file
-			_, err = p.communicate(self.view.substr(sublime.Region(0, self.view.size())).encode("UTF-8")) #set stdin to the buffer contents
+		elif writable:
 
-			if p.returncode != 0:
-				sublime.error_message(makeErrorText(f"Unable to save remote file {self.settings['ssh_server']}:{self.settings['ssh_path']}", p.returncode, err))
+			#ssh cp stdin to remote file; stdin is set to the buffer contents (large buffers are streamed, see StreamSave)
+			#the remote file's hash is sent back in the same round trip to verify what landed on disk
+			path = self.settings["ssh_path"]
+			if stream:
+				out, code, err = stream.save(localHash, size)
+			else:
+				out, code, err = runSsh(self.settings["ssh_server"], self.settings.get("ssh_port"), f"cat > {shlex.quote(path)} && {remoteHashCmd([path])}", data)
+			remoteHash = parseHashes(out, 1)[0] if code == 0 else None
+
+			if code != 0:
+				sublime.error_message(makeErrorText(f"Unable to save remote file {self.settings['ssh_server']}:{path}", code, err))
 				self.dirtyWhenDoHacks = True
+			elif remoteHash != None and remoteHash != localHash: #None means the server has no sha256 tool so it can't be verified
+				sublime.error_message(f"The saved remote file {self.settings['ssh_server']}:{path} does not match this buffer (sha256 {remoteHash or 'unreadable'} instead of {localHash})\n\nThe file may have been changed by something else, or the disk may be full.")
+				self.view.set_status("ssh_sync", "Save verification failed")
+				self.settings.erase("ssh_sha256")
+				self.settings.erase("ssh_size")
+				self.dirtyWhenDoHacks = True
+			else:
+				self.settings.set("ssh_sha256", localHash)
+				self.settings.set("ssh_size", size if stream else len(data))
+				self.view.erase_status("ssh_sync")
 
 		else:
-			print("OpenFileOverSSH: not saving read only buffer (error message)")
+			print("OpenFileOverSSH: not saving read only buffer (error message or part of a file)")
 
 		"""
 		 * The Windows Python temporary files cannot be opened by another process before close() (see tempfile.NamedTemporaryFile docs)
@@ -1388,6 +3699,7 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 			self.file.close()
 		self.view.retarget(self.file.name) #tell sublime to save to the temp file ;)
 
+	@traced
 	def on_post_save(self):
 
 		#erase dat fake file dough, hehe, take that sublime
@@ -1398,7 +3710,163 @@ class openFileOverSshEventListener(sublime_plugin.ViewEventListener):
 
 		self.doHacks()
 
+	def on_close(self):
+
+		openFileOverSshFollowCommand.stop(self.view)
+		self.diffRef.close()
+
 	def on_modified(self):
 
 		if self.view.is_scratch():
 			self.view.set_scratch(False)
+
+
+
+#batches Save All: the dirty remote views of each server are uploaded with one ssh command, and servers are uploaded to at the same time
+class openFileOverSshSaveAllListener(sublime_plugin.EventListener):
+
+	"""
+	 * The upload is a script sent to the remote shell's stdin with each file in a quoted here-document
+	 * `head -c size` writes the exact bytes (the here-document adds a newline) and each file's sha256 is printed to verify it like a single save
+	 * Files containing NUL bytes are left to their own on_pre_save (`cat >`) because most shells drop NULs from here-documents
+	 * The uploads run in the background while Save All is held back, then Save All is run again and each view's on_pre_save uses the batch result instead of uploading again
+	"""
+
+	uploads = {} #window id: upload thread, while Save All is held back
+	resuming = False #the held back Save All is being run
+
+	@staticmethod
+	def makeUploadScript(files): #files: [(path, data)]
+
+		script = [REMOTE_HASH_FUNC + "\n"]
+		for path, data in files:
+			delim = "SOFOS_EOF_" + "".join(random.choice(string.ascii_uppercase + string.digits) for _ in range(16))
+			while delim.encode() in data:
+				delim += "_"
+			quoted = shlex.quote(path)
+			script.append(f"if head -c {len(data)} > {quoted} <<'{delim}'\n")
+			script.append(data)
+			script.append(f"\n{delim}\nthen h=$(sofosHash < {quoted} 2>/dev/null); printf '%s\\n' \"${{h%% *}}\"; else printf '!\\n'; fi\n")
+
+		return b"".join(part if isinstance(part, bytes) else part.encode() for part in script)
+
+	def on_window_command(self, window, command_name, args):
+
+		if command_name != "save_all" or self.resuming or sublime.load_settings(SETTINGS_FILE).get("writeBehind", False):
+			return None #write-behind saves are already batched by the journal, and a resumed Save All uses the batch results
+		if window.id() in self.uploads:
+			return ("open_file_over_ssh_save_all_wait", {}) #still uploading the last Save All
+
+		#dirty remote views by server
+		servers = {}
+		for view in window.views():
+			settings = view.settings()
+			listener = sublime_plugin.find_view_event_listener(view, openFileOverSshEventListener)
+			if listener and view.is_dirty() and not view.is_read_only():
+				data = view.substr(sublime.Region(0, view.size())).encode("UTF-8")
+				if b"\0" not in data and contentHash(data) != settings.get("ssh_sha256"):
+					servers.setdefault((settings["ssh_server"], str(settings.get("ssh_port") or "")), []).append((listener, data, view.change_count()))
+
+		if sum(len(views) for views in servers.values()) < 2:
+			return None #nothing to batch, on_pre_save will do it
+
+		#upload in the background, Save All is run again once it's done
+		thread = self.uploads[window.id()] = threading.Thread(target=self.upload, args=(window, servers), daemon=True)
+		thread.start()
+		return ("open_file_over_ssh_save_all_wait", {})
+
+	def upload(self, window, servers):
+
+		results = {}
+		def upload(server, port, views):
+			out, code, err = runSsh(server, port, "sh", self.makeUploadScript([(listener.settings["ssh_path"], data) for listener, data, _ in views]))
+			results[(server, port)] = (parseHashes(out, len(views)), code, err)
+
+		threads = [threading.Thread(target=upload, args=(*key, views)) for key, views in servers.items()]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		sublime.set_timeout(lambda: self.finish(window, servers, results))
+
+	def finish(self, window, servers, results):
+
+		#report
+		saved = 0
+		failures = []
+		for (server, port), views in servers.items():
+			hashes, code, err = results[(server, port)]
+			for (listener, data, changes), remoteHash in zip(views, hashes):
+				localHash = contentHash(data)
+				edited = listener.view.change_count() != changes #edited during the upload, its own on_pre_save uploads the new contents
+				if remoteHash == localHash or (remoteHash == None and code == 0): #None is no sha256 tool
+					listener.settings.set("ssh_sha256", localHash)
+					listener.settings.set("ssh_size", len(data))
+					listener.view.erase_status("ssh_sync")
+					listener.batchSaved = None if edited else True
+					saved += 1
+				else:
+					listener.settings.erase("ssh_sha256")
+					listener.settings.erase("ssh_size")
+					listener.view.set_status("ssh_sync", "Save failed")
+					listener.batchSaved = None if edited else False
+					failures.append(f"{server}:{listener.settings['ssh_path']}" + (f" ({makeErrorText('ssh failed', code, err)})" if code != 0 else " (verification failed)" if remoteHash else " (write failed)"))
+
+		if failures:
+			sublime.error_message(f"Saved {saved} remote file{'s' if saved != 1 else ''}, but these failed:\n\n" + "\n".join(failures))
+		else:
+			sublime.status_message(f"OpenFileOverSSH: Saved {saved} remote files on {len(servers)} server{'s' if len(servers) != 1 else ''}")
+
+		#let Save All continue (remote views are now marked as saved)
+		self.uploads.pop(window.id(), None)
+		openFileOverSshSaveAllListener.resuming = True
+		try:
+			window.run_command("save_all")
+		finally:
+			openFileOverSshSaveAllListener.resuming = False
+
+
+#shown instead of Save All while its remote uploads are running (see openFileOverSshSaveAllListener)
+class openFileOverSshSaveAllWaitCommand(sublime_plugin.WindowCommand):
+
+	def run(self):
+		sublime.status_message("OpenFileOverSSH: Saving remote files...")
+
+
+#loads link profiles, journaled saves, and mounts, starts the host picker's probes, and pre-warms connections to recently used servers and the servers of restored remote views (see the prewarm setting)
+def plugin_loaded():
+
+	engine.configure(sublime.load_settings(SETTINGS_FILE), cache=os.path.join(sublime.cache_path(), "OpenFileOverSSH"), showError=sublime.error_message) #the api isn't ready at import time
+	LinkProfile.load()
+	Journal.load()
+	threading.Thread(target=Journal.flushLoop, daemon=True).start()
+	Mount.load()
+	threading.Thread(target=Mount.syncLoop, daemon=True).start()
+
+	settings = sublime.load_settings(SETTINGS_FILE)
+	if settings.get("hostPicker", True):
+		threading.Thread(target=lambda: HostProbe.start(HostProbe.candidates()), daemon=True).start() #reads ~/.ssh/config
+	count = settings.get("prewarm", 0)
+	if not count:
+		return
+
+	servers = [tuple(item) for item in settings.get("recentServers", [])[:count]]
+	if not servers and serverInputHandler.checkSyntax(settings.get("server", "")): #recentServers is empty until the first connection after updating
+		text = settings.get("server")
+		servers.append((text[:text.index(":")], text[text.index(":")+1:text.rindex(":")]))
+
+	for window in sublime.windows():
+		for view in window.views():
+			if view.settings().has("ssh_server") and view.settings().has("ssh_path"):
+				servers.append((view.settings()["ssh_server"], view.settings().get("ssh_port")))
+
+	threading.Thread(target=prewarm, args=(servers,), daemon=True).start() #getSshArgs loads settings, keep even that off the UI thread
+
+#stops the background loops so a reload (e.g. a package upgrade) doesn't leave the old module's loops running
+def plugin_unloaded():
+
+	Mount.stopped.set()
+	Journal.stopped.set()
+	Journal.wake.set()
+